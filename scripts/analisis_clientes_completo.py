@@ -9,14 +9,13 @@ Genera Excel detallado con:
 - Métricas de retención y crecimiento
 """
 
-import pandas as pd
-import numpy as np
 from datetime import datetime, date
 import os
 
 try:
     import pandas as pd
     from openpyxl import load_workbook
+    import ventas_tipadas
     HAS_PANDAS = True
 except ImportError:
     HAS_PANDAS = False
@@ -27,20 +26,6 @@ OUTPUT_DIR = "outputs"
 OUTPUT_EXCEL = f"{OUTPUT_DIR}/TradeUnity Customer Intelligence.xlsx"
 
 
-def parse_decimal(value: str) -> float:
-    """Convierte string a float."""
-    if not value or value == "":
-        return 0.0
-    
-    value_str = str(value).strip().replace("$", "").replace(" ", "").replace("%", "")
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return float(value_str)
-    except (ValueError, TypeError):
-        return 0.0
-
-
 def auto_adjust_column_widths(writer, sheet_name, df):
     """Ajusta automáticamente el ancho de las columnas en Excel."""
     try:
@@ -66,18 +51,13 @@ def load_ventas():
         print(f"   ⚠️  Archivo de ventas no encontrado: {VENTAS_CSV}")
         return pd.DataFrame()
     
-    df = pd.read_csv(VENTAS_CSV, encoding='utf-8-sig')
-    
-    # Convertir fechas
-    if 'Fecha Creación' in df.columns:
-        df['Fecha Creación'] = pd.to_datetime(df['Fecha Creación'], errors='coerce')
+    # Fechas y numéricos ya vienen tipados (ventas_tipadas); los vacíos cuentan como 0
+    df = ventas_tipadas.load_ventas(VENTAS_CSV)
     
-    # Convertir numéricos
     numeric_cols = ['Total Item con IVA', 'Total Orden', 'Cantidad Unitarias']
     for col in numeric_cols:
         if col in df.columns:
-            df[col] = df[col].astype(str).str.replace(',', '.').str.replace('$', '').str.strip()
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+            df[col] = df[col].fillna(0)
     
     print(f"   ✅ {len(df)} registros de ventas cargados")
     return df
@@ -90,47 +70,13 @@ def analyze_clients(ventas_df):
     if len(ventas_df) == 0:
         return pd.DataFrame()
     
-    # Preparar datos numéricos
-    ventas_df['Descuento % Item'] = pd.to_numeric(
-        ventas_df['Descuento % Item'].astype(str).str.replace('%', '').str.replace(',', '.'), 
-        errors='coerce'
-    ).fillna(0)
-    ventas_df['Precio Original'] = pd.to_numeric(
-        ventas_df['Precio Original'].astype(str).str.replace(',', '.').str.replace('$', ''), 
-        errors='coerce'
-    ).fillna(0)
-    ventas_df['Precio Venta'] = pd.to_numeric(
-        ventas_df['Precio Venta'].astype(str).str.replace(',', '.').str.replace('$', ''), 
-        errors='coerce'
-    ).fillna(0)
-    ventas_df['Días desde Última Recepción CEG'] = pd.to_numeric(
-        ventas_df['Días desde Última Recepción CEG'].astype(str).str.replace(',', '.'), 
-        errors='coerce'
-    ).fillna(0)
-    
-    # Preparar datos de márgenes y costos
-    ventas_df['% Margen sobre FOB'] = pd.to_numeric(
-        ventas_df['% Margen sobre FOB'].astype(str).str.replace('%', '').str.replace(',', '.'), 
-        errors='coerce'
-    ).fillna(0)
-    ventas_df['% Margen sobre Plataforma'] = pd.to_numeric(
-        ventas_df['% Margen sobre Plataforma'].astype(str).str.replace('%', '').str.replace(',', '.'), 
-        errors='coerce'
-    ).fillna(0)
-    ventas_df['FOB CEG'] = pd.to_numeric(
-        ventas_df['FOB CEG'].astype(str).str.replace(',', '.').str.replace('$', ''), 
-        errors='coerce'
-    ).fillna(0)
-    ventas_df['Base Price CEG'] = pd.to_numeric(
-        ventas_df['Base Price CEG'].astype(str).str.replace(',', '.').str.replace('$', ''), 
-        errors='coerce'
-    ).fillna(0)
+    # Datos numéricos, márgenes y costos (ya tipados): los vacíos cuentan como 0
+    for col in ['Descuento % Item', 'Precio Original', 'Precio Venta', 'Días desde Última Recepción CEG',
+                '% Margen sobre FOB', '% Margen sobre Plataforma', 'FOB CEG', 'Base Price CEG']:
+        ventas_df[col] = ventas_df[col].fillna(0)
     
     # Calcular porcentaje de compra sobre FOB y Plataforma
-    ventas_df['Precio_Venta_Unitario'] = pd.to_numeric(
-        ventas_df['Precio Venta Unitario'].astype(str).str.replace(',', '.').str.replace('$', ''), 
-        errors='coerce'
-    ).fillna(0)
+    ventas_df['Precio_Venta_Unitario'] = ventas_df['Precio Venta Unitario'].fillna(0)
     
     # % sobre FOB = (Precio Venta Unitario / FOB) - 1 * 100
     mask_fob = ventas_df['FOB CEG'] > 0
@@ -156,7 +102,7 @@ def analyze_clients(ventas_df):
     ventas_df['Descuento_Final'] = ventas_df[['Descuento % Item', 'Descuento_Calculado']].max(axis=1).astype(float)
     
     # Agrupar por cliente - métricas básicas
-    clientes_stats = ventas_df.groupby('Email Cliente').agg({
+    clientes_stats = ventas_df.groupby('Email Cliente', observed=True).agg({
         'Número de Orden': 'nunique',
         'Total Item con IVA': 'sum',
         'Cantidad Unitarias': 'sum',
@@ -185,16 +131,16 @@ def analyze_clients(ventas_df):
     print("   🎯 Calculando métricas de marketing...")
     
     # 1. Fidelidad a Marcas (Fan de Marca)
-    marca_stats = ventas_df.groupby(['Email Cliente', 'Brand Name CEG']).agg({
+    marca_stats = ventas_df.groupby(['Email Cliente', 'Brand Name CEG'], observed=True).agg({
         'Total Item con IVA': 'sum',
         'Cantidad Unitarias': 'sum'
     }).reset_index()
     marca_stats = marca_stats.sort_values(['Email Cliente', 'Total Item con IVA'], ascending=[True, False])
     
-    marca_dominante = marca_stats.groupby('Email Cliente').first().reset_index()
+    marca_dominante = marca_stats.groupby('Email Cliente', observed=True).first().reset_index()
     marca_dominante.columns = ['Email', 'Marca_Dominante', 'Facturacion_Marca_Dominante', 'Unidades_Marca_Dominante']
     
-    total_por_cliente = ventas_df.groupby('Email Cliente').agg({
+    total_por_cliente = ventas_df.groupby('Email Cliente', observed=True).agg({
         'Total Item con IVA': 'sum',
         'Brand Name CEG': 'nunique'
     }).reset_index()
@@ -216,16 +162,16 @@ def analyze_clients(ventas_df):
     )
     
     # 2. Fidelidad a Vertical/Categoría
-    categoria_stats = ventas_df.groupby(['Email Cliente', 'Categoría (2° Nivel)']).agg({
+    categoria_stats = ventas_df.groupby(['Email Cliente', 'Categoría (2° Nivel)'], observed=True).agg({
         'Total Item con IVA': 'sum',
         'Cantidad Unitarias': 'sum'
     }).reset_index()
     categoria_stats = categoria_stats.sort_values(['Email Cliente', 'Total Item con IVA'], ascending=[True, False])
     
-    categoria_dominante = categoria_stats.groupby('Email Cliente').first().reset_index()
+    categoria_dominante = categoria_stats.groupby('Email Cliente', observed=True).first().reset_index()
     categoria_dominante.columns = ['Email', 'Categoria_Dominante', 'Facturacion_Categoria_Dominante', 'Unidades_Categoria_Dominante']
     
-    total_categorias = ventas_df.groupby('Email Cliente').agg({
+    total_categorias = ventas_df.groupby('Email Cliente', observed=True).agg({
         'Categoría (2° Nivel)': 'nunique'
     }).reset_index()
     total_categorias.columns = ['Email', 'Categorias_Unicas']
@@ -254,7 +200,7 @@ def analyze_clients(ventas_df):
     )
     
     # 4. Análisis de Descuentos
-    descuento_stats = ventas_df.groupby('Email Cliente').agg({
+    descuento_stats = ventas_df.groupby('Email Cliente', observed=True).agg({
         'Descuento_Final': ['mean', 'max', lambda x: (x > 0).sum()],
         'Total Item con IVA': 'sum',
         'Cantidad Unitarias': 'sum'
@@ -262,7 +208,7 @@ def analyze_clients(ventas_df):
     descuento_stats.columns = ['Email', 'Descuento_Promedio_%', 'Descuento_Maximo_%', 'Items_Con_Descuento', 
                                 'Facturacion_Total_Descuento', 'Unidades_Con_Descuento']
     
-    total_items = ventas_df.groupby('Email Cliente').size().reset_index()
+    total_items = ventas_df.groupby('Email Cliente', observed=True).size().reset_index()
     total_items.columns = ['Email', 'Total_Items']
     descuento_stats = descuento_stats.merge(total_items, on='Email')
     descuento_stats['%_Items_Con_Descuento'] = (
@@ -283,7 +229,7 @@ def analyze_clients(ventas_df):
     clientes_stats['%_Items_Con_Descuento'] = clientes_stats['%_Items_Con_Descuento'].fillna(0)
     
     # 5. Análisis de Antigüedad de Inventario Comprado
-    antiguedad_stats = ventas_df.groupby('Email Cliente').agg({
+    antiguedad_stats = ventas_df.groupby('Email Cliente', observed=True).agg({
         'Días desde Última Recepción CEG': ['mean', 'median', 'min', 'max'],
         'Total Item con IVA': 'sum',
         'Cantidad Unitarias': 'sum'
@@ -311,7 +257,7 @@ def analyze_clients(ventas_df):
     # 6. Análisis de Márgenes y Rentabilidad por Cliente
     print("   💰 Calculando márgenes y rentabilidad...")
     
-    margen_stats = ventas_df.groupby('Email Cliente').agg({
+    margen_stats = ventas_df.groupby('Email Cliente', observed=True).agg({
         '% Margen sobre FOB': ['mean', 'median', 'min', 'max'],
         '% Margen sobre Plataforma': ['mean', 'median', 'min', 'max'],
         '%_Compra_Sobre_FOB': ['mean', 'median', 'min', 'max'],
@@ -762,9 +708,10 @@ if __name__ == "__main__":
     if not HAS_PANDAS:
         print("Instalando pandas...")
         import subprocess
+        import sys
         subprocess.check_call(["pip3", "install", "pandas", "openpyxl", "--break-system-packages"])
-        import pandas as pd
-        from openpyxl import load_workbook
+        # Los imports protegidos por HAS_PANDAS quedaron sin definir: se relanza el script
+        os.execv(sys.executable, [sys.executable] + sys.argv)
     
     generate_client_analysis_excel()
     print("\n✨ Proceso completado!")
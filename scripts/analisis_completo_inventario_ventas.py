@@ -9,12 +9,16 @@ Script para generar análisis completo combinando inventario y ventas:
 """
 
 import csv
-from decimal import Decimal, InvalidOperation
-from datetime import datetime, date
+from decimal import Decimal
+from datetime import date
 from collections import defaultdict
 
+from parseo_fechas import parse_row_dates, to_date
+from parseo_numeros import parse_decimal, parse_row_columns
+
 try:
     import pandas as pd
+    import ventas_tipadas
     HAS_PANDAS = True
 except ImportError:
     HAS_PANDAS = False
@@ -26,37 +30,6 @@ VENTAS_CSV = "inputs/ventas_historicas_items.csv"
 OUTPUT_EXCEL = "MEGA_ANALISIS_Completo_TradeUnity.xlsx"
 
 
-def parse_decimal(value: str) -> Decimal:
-    """Convierte string a Decimal."""
-    if not value or value == "":
-        return Decimal("0")
-    
-    value_str = str(value).strip().replace("$", "").replace(" ", "").replace("%", "")
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return Decimal(value_str)
-    except (InvalidOperation, ValueError):
-        return Decimal("0")
-
-
-def parse_date(date_str: str) -> date:
-    """Parsea fecha en varios formatos."""
-    if not date_str or date_str == "":
-        return None
-    
-    date_str = str(date_str).strip()
-    
-    formats = ["%Y-%m-%d", "%d/%m/%Y", "%m/%d/%y", "%d/%m/%Y %H:%M"]
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str, fmt).date()
-        except:
-            continue
-    
-    return None
-
-
 def days_since_today(target_date: date) -> int:
     """Calcula días desde hoy."""
     if not target_date:
@@ -132,38 +105,50 @@ def load_catalog():
     catalog = {}
     
     with open(CATALOGO_TU, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            sku = str(row.get('sku', '')).strip().upper()
-            d365_ref = str(row.get('Código de Producto (D365)', '')).strip()
-            
-            if not sku:
-                continue
-            
-            catalog[sku] = {
-                'sku': sku,
-                'd365_reference': d365_ref,
-                'nombre': str(row.get('Nombre del Producto', '')).strip(),
-                'marca': str(row.get('Marca', '')).strip(),
-                'categoria_2': str(row.get('Categoría (2° Nivel)', '')).strip(),
-                'categoria_ultima': str(row.get('Categoría (Ultimo Nivel)', '')).strip(),
-                'cantidad_paquete': parse_decimal(row.get('Cantidad por Paquete Comercial', '')),
-                'fob_unitario': parse_decimal(row.get('Costo FOB (Unitario)', '')),
-                'precio_plataforma_unitario': parse_decimal(row.get('Precio Plataforma (Unitario) – CEG', '')),
-                'precio_plataforma_caja': parse_decimal(row.get('Precio Plataforma (Caja) – CEG', '')),
-                'volumen_box': parse_decimal(row.get('Volumen (box)', '')),
-                'fecha_importacion': row.get('Fecha de última importación CEG', '').strip(),
-                'clasificacion_impo': str(row.get('Clasificacion IMPO', '')).strip(),
-                'fecha_recepcion': row.get('Fecha de última recepción CEG', '').strip(),
-                'clasificacion_recep': str(row.get('Clasificacion RECEP', '')).strip(),
-                'dias_impo': row.get('Días desde última impo CEG', '').strip(),
-                'dias_recep': row.get('Días desde última recep CEG', '').strip(),
-                'tipo_marca': str(row.get('Tipo de Marca', '')).strip(),
-                'ean': str(row.get('EAN', '')).strip(),
-            }
-            
-            if d365_ref:
-                catalog[d365_ref] = catalog[sku]
+        rows = list(csv.DictReader(f))
+    numbers = parse_row_columns(rows, [
+        'Cantidad por Paquete Comercial',
+        'Costo FOB (Unitario)',
+        'Precio Plataforma (Unitario) – CEG',
+        'Precio Plataforma (Caja) – CEG',
+        'Volumen (box)',
+    ], source=CATALOGO_TU)
+    dates = parse_row_dates(rows, ['Fecha de última importación CEG', 'Fecha de última recepción CEG'],
+                            source=CATALOGO_TU)
+    
+    for i, row in enumerate(rows):
+        sku = str(row.get('sku', '')).strip().upper()
+        d365_ref = str(row.get('Código de Producto (D365)', '')).strip()
+        
+        if not sku:
+            continue
+        
+        catalog[sku] = {
+            'sku': sku,
+            'd365_reference': d365_ref,
+            'nombre': str(row.get('Nombre del Producto', '')).strip(),
+            'marca': str(row.get('Marca', '')).strip(),
+            'categoria_2': str(row.get('Categoría (2° Nivel)', '')).strip(),
+            'categoria_ultima': str(row.get('Categoría (Ultimo Nivel)', '')).strip(),
+            'cantidad_paquete': numbers['Cantidad por Paquete Comercial'][i],
+            'fob_unitario': numbers['Costo FOB (Unitario)'][i],
+            'precio_plataforma_unitario': numbers['Precio Plataforma (Unitario) – CEG'][i],
+            'precio_plataforma_caja': numbers['Precio Plataforma (Caja) – CEG'][i],
+            'volumen_box': numbers['Volumen (box)'][i],
+            'fecha_importacion': row.get('Fecha de última importación CEG', '').strip(),
+            'fecha_impo': to_date(dates['Fecha de última importación CEG'][i]),
+            'clasificacion_impo': str(row.get('Clasificacion IMPO', '')).strip(),
+            'fecha_recepcion': row.get('Fecha de última recepción CEG', '').strip(),
+            'fecha_recep': to_date(dates['Fecha de última recepción CEG'][i]),
+            'clasificacion_recep': str(row.get('Clasificacion RECEP', '')).strip(),
+            'dias_impo': row.get('Días desde última impo CEG', '').strip(),
+            'dias_recep': row.get('Días desde última recep CEG', '').strip(),
+            'tipo_marca': str(row.get('Tipo de Marca', '')).strip(),
+            'ean': str(row.get('EAN', '')).strip(),
+        }
+        
+        if d365_ref:
+            catalog[d365_ref] = catalog[sku]
     
     print(f"   ✅ {len(catalog)} productos cargados")
     return catalog
@@ -176,22 +161,24 @@ def load_stock():
     stock_data = []
     
     with open(STOCK_ERP, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            d365_ref = str(row.get('D365 Reference', '')).strip()
-            stock_cajas = parse_decimal(row.get('Pronosticado con pendiente', ''))
-            box_qty = parse_decimal(row.get('Box Qty', ''))
-            volumen = parse_decimal(row.get('Volumen', ''))
-            
-            if not d365_ref or stock_cajas == 0:
-                continue
-            
-            stock_data.append({
-                'd365_reference': d365_ref,
-                'stock_cajas': stock_cajas,
-                'box_qty': box_qty,
-                'volumen': volumen,
-            })
+        rows = list(csv.DictReader(f))
+    numbers = parse_row_columns(rows, ['Pronosticado con pendiente', 'Box Qty', 'Volumen'], source=STOCK_ERP)
+    
+    for i, row in enumerate(rows):
+        d365_ref = str(row.get('D365 Reference', '')).strip()
+        stock_cajas = numbers['Pronosticado con pendiente'][i]
+        box_qty = numbers['Box Qty'][i]
+        volumen = numbers['Volumen'][i]
+        
+        if not d365_ref or stock_cajas == 0:
+            continue
+        
+        stock_data.append({
+            'd365_reference': d365_ref,
+            'stock_cajas': stock_cajas,
+            'box_qty': box_qty,
+            'volumen': volumen,
+        })
     
     print(f"   ✅ {len(stock_data)} productos con stock")
     return stock_data
@@ -213,34 +200,30 @@ def load_ventas():
         'total_facturado': Decimal('0'),
     })
     
-    with open(VENTAS_CSV, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            sku = str(row.get('SKU', '')).strip().upper()
-            if not sku:
-                continue
-            
-            ventas_por_sku[sku]['vendido'] = True
-            ventas_por_sku[sku]['clientes_unicos'].add(row.get('Email Cliente', ''))
-            ventas_por_sku[sku]['ordenes_unicas'].add(row.get('Número de Orden', ''))
-            
-            cantidad_cajas = parse_decimal(row.get('Cantidad', ''))
-            cantidad_unidades = parse_decimal(row.get('Cantidad Unitarias', ''))
-            precio_unitario = parse_decimal(row.get('Precio Venta Unitario', ''))
-            precio_caja = parse_decimal(row.get('Precio Venta', ''))
-            fecha_venta = parse_date(row.get('Fecha Creación', ''))
-            total_item = parse_decimal(row.get('Total Item con IVA', ''))
-            
-            ventas_por_sku[sku]['cantidad_cajas'] += cantidad_cajas
-            ventas_por_sku[sku]['cantidad_unidades'] += cantidad_unidades
-            ventas_por_sku[sku]['total_facturado'] += total_item
-            
-            if precio_unitario > 0:
-                ventas_por_sku[sku]['precios_unitarios'].append(precio_unitario)
-            if precio_caja > 0:
-                ventas_por_sku[sku]['precios_caja'].append(precio_caja)
-            if fecha_venta:
-                ventas_por_sku[sku]['fechas_venta'].append(fecha_venta)
+    # Ventas ya tipadas (ventas_tipadas): montos como Decimal, fechas como date
+    rows = ventas_tipadas.ventas_records(ventas_tipadas.load_ventas(VENTAS_CSV), [
+        'SKU', 'Email Cliente', 'Número de Orden', 'Cantidad', 'Cantidad Unitarias',
+        'Precio Venta Unitario', 'Precio Venta', 'Fecha Creación', 'Total Item con IVA',
+    ])
+    for row in rows:
+        sku = row['SKU'].strip().upper()
+        if not sku:
+            continue
+        
+        ventas_por_sku[sku]['vendido'] = True
+        ventas_por_sku[sku]['clientes_unicos'].add(row['Email Cliente'])
+        ventas_por_sku[sku]['ordenes_unicas'].add(row['Número de Orden'])
+        
+        ventas_por_sku[sku]['cantidad_cajas'] += row['Cantidad']
+        ventas_por_sku[sku]['cantidad_unidades'] += row['Cantidad Unitarias']
+        ventas_por_sku[sku]['total_facturado'] += row['Total Item con IVA']
+        
+        if row['Precio Venta Unitario'] > 0:
+            ventas_por_sku[sku]['precios_unitarios'].append(row['Precio Venta Unitario'])
+        if row['Precio Venta'] > 0:
+            ventas_por_sku[sku]['precios_caja'].append(row['Precio Venta'])
+        if row['Fecha Creación']:
+            ventas_por_sku[sku]['fechas_venta'].append(row['Fecha Creación'])
     
     print(f"   ✅ {len(ventas_por_sku)} SKUs con datos de ventas")
     return ventas_por_sku
@@ -280,8 +263,10 @@ def generate_complete_analysis():
                 'precio_plataforma_caja': Decimal('0'),
                 'volumen_box': stock['volumen'],
                 'fecha_importacion': '',
+                'fecha_impo': None,
                 'clasificacion_impo': '',
                 'fecha_recepcion': '',
+                'fecha_recep': None,
                 'clasificacion_recep': '',
                 'dias_impo': '',
                 'dias_recep': '',
@@ -297,8 +282,8 @@ def generate_complete_analysis():
         stock_unidades = stock_cajas * box_qty
         
         # Parsear fechas
-        fecha_impo = parse_date(product['fecha_importacion'])
-        fecha_recep = parse_date(product['fecha_recepcion'])
+        fecha_impo = product['fecha_impo']
+        fecha_recep = product['fecha_recep']
         
         dias_impo = days_since_today(fecha_impo) if fecha_impo else None
         dias_recep = days_since_today(fecha_recep) if fecha_recep else None
@@ -543,9 +528,12 @@ def generate_complete_analysis():
 if __name__ == "__main__":
     if not HAS_PANDAS:
         print("Instalando pandas...")
+        import os
         import subprocess
+        import sys
         subprocess.check_call(["pip3", "install", "pandas", "openpyxl", "--break-system-packages"])
-        import pandas as pd
+        # Los imports protegidos por HAS_PANDAS quedaron sin definir: se relanza el script
+        os.execv(sys.executable, [sys.executable] + sys.argv)
     
     print("🔄 Iniciando análisis completo de inventario y ventas...")
     generate_complete_analysis()
@@ -18,11 +18,15 @@ Analiza:
 
 import csv
 import re
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal
 from datetime import datetime, date
 from collections import defaultdict
 import pandas as pd
 
+import ventas_tipadas
+from parseo_fechas import parse_dates
+from parseo_numeros import parse_frame_numbers, parse_numbers, parse_row_columns, warn_invalid
+
 # Archivos
 PUBLICACIONES_CSV = "fuentes/publicaciones_productos.csv"
 CEG_PRODUCTOS_CSV = "fuentes/precios_plataforma_ceg.csv"
@@ -34,20 +38,6 @@ OUTPUT_DIR = "outputs"
 OUTPUT_EXCEL = f"{OUTPUT_DIR}/TradeUnity Pricing Intelligence.xlsx"
 
 
-def parse_decimal(value: str) -> Decimal:
-    """Convierte string a Decimal."""
-    if not value or value == "":
-        return Decimal("0")
-    
-    value_str = str(value).strip().replace("$", "").replace(" ", "").replace("%", "")
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return Decimal(value_str)
-    except (InvalidOperation, ValueError):
-        return Decimal("0")
-
-
 def clean_period_name(column_name: str) -> str:
     """Limpia y unifica nombres de períodos para mayor legibilidad."""
     name = column_name
@@ -209,18 +199,20 @@ def load_ceg_prices():
     ceg_prices = {}
     
     with open(CEG_PRODUCTOS_CSV, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            sku = str(row.get('sku', '')).strip().upper()
-            base_price = parse_decimal(row.get('base_price', ''))
-            fob = parse_decimal(row.get('fob', ''))
-            
-            if sku:
-                ceg_prices[sku] = {
-                    'base_price': base_price,  # Precio Plataforma
-                    'fob': fob,
-                    'precio_normal_tu': base_price * Decimal('1.25'),  # Precio normal Trade Unity
-                }
+        rows = list(csv.DictReader(f))
+    numbers = parse_row_columns(rows, ['base_price', 'fob'], source=CEG_PRODUCTOS_CSV)
+    
+    for i, row in enumerate(rows):
+        sku = str(row.get('sku', '')).strip().upper()
+        base_price = numbers['base_price'][i]
+        fob = numbers['fob'][i]
+        
+        if sku:
+            ceg_prices[sku] = {
+                'base_price': base_price,  # Precio Plataforma
+                'fob': fob,
+                'precio_normal_tu': base_price * Decimal('1.25'),  # Precio normal Trade Unity
+            }
     
     print(f"   ✅ {len(ceg_prices)} productos con precios CEG cargados")
     return ceg_prices
@@ -230,7 +222,7 @@ def load_publicaciones():
     """Carga publicaciones y estructura por períodos."""
     print("📖 Cargando publicaciones de productos...")
     
-    df = pd.read_csv(PUBLICACIONES_CSV, encoding='utf-8-sig')
+    df = pd.read_csv(PUBLICACIONES_CSV, encoding='utf-8-sig', dtype=str)
     
     publicaciones_data = []
     periodos_info = []
@@ -264,6 +256,14 @@ def load_publicaciones():
     # Ordenar períodos por fecha
     periodos_info.sort(key=lambda x: x['fecha_inicio'] if x['fecha_inicio'] else date(2099, 12, 31))
     
+    # Precios por columna (formato detectado por columna; vacíos y no parseables = 0)
+    precios = {}
+    for periodo in periodos_info:
+        col = periodo['columna']
+        parsed = parse_numbers(df[col], as_decimal=True)
+        warn_invalid(col, parsed, PUBLICACIONES_CSV)
+        precios[col] = parsed.values.fillna(Decimal('0'))
+    
     # Procesar cada producto
     for idx, row in df.iterrows():
         sku = str(row.get('sku', '')).strip().upper()
@@ -272,19 +272,16 @@ def load_publicaciones():
         
         # Para cada período, extraer precio publicado
         for periodo in periodos_info:
-            precio_str = str(row.get(periodo['columna'], '')).strip()
+            precio_publicado = precios[periodo['columna']][idx]
             
-            if precio_str and precio_str not in ['', 'nan', 'None']:
-                precio_publicado = parse_decimal(precio_str)
-                
-                if precio_publicado > 0:
-                    publicaciones_data.append({
-                        'sku': sku,
-                        'periodo': periodo['nombre_periodo'],
-                        'fecha_inicio': periodo['fecha_inicio'],
-                        'fecha_fin': periodo['fecha_fin'],
-                        'precio_publicado': precio_publicado,
-                    })
+            if precio_publicado > 0:
+                publicaciones_data.append({
+                    'sku': sku,
+                    'periodo': periodo['nombre_periodo'],
+                    'fecha_inicio': periodo['fecha_inicio'],
+                    'fecha_fin': periodo['fecha_fin'],
+                    'precio_publicado': precio_publicado,
+                })
     
     print(f"   ✅ {len(publicaciones_data)} publicaciones cargadas")
     return publicaciones_data, periodos_info
@@ -307,23 +304,15 @@ def load_ventas():
         print("   ✅ DataFrame vacío creado (sin datos de ventas históricas)")
         return df
     
-    df = pd.read_csv(VENTAS_CSV, encoding='utf-8-sig')
+    # Fechas y numéricos ya vienen tipados (ventas_tipadas); los vacíos cuentan como 0
+    df = ventas_tipadas.load_ventas(VENTAS_CSV)
     
-    # Convertir fecha si existe
-    if 'Fecha Creación' in df.columns:
-        df['Fecha Creación'] = pd.to_datetime(df['Fecha Creación'], errors='coerce')
-    
-    # Convertir columnas numéricas
     numeric_cols = ['Precio Original', 'Precio Venta', 'Precio Venta Unitario', 
                     'Total Item', 'Total Item con IVA', 'Cantidad Unitarias']
     
     for col in numeric_cols:
         if col in df.columns:
-            df[col] = df[col].astype(str).str.replace(',', '.').str.replace('$', '').str.strip()
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-    
-    # Convertir fechas
-    df['Fecha Creación'] = pd.to_datetime(df['Fecha Creación'], errors='coerce')
+            df[col] = df[col].fillna(0)
     
     print(f"   ✅ {len(df)} registros de ventas cargados")
     return df
@@ -564,7 +553,7 @@ def analyze_pricing_impact(publicaciones_data, ceg_prices, ventas_df, periodos_i
     else:
         # Asegurar que Fecha Creación sea datetime
         if not pd.api.types.is_datetime64_any_dtype(ventas_df['Fecha Creación']):
-            ventas_df['Fecha Creación'] = pd.to_datetime(ventas_df['Fecha Creación'], errors='coerce')
+            ventas_df['Fecha Creación'] = parse_dates(ventas_df['Fecha Creación']).values
         
         ventas_2024 = ventas_df[ventas_df['Fecha Creación'].dt.year == 2024]
         ventas_2025 = ventas_df[
@@ -613,12 +602,7 @@ def analyze_pricing_impact(publicaciones_data, ceg_prices, ventas_df, periodos_i
     # Cargar stock
     try:
         stock_df = pd.read_csv(STOCK_ERP, encoding='utf-8-sig')
-        stock_df['Pronosticado con pendiente'] = pd.to_numeric(
-            stock_df['Pronosticado con pendiente'].astype(str).str.replace(',', '.'), errors='coerce'
-        )
-        stock_df['Box Qty'] = pd.to_numeric(
-            stock_df['Box Qty'].astype(str).str.replace(',', '.'), errors='coerce'
-        )
+        parse_frame_numbers(stock_df, ['Pronosticado con pendiente', 'Box Qty'], fill=float('nan'), source=STOCK_ERP)
         
         # Cargar catálogo para mapear D365 a SKU
         catalogo_df = pd.read_csv(CATALOGO_TU, encoding='utf-8-sig')
@@ -702,14 +686,13 @@ def generate_commercial_intelligence():
 
 
 if __name__ == "__main__":
+    # pandas ya se importa arriba; openpyxl lo carga pandas recién al escribir el Excel
     try:
-        import pandas as pd
-        import openpyxl
+        import openpyxl  # noqa: F401
     except ImportError:
         print("Instalando dependencias...")
         import subprocess
-        subprocess.check_call(["pip3", "install", "pandas", "openpyxl", "--break-system-packages"])
-        import pandas as pd
+        subprocess.check_call(["pip3", "install", "openpyxl", "--break-system-packages"])
     
     generate_commercial_intelligence()
     print("\n✨ Proceso completado!")
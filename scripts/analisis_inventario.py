@@ -18,10 +18,13 @@ Análisis generado:
 """
 
 import csv
-from decimal import Decimal, InvalidOperation
-from datetime import datetime, date
+from decimal import Decimal
+from datetime import date
 from collections import defaultdict
 
+from parseo_fechas import parse_row_dates, to_date
+from parseo_numeros import parse_decimal, parse_row_columns
+
 try:
     import pandas as pd
     HAS_PANDAS = True
@@ -36,48 +39,6 @@ OUTPUT_DIR = "outputs"
 OUTPUT_EXCEL = f"{OUTPUT_DIR}/TradeUnity Inventory Deep Dive.xlsx"
 
 
-def parse_decimal(value: str) -> Decimal:
-    """Convierte string a Decimal."""
-    if not value or value == "":
-        return Decimal("0")
-    
-    value_str = str(value).strip().replace("$", "").replace(" ", "").replace("%", "")
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return Decimal(value_str)
-    except (InvalidOperation, ValueError):
-        return Decimal("0")
-
-
-def parse_date(date_str: str) -> date:
-    """Parsea fecha en varios formatos."""
-    if not date_str or date_str == "":
-        return None
-    
-    date_str = str(date_str).strip()
-    
-    # Formato YYYY-MM-DD
-    try:
-        return datetime.strptime(date_str, "%Y-%m-%d").date()
-    except:
-        pass
-    
-    # Formato DD/MM/YYYY
-    try:
-        return datetime.strptime(date_str, "%d/%m/%Y").date()
-    except:
-        pass
-    
-    # Formato M/D/YY
-    try:
-        return datetime.strptime(date_str, "%m/%d/%y").date()
-    except:
-        pass
-    
-    return None
-
-
 def days_since_today(target_date: date) -> int:
     """Calcula días desde hoy."""
     if not target_date:
@@ -177,39 +138,51 @@ def load_catalog():
     catalog = {}
     
     with open(CATALOGO_TU, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            sku = str(row.get('sku', '')).strip().upper()
-            d365_ref = str(row.get('Código de Producto (D365)', '')).strip()
-            
-            if not sku:
-                continue
-            
-            catalog[sku] = {
-                'sku': sku,
-                'd365_reference': d365_ref,
-                'nombre': str(row.get('Nombre del Producto', '')).strip(),
-                'marca': str(row.get('Marca', '')).strip(),
-                'categoria_2': str(row.get('Categoría (2° Nivel)', '')).strip(),
-                'categoria_ultima': str(row.get('Categoría (Ultimo Nivel)', '')).strip(),
-                'cantidad_paquete': parse_decimal(row.get('Cantidad por Paquete Comercial', '')),
-                'fob_unitario': parse_decimal(row.get('Costo FOB (Unitario)', '')),
-                'precio_plataforma_unitario': parse_decimal(row.get('Precio Plataforma (Unitario) – CEG', '')),
-                'precio_plataforma_caja': parse_decimal(row.get('Precio Plataforma (Caja) – CEG', '')),
-                'volumen_box': parse_decimal(row.get('Volumen (box)', '')),
-                'fecha_importacion': row.get('Fecha de última importación CEG', '').strip(),
-                'clasificacion_impo': str(row.get('Clasificacion IMPO', '')).strip(),
-                'fecha_recepcion': row.get('Fecha de última recepción CEG', '').strip(),
-                'clasificacion_recep': str(row.get('Clasificacion RECEP', '')).strip(),
-                'dias_impo': row.get('Días desde última impo CEG', '').strip(),
-                'dias_recep': row.get('Días desde última recep CEG', '').strip(),
-                'tipo_marca': str(row.get('Tipo de Marca', '')).strip(),
-                'ean': str(row.get('EAN', '')).strip(),
-            }
-            
-            # También indexar por D365 Reference
-            if d365_ref:
-                catalog[d365_ref] = catalog[sku]
+        rows = list(csv.DictReader(f))
+    numbers = parse_row_columns(rows, [
+        'Cantidad por Paquete Comercial',
+        'Costo FOB (Unitario)',
+        'Precio Plataforma (Unitario) – CEG',
+        'Precio Plataforma (Caja) – CEG',
+        'Volumen (box)',
+    ], source=CATALOGO_TU)
+    dates = parse_row_dates(rows, ['Fecha de última importación CEG', 'Fecha de última recepción CEG'],
+                            source=CATALOGO_TU)
+    
+    for i, row in enumerate(rows):
+        sku = str(row.get('sku', '')).strip().upper()
+        d365_ref = str(row.get('Código de Producto (D365)', '')).strip()
+        
+        if not sku:
+            continue
+        
+        catalog[sku] = {
+            'sku': sku,
+            'd365_reference': d365_ref,
+            'nombre': str(row.get('Nombre del Producto', '')).strip(),
+            'marca': str(row.get('Marca', '')).strip(),
+            'categoria_2': str(row.get('Categoría (2° Nivel)', '')).strip(),
+            'categoria_ultima': str(row.get('Categoría (Ultimo Nivel)', '')).strip(),
+            'cantidad_paquete': numbers['Cantidad por Paquete Comercial'][i],
+            'fob_unitario': numbers['Costo FOB (Unitario)'][i],
+            'precio_plataforma_unitario': numbers['Precio Plataforma (Unitario) – CEG'][i],
+            'precio_plataforma_caja': numbers['Precio Plataforma (Caja) – CEG'][i],
+            'volumen_box': numbers['Volumen (box)'][i],
+            'fecha_importacion': row.get('Fecha de última importación CEG', '').strip(),
+            'fecha_impo': to_date(dates['Fecha de última importación CEG'][i]),
+            'clasificacion_impo': str(row.get('Clasificacion IMPO', '')).strip(),
+            'fecha_recepcion': row.get('Fecha de última recepción CEG', '').strip(),
+            'fecha_recep': to_date(dates['Fecha de última recepción CEG'][i]),
+            'clasificacion_recep': str(row.get('Clasificacion RECEP', '')).strip(),
+            'dias_impo': row.get('Días desde última impo CEG', '').strip(),
+            'dias_recep': row.get('Días desde última recep CEG', '').strip(),
+            'tipo_marca': str(row.get('Tipo de Marca', '')).strip(),
+            'ean': str(row.get('EAN', '')).strip(),
+        }
+        
+        # También indexar por D365 Reference
+        if d365_ref:
+            catalog[d365_ref] = catalog[sku]
     
     print(f"   ✅ {len(catalog)} productos cargados del catálogo")
     return catalog
@@ -222,23 +195,25 @@ def load_stock():
     stock_data = []
     
     with open(STOCK_ERP, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            d365_ref = str(row.get('D365 Reference', '')).strip()
-            stock_cajas = parse_decimal(row.get('Pronosticado con pendiente', ''))
-            box_qty = parse_decimal(row.get('Box Qty', ''))
-            volumen = parse_decimal(row.get('Volumen', ''))
-            
-            if not d365_ref or stock_cajas == 0:
-                continue
-            
-            stock_data.append({
-                'd365_reference': d365_ref,
-                'stock_cajas': stock_cajas,
-                'box_qty': box_qty,
-                'volumen': volumen,
-                'nombre_erp': str(row.get('Nombre', '')).strip(),
-            })
+        rows = list(csv.DictReader(f))
+    numbers = parse_row_columns(rows, ['Pronosticado con pendiente', 'Box Qty', 'Volumen'], source=STOCK_ERP)
+    
+    for i, row in enumerate(rows):
+        d365_ref = str(row.get('D365 Reference', '')).strip()
+        stock_cajas = numbers['Pronosticado con pendiente'][i]
+        box_qty = numbers['Box Qty'][i]
+        volumen = numbers['Volumen'][i]
+        
+        if not d365_ref or stock_cajas == 0:
+            continue
+        
+        stock_data.append({
+            'd365_reference': d365_ref,
+            'stock_cajas': stock_cajas,
+            'box_qty': box_qty,
+            'volumen': volumen,
+            'nombre_erp': str(row.get('Nombre', '')).strip(),
+        })
     
     print(f"   ✅ {len(stock_data)} productos con stock cargado")
     return stock_data
@@ -252,18 +227,20 @@ def load_ceg_prices():
     
     try:
         with open(CEG_PRODUCTOS_CSV, 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                sku = str(row.get('sku', '')).strip().upper()
-                base_price = parse_decimal(row.get('base_price', ''))
-                fob = parse_decimal(row.get('fob', ''))
-                
-                if sku:
-                    ceg_prices[sku] = {
-                        'base_price': base_price,
-                        'fob': fob,
-                        'precio_normal_tu': base_price * Decimal('1.25'),
-                    }
+            rows = list(csv.DictReader(f))
+        numbers = parse_row_columns(rows, ['base_price', 'fob'], source=CEG_PRODUCTOS_CSV)
+        
+        for i, row in enumerate(rows):
+            sku = str(row.get('sku', '')).strip().upper()
+            base_price = numbers['base_price'][i]
+            fob = numbers['fob'][i]
+            
+            if sku:
+                ceg_prices[sku] = {
+                    'base_price': base_price,
+                    'fob': fob,
+                    'precio_normal_tu': base_price * Decimal('1.25'),
+                }
         
         print(f"   ✅ {len(ceg_prices)} productos con precios CEG cargados")
     except FileNotFoundError:
@@ -311,8 +288,10 @@ def generate_inventory_analysis():
                 'precio_plataforma_caja': Decimal('0'),
                 'volumen_box': stock['volumen'],
                 'fecha_importacion': '',
+                'fecha_impo': None,
                 'clasificacion_impo': '',
                 'fecha_recepcion': '',
+                'fecha_recep': None,
                 'clasificacion_recep': '',
                 'dias_impo': '',
                 'dias_recep': '',
@@ -326,8 +305,8 @@ def generate_inventory_analysis():
         stock_unidades = stock_cajas * box_qty
         
         # Parsear fechas
-        fecha_impo = parse_date(product['fecha_importacion'])
-        fecha_recep = parse_date(product['fecha_recepcion'])
+        fecha_impo = product['fecha_impo']
+        fecha_recep = product['fecha_recep']
         
         dias_impo = days_since_today(fecha_impo) if fecha_impo else None
         dias_recep = days_since_today(fecha_recep) if fecha_recep else None
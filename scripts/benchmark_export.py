@@ -0,0 +1,202 @@
+"""
+Benchmark de export_ventas_tradeunity.main() contra fake_magento_server.py (sin red).
+
+Para cada escenario levanta el fake Magento en un proceso aparte, corre main() en otro proceso
+(módulo limpio, sin cache de corridas anteriores salvo que el escenario lo pida) y reporta:
+  pages/s  -> páginas de orders servidas OK / segundos
+  SKUs/s   -> SKUs únicos del RAW / segundos
+  retries  -> 429/5xx inyectados por el server (cada uno es un reintento del cliente)
+  peak MB  -> pico de memoria (RSS) del proceso que corrió main()
+Escribe el resultado también en BENCH_JSON para comparar corridas.
+
+Uso: python scripts/benchmark_export.py
+"""
+
+import contextlib
+import io
+import json
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_magento_server  # noqa: E402
+
+# =========================================================
+# HARDCODE
+# =========================================================
+BENCH_PORT = 8799
+BENCH_JSON = "benchmark_export.json"
+SHOW_EXPORT_OUTPUT = False     # True = no silenciar prints/tqdm del export
+
+# Server por defecto (se pisa por escenario con "server")
+BENCH_SERVER = {
+    "n_orders": 3000,
+    "n_products": 1500,
+    "latency_ms": 30,
+    "latency_jitter_ms": 30,
+    "padding": 4000,
+}
+
+# Cada escenario: "server" pisa BENCH_SERVER, "export" pisa constantes del export,
+# "warm" = reusa el directorio de trabajo del escenario anterior (mirror, cache HTTP, RAW).
+SCENARIOS: List[Dict[str, Any]] = [
+    {"name": "async frío", "export": {"EXPORT_ENGINE": "async"}},
+    {"name": "async caliente (cache + mirror + incremental)", "export": {"EXPORT_ENGINE": "async"}, "warm": True},
+    {"name": "threads frío", "export": {"EXPORT_ENGINE": "threads"}},
+    {"name": "async sin fields=", "export": {"EXPORT_ENGINE": "async", "FIELD_PROJECTION": False}},
+    {"name": "async enrich en pasos (sin pipeline)", "export": {"EXPORT_ENGINE": "async", "STREAM_ENRICH": False}},
+    {"name": "async offset caro", "export": {"EXPORT_ENGINE": "async"}, "server": {"offset_cost_ms": 40}},
+    {"name": "async offset caro + sharded", "export": {"EXPORT_ENGINE": "async", "SHARDED_EXPORT": True},
+     "server": {"offset_cost_ms": 40}},
+    {"name": "async 429 10% + 5xx 2%", "export": {"EXPORT_ENGINE": "async"},
+     "server": {"error_rate_429": 0.10, "error_rate_5xx": 0.02}},
+    {"name": "threads 429 10% + 5xx 2%", "export": {"EXPORT_ENGINE": "threads"},
+     "server": {"error_rate_429": 0.10, "error_rate_5xx": 0.02}},
+]
+
+
+# =========================================================
+# Procesos
+# =========================================================
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _run_export(workdir: str, base_url: str, overrides: Dict[str, Any], quiet: bool, out: "mp.Queue"):
+    """Corre en un proceso hijo: importa el export limpio, lo apunta al fake y mide main()."""
+    os.chdir(workdir)
+    import export_ventas_tradeunity as ex
+
+    ex.API_URL = f"{base_url}/rest/V1/orders"
+    ex.REST_ROOT = f"{base_url}/rest/V1"
+    for k, v in overrides.items():
+        setattr(ex, k, v)
+
+    sink = io.StringIO()
+    redirect = (contextlib.redirect_stdout(sink), contextlib.redirect_stderr(sink)) if quiet else ()
+    error = None
+    t0 = time.perf_counter()
+    try:
+        with contextlib.ExitStack() as stack:
+            for r in redirect:
+                stack.enter_context(r)
+            ex.main()
+    except BaseException as e:  # SystemExit incluido
+        error = f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - t0
+
+    skus = set()
+    rows = 0
+    if os.path.exists(ex.RAW_CSV):
+        import csv
+        with open(ex.RAW_CSV, newline="", encoding="utf-8") as f:
+            r = csv.reader(f)
+            next(r, None)
+            for row in r:
+                rows += 1
+                skus.add(row[ex.SKU_IDX])
+    out.put({"elapsed": elapsed, "rows": rows, "skus": len(skus), "peak_mb": _peak_rss_mb(), "error": error})
+
+def _serve(**config):
+    fake_magento_server.make_server(**config).serve_forever()
+
+def _start_server(config: Dict[str, Any]) -> mp.Process:
+    proc = mp.Process(target=_serve, kwargs=dict(config, port=BENCH_PORT), daemon=True)
+    proc.start()
+    base = f"http://127.0.0.1:{BENCH_PORT}"
+    for _ in range(200):
+        try:
+            requests.get(f"{base}/__stats", timeout=1)
+            return proc
+        except requests.RequestException:
+            time.sleep(0.05)
+    proc.terminate()
+    raise SystemExit("El fake Magento no levantó")
+
+def run_scenario(sc: Dict[str, Any], workdir: str) -> Dict[str, Any]:
+    server_cfg = dict(BENCH_SERVER, **sc.get("server", {}))
+    base = f"http://127.0.0.1:{BENCH_PORT}"
+    server = _start_server(server_cfg)
+    try:
+        out: mp.Queue = mp.Queue()
+        child = mp.Process(target=_run_export, args=(workdir, base, sc.get("export", {}), not SHOW_EXPORT_OUTPUT, out))
+        child.start()
+        res = out.get()
+        child.join()
+        stats = requests.get(f"{base}/__stats", timeout=5).json()
+    finally:
+        server.terminate()
+        server.join()
+
+    # páginas de orders servidas OK (incluye la de sanity check de main)
+    pages_ok = stats["requests"].get("orders", {}).get("200", 0)
+    elapsed = res["elapsed"] or 1e-9
+    return {
+        "name": sc["name"],
+        "elapsed_s": round(elapsed, 2),
+        "order_pages": pages_ok,
+        "pages_per_s": round(pages_ok / elapsed, 1),
+        "rows": res["rows"],
+        "skus": res["skus"],
+        "skus_per_s": round(res["skus"] / elapsed, 1),
+        "retries": stats["injected_errors"],
+        "requests": sum(sum(by_status.values()) for by_status in stats["requests"].values()),
+        "requests_by_endpoint": stats["requests"],
+        "mb_downloaded": round(stats["bytes_out"] / (1024 * 1024), 2),
+        "peak_mb": round(res["peak_mb"], 1) if res["peak_mb"] is not None else None,
+        "error": res["error"],
+    }
+
+
+# =========================================================
+# Main
+# =========================================================
+def print_table(results: List[Dict[str, Any]]):
+    cols = [("escenario", "name", 44), ("seg", "elapsed_s", 7), ("pages/s", "pages_per_s", 8),
+            ("SKUs/s", "skus_per_s", 8), ("retries", "retries", 8), ("requests", "requests", 9),
+            ("MB", "mb_downloaded", 7), ("peak MB", "peak_mb", 8)]
+    print("  ".join(f"{t:<{w}}" if i == 0 else f"{t:>{w}}" for i, (t, _, w) in enumerate(cols)))
+    for r in results:
+        cells = []
+        for i, (_, k, w) in enumerate(cols):
+            v = "-" if r.get(k) is None else str(r[k])
+            cells.append(f"{v[:w]:<{w}}" if i == 0 else f"{v:>{w}}")
+        print("  ".join(cells))
+        if r["error"]:
+            print(f"    ERROR: {r['error']}")
+
+def main():
+    results = []
+    root = tempfile.mkdtemp(prefix="bench_export_")
+    workdir = None
+    try:
+        for i, sc in enumerate(SCENARIOS):
+            if not (sc.get("warm") and workdir):
+                workdir = os.path.join(root, f"run_{i}")
+                os.makedirs(workdir)
+            print(f"▶ {sc['name']} ...", flush=True)
+            results.append(run_scenario(sc, workdir))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print()
+    print_table(results)
+    with open(BENCH_JSON, "w", encoding="utf-8") as f:
+        json.dump({"server": BENCH_SERVER, "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"\nOK -> {BENCH_JSON}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,27 +5,15 @@ Cantidad Unitarias = Cantidad (cajas) × Cantidad por Paquete Comercial
 """
 
 import csv
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal
+
+from parseo_numeros import parse_decimal
 
 # Archivos
 INPUT_CSV = "ventas_historicas_items.csv"
 OUTPUT_CSV = "ventas_historicas_items.csv"
 
 
-def parse_decimal(value: str) -> Decimal:
-    """Convierte string con formato europeo (coma decimal) a Decimal."""
-    if not value or value == "":
-        return Decimal("0")
-    
-    value_str = str(value).strip().replace("$", "").replace(" ", "")
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return Decimal(value_str)
-    except (InvalidOperation, ValueError):
-        return Decimal("0")
-
-
 def format_decimal(value: Decimal, decimals: int = 0) -> str:
     """Formatea Decimal a string con formato europeo (coma decimal)."""
     if value == 0:
@@ -42,6 +30,54 @@ def format_decimal(value: Decimal, decimals: int = 0) -> str:
     return str(value).replace(".", ",")
 
 
+def add_header(headers: list) -> list:
+    """Agrega "Cantidad Unitarias" después de "Cantidad" (o al final)."""
+    headers = list(headers)
+    if "Cantidad Unitarias" not in headers:
+        # Encontrar posición de "Cantidad"
+        try:
+            cantidad_idx = headers.index("Cantidad")
+            headers.insert(cantidad_idx + 1, "Cantidad Unitarias")
+        except ValueError:
+            # Si no encuentra "Cantidad", agregar al final
+            headers.append("Cantidad Unitarias")
+    return headers
+
+
+def calculate_row(row: dict) -> bool:
+    """Cantidad Unitarias = Cantidad (cajas) × Cantidad por Paquete. True si se pudo calcular."""
+    # Obtener cantidad de cajas y cantidad por paquete
+    cantidad_cajas_str = row.get("Cantidad", "").strip()
+    cantidad_paquete_str = row.get("Cantidad por Paquete Comercial", "").strip()
+    
+    if not cantidad_cajas_str or cantidad_cajas_str == "":
+        row["Cantidad Unitarias"] = ""
+        return False
+    
+    if not cantidad_paquete_str or cantidad_paquete_str == "":
+        row["Cantidad Unitarias"] = ""
+        return False
+    
+    try:
+        cantidad_cajas = parse_decimal(cantidad_cajas_str)
+        cantidad_paquete = parse_decimal(cantidad_paquete_str)
+        
+        if cantidad_cajas == 0 or cantidad_paquete == 0:
+            row["Cantidad Unitarias"] = ""
+            return False
+        
+        # Calcular: Cantidad Unitarias = Cantidad (cajas) × Cantidad por Paquete
+        cantidad_unitarias = cantidad_cajas * cantidad_paquete
+        
+        # Guardar en formato entero (sin decimales)
+        row["Cantidad Unitarias"] = format_decimal(cantidad_unitarias, 0)
+        return True
+        
+    except Exception as e:
+        row["Cantidad Unitarias"] = ""
+        return False
+
+
 def calculate_unit_quantities():
     """Calcula cantidad unitarias multiplicando cantidad de cajas por cantidad por paquete."""
     
@@ -58,14 +94,7 @@ def calculate_unit_quantities():
     print(f"   ✅ {len(rows)} filas leídas")
     
     # Agregar columna "Cantidad Unitarias" después de "Cantidad"
-    if "Cantidad Unitarias" not in headers:
-        # Encontrar posición de "Cantidad"
-        try:
-            cantidad_idx = headers.index("Cantidad")
-            headers.insert(cantidad_idx + 1, "Cantidad Unitarias")
-        except ValueError:
-            # Si no encuentra "Cantidad", agregar al final
-            headers.append("Cantidad Unitarias")
+    headers = add_header(headers)
     
     # Estadísticas
     calculated_count = 0
@@ -74,39 +103,9 @@ def calculate_unit_quantities():
     print(f"\n🔄 Calculando cantidades unitarias...")
     
     for row in rows:
-        # Obtener cantidad de cajas y cantidad por paquete
-        cantidad_cajas_str = row.get("Cantidad", "").strip()
-        cantidad_paquete_str = row.get("Cantidad por Paquete Comercial", "").strip()
-        
-        if not cantidad_cajas_str or cantidad_cajas_str == "":
-            row["Cantidad Unitarias"] = ""
-            skipped_count += 1
-            continue
-        
-        if not cantidad_paquete_str or cantidad_paquete_str == "":
-            row["Cantidad Unitarias"] = ""
-            skipped_count += 1
-            continue
-        
-        try:
-            cantidad_cajas = parse_decimal(cantidad_cajas_str)
-            cantidad_paquete = parse_decimal(cantidad_paquete_str)
-            
-            if cantidad_cajas == 0 or cantidad_paquete == 0:
-                row["Cantidad Unitarias"] = ""
-                skipped_count += 1
-                continue
-            
-            # Calcular: Cantidad Unitarias = Cantidad (cajas) × Cantidad por Paquete
-            cantidad_unitarias = cantidad_cajas * cantidad_paquete
-            
-            # Guardar en formato entero (sin decimales)
-            row["Cantidad Unitarias"] = format_decimal(cantidad_unitarias, 0)
-            
+        if calculate_row(row):
             calculated_count += 1
-            
-        except Exception as e:
-            row["Cantidad Unitarias"] = ""
+        else:
             skipped_count += 1
     
     # Escribir CSV actualizado
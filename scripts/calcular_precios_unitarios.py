@@ -5,7 +5,9 @@ Divide los precios de Magento por "Cantidad por Paquete Comercial" para obtener
 """
 
 import csv
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal
+
+from parseo_numeros import parse_decimal
 
 # Archivos
 INPUT_CSV = "ventas_historicas_items.csv"
@@ -21,22 +23,12 @@ PRECIOS_POR_CAJA = [
 # Columna con la cantidad por paquete comercial
 COL_CANTIDAD_PAQUETE = "Cantidad por Paquete Comercial"
 
-
-def parse_decimal(value: str) -> Decimal:
-    """Convierte string con formato europeo (coma decimal) a Decimal."""
-    if not value or value == "":
-        return Decimal("0")
-    
-    # Limpiar: quitar espacios, signos, etc.
-    value_str = str(value).strip().replace("$", "").replace(" ", "")
-    
-    # Reemplazar coma por punto para Decimal
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return Decimal(value_str)
-    except (InvalidOperation, ValueError):
-        return Decimal("0")
+# Nuevas columnas para precios unitarios
+UNIT_PRICE_COLUMNS = [
+    "Precio Original Unitario",
+    "Precio Venta Unitario",
+    "Precio con IVA Unitario",
+]
 
 
 def format_decimal(value: Decimal) -> str:
@@ -48,6 +40,54 @@ def format_decimal(value: Decimal) -> str:
     return str(value).replace(".", ",")
 
 
+def calculate_row(row: dict, errors: list = None) -> bool:
+    """
+    Precios por caja / Cantidad por Paquete Comercial. True si se calcularon;
+    si no quedan vacíos (y el error, si hubo, se agrega a errors).
+    """
+    # Obtener cantidad por paquete comercial
+    cantidad_paquete_str = row.get(COL_CANTIDAD_PAQUETE, "").strip()
+    
+    if not cantidad_paquete_str or cantidad_paquete_str == "":
+        # Si no hay cantidad por paquete, dejar vacío
+        for col in UNIT_PRICE_COLUMNS:
+            row[col] = ""
+        return False
+    
+    try:
+        cantidad_paquete = parse_decimal(cantidad_paquete_str)
+        
+        if cantidad_paquete == 0:
+            # No se puede dividir por cero
+            for col in UNIT_PRICE_COLUMNS:
+                row[col] = ""
+            return False
+        
+        # Calcular precios unitarios
+        precio_original_caja = parse_decimal(row.get("Precio Original", ""))
+        precio_venta_caja = parse_decimal(row.get("Precio Venta", ""))
+        precio_iva_caja = parse_decimal(row.get("Precio con IVA", ""))
+        
+        # Dividir por cantidad por paquete
+        precio_original_unit = precio_original_caja / cantidad_paquete if precio_original_caja else Decimal("0")
+        precio_venta_unit = precio_venta_caja / cantidad_paquete if precio_venta_caja else Decimal("0")
+        precio_iva_unit = precio_iva_caja / cantidad_paquete if precio_iva_caja else Decimal("0")
+        
+        # Guardar en formato europeo
+        row["Precio Original Unitario"] = format_decimal(precio_original_unit)
+        row["Precio Venta Unitario"] = format_decimal(precio_venta_unit)
+        row["Precio con IVA Unitario"] = format_decimal(precio_iva_unit)
+        return True
+        
+    except Exception as e:
+        # Si hay error, dejar vacío
+        for col in UNIT_PRICE_COLUMNS:
+            row[col] = ""
+        if errors is not None:
+            errors.append(f"SKU {row.get('SKU', 'N/A')}: {str(e)}")
+        return False
+
+
 def calculate_unit_prices():
     """Calcula precios unitarios dividiendo precios por caja por cantidad por paquete."""
     
@@ -64,11 +104,7 @@ def calculate_unit_prices():
     print(f"   ✅ {len(rows)} filas leídas")
     
     # Agregar nuevas columnas para precios unitarios
-    new_columns = [
-        "Precio Original Unitario",
-        "Precio Venta Unitario",
-        "Precio con IVA Unitario",
-    ]
+    new_columns = UNIT_PRICE_COLUMNS
     
     new_headers = list(headers) + new_columns
     
@@ -80,49 +116,10 @@ def calculate_unit_prices():
     print(f"\n🔄 Calculando precios unitarios...")
     
     for row in rows:
-        # Obtener cantidad por paquete comercial
-        cantidad_paquete_str = row.get(COL_CANTIDAD_PAQUETE, "").strip()
-        
-        if not cantidad_paquete_str or cantidad_paquete_str == "":
-            # Si no hay cantidad por paquete, dejar vacío
-            for col in new_columns:
-                row[col] = ""
-            skipped_count += 1
-            continue
-        
-        try:
-            cantidad_paquete = parse_decimal(cantidad_paquete_str)
-            
-            if cantidad_paquete == 0:
-                # No se puede dividir por cero
-                for col in new_columns:
-                    row[col] = ""
-                skipped_count += 1
-                continue
-            
-            # Calcular precios unitarios
-            precio_original_caja = parse_decimal(row.get("Precio Original", ""))
-            precio_venta_caja = parse_decimal(row.get("Precio Venta", ""))
-            precio_iva_caja = parse_decimal(row.get("Precio con IVA", ""))
-            
-            # Dividir por cantidad por paquete
-            precio_original_unit = precio_original_caja / cantidad_paquete if precio_original_caja else Decimal("0")
-            precio_venta_unit = precio_venta_caja / cantidad_paquete if precio_venta_caja else Decimal("0")
-            precio_iva_unit = precio_iva_caja / cantidad_paquete if precio_iva_caja else Decimal("0")
-            
-            # Guardar en formato europeo
-            row["Precio Original Unitario"] = format_decimal(precio_original_unit)
-            row["Precio Venta Unitario"] = format_decimal(precio_venta_unit)
-            row["Precio con IVA Unitario"] = format_decimal(precio_iva_unit)
-            
+        if calculate_row(row, errors):
             calculated_count += 1
-            
-        except Exception as e:
-            # Si hay error, dejar vacío
-            for col in new_columns:
-                row[col] = ""
+        else:
             skipped_count += 1
-            errors.append(f"SKU {row.get('SKU', 'N/A')}: {str(e)}")
     
     # Escribir CSV con precios unitarios
     print(f"\n💾 Escribiendo CSV con precios unitarios: {OUTPUT_CSV}")
@@ -6,119 +6,104 @@ last_importation_date, base_price, fob.
 """
 
 import csv
-from typing import Dict, Optional
-from datetime import datetime
+import os
+from typing import Dict, List, Optional, Tuple
+
+from parseo_fechas import parse_row_dates
 
 # Archivos
 CEG_CSV = "fuentes/precios_plataforma_ceg.csv"
+CEG_ALT_CSV = "precios_plataforma_ceg.csv"          # ruta alternativa (sin el subdirectorio)
 INPUT_CSV = "ventas_historicas_items_limpio.csv"
 OUTPUT_CSV = "ventas_historicas_items_limpio_con_ceg.csv"
 
+# Columnas que agrega (nombre en el CSV -> campo del catálogo)
+CEG_COLUMNS = {
+    "Código CEG": "code",
+    "Brand Name CEG": "brand_name",
+    "Categoría CEG": "category_name",
+    "Última Importación": "last_importation_date",
+    "Base Price CEG": "base_price",
+    "FOB CEG": "fob",
+}
 
-def parse_date(date_str: str) -> str:
-    """Convierte fecha del formato CEG a formato estándar."""
-    if not date_str or date_str.lower() == "null":
-        return ""
-    
-    date_str = str(date_str).strip()
-    
-    # Formato: "9 sept 2022, 21:00:00" o "12 sept 2025, 21:00:00"
-    try:
-        # Mapeo de meses en español
-        meses = {
-            "ene": "01", "jan": "01",
-            "feb": "02", "feb": "02",
-            "mar": "03", "mar": "03",
-            "abr": "04", "apr": "04",
-            "may": "05", "may": "05",
-            "jun": "06", "jun": "06",
-            "jul": "07", "jul": "07",
-            "ago": "08", "aug": "08",
-            "sep": "09", "sept": "09",
-            "oct": "10", "oct": "10",
-            "nov": "11", "nov": "11",
-            "dic": "12", "dec": "12",
-        }
+
+def format_ceg_dates(rows: List[Dict[str, str]]) -> List[str]:
+    """
+    last_importation_date de todo el catálogo ("9 sept 2022, 21:00:00") -> DD/MM/YYYY.
+    El formato se infiere una vez para la columna; "null" queda vacío y lo que no se
+    reconoce queda como venía.
+    """
+    dates = parse_row_dates(rows, ["last_importation_date"], source=CEG_CSV)["last_importation_date"]
+    formatted = []
+    for row, dt in zip(rows, dates):
+        raw = str(row.get("last_importation_date") or "").strip()
+        if dt:
+            formatted.append(dt.strftime("%d/%m/%Y"))
+        else:
+            formatted.append("" if raw.lower() == "null" else raw)
+    return formatted
+
+
+def build_ceg_catalog(rows: List[Dict[str, str]]) -> Tuple[Dict[str, Dict[str, str]], int]:
+    """Indexa las filas del CSV CEG por SKU (si se repite, queda el último). Devuelve (catálogo, filas con SKU)."""
+    catalog: Dict[str, Dict[str, str]] = {}
+    count = 0
+    for row, importation_date in zip(rows, format_ceg_dates(rows)):
+        # Normalizar SKU (mayúsculas, sin espacios extra)
+        sku = str(row.get("sku", "")).strip().upper()
+        if not sku:
+            continue
         
-        # Intentar parsear formato "9 sept 2022, 21:00:00"
-        parts = date_str.split(",")
-        if len(parts) >= 1:
-            date_part = parts[0].strip()
-            date_parts = date_part.split()
-            if len(date_parts) >= 3:
-                day = date_parts[0].zfill(2)
-                month_str = date_parts[1].lower()[:3]
-                year = date_parts[2]
-                month = meses.get(month_str, "01")
-                return f"{day}/{month}/{year}"
-    except:
-        pass
-    
-    return date_str
+        catalog[sku] = {
+            "code": str(row.get("code", "")).strip(),
+            "brand_name": str(row.get("brand_name", "")).strip(),
+            "category_name": str(row.get("category_name", "")).strip(),
+            "last_importation_date": importation_date,
+            "base_price": str(row.get("base_price", "")).strip(),
+            "fob": str(row.get("fob", "")).strip(),
+        }
+        count += 1
+    return catalog, count
+
+
+def ceg_catalog_path() -> Optional[str]:
+    """El CSV CEG que se carga: CEG_CSV o, si no está, CEG_ALT_CSV (None si no hay ninguno)."""
+    for path in (CEG_CSV, CEG_ALT_CSV):
+        if os.path.exists(path):
+            return path
+    return None
 
 
 def load_ceg_catalog() -> Dict[str, Dict[str, str]]:
     """Carga el catálogo CEG y lo indexa por SKU."""
-    catalog: Dict[str, Dict[str, str]] = {}
-    
     print(f"📖 Cargando catálogo CEG desde: {CEG_CSV}")
     
-    try:
-        with open(CEG_CSV, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            count = 0
-            for row in reader:
-                sku = str(row.get("sku", "")).strip()
-                if not sku:
-                    continue
-                
-                # Normalizar SKU (mayúsculas, sin espacios extra)
-                sku = sku.upper().strip()
-                
-                catalog[sku] = {
-                    "code": str(row.get("code", "")).strip(),
-                    "brand_name": str(row.get("brand_name", "")).strip(),
-                    "category_name": str(row.get("category_name", "")).strip(),
-                    "last_importation_date": parse_date(row.get("last_importation_date", "")),
-                    "base_price": str(row.get("base_price", "")).strip(),
-                    "fob": str(row.get("fob", "")).strip(),
-                }
-                count += 1
-                
-                # Si hay múltiples SKUs iguales, mantener el último (o podrías hacer merge)
-                # Por ahora mantenemos el último encontrado
-        print(f"   ✅ {count} productos cargados del catálogo CEG")
-        
-    except FileNotFoundError:
+    path = ceg_catalog_path()
+    if path != CEG_CSV:
         print(f"   ⚠️  Archivo no encontrado: {CEG_CSV}")
         print("   Verificando ruta alternativa...")
-        # Intentar sin el subdirectorio
-        try:
-            alt_path = "precios_plataforma_ceg.csv"
-            with open(alt_path, "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                count = 0
-                for row in reader:
-                    sku = str(row.get("sku", "")).strip().upper()
-                    if not sku:
-                        continue
-                    catalog[sku] = {
-                        "code": str(row.get("code", "")).strip(),
-                        "brand_name": str(row.get("brand_name", "")).strip(),
-                        "category_name": str(row.get("category_name", "")).strip(),
-                        "last_importation_date": parse_date(row.get("last_importation_date", "")),
-                        "base_price": str(row.get("base_price", "")).strip(),
-                        "fob": str(row.get("fob", "")).strip(),
-                    }
-                    count += 1
-                print(f"   ✅ {count} productos cargados del catálogo CEG (ruta alternativa)")
-        except FileNotFoundError:
-            print(f"   ❌ No se pudo encontrar el archivo CEG")
-            return {}
-    
+    if path is None:
+        print("   ❌ No se pudo encontrar el archivo CEG")
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    origin = "" if path == CEG_CSV else " (ruta alternativa)"
+    
+    catalog, count = build_ceg_catalog(rows)
+    print(f"   ✅ {count} productos cargados del catálogo CEG{origin}")
     return catalog
 
 
+def enrich_row(row: Dict[str, str], ceg_catalog: Dict[str, Dict[str, str]]) -> bool:
+    """Agrega las columnas CEG a la fila (vacías si el SKU no está en el catálogo). True si hubo match."""
+    sku = str(row.get("SKU", "")).strip().upper()
+    ceg_data = ceg_catalog.get(sku) if sku else None
+    for col, field in CEG_COLUMNS.items():
+        row[col] = ceg_data[field] if ceg_data else ""
+    return ceg_data is not None
+
+
 def enrich_csv():
     """Enriquece el CSV limpio con datos del catálogo CEG."""
     
@@ -143,14 +128,7 @@ def enrich_csv():
     print(f"   ✅ {len(rows)} filas leídas")
     
     # Agregar nuevas columnas
-    new_headers = list(headers) + [
-        "Código CEG",
-        "Brand Name CEG",
-        "Categoría CEG",
-        "Última Importación",
-        "Base Price CEG",
-        "FOB CEG"
-    ]
+    new_headers = list(headers) + list(CEG_COLUMNS)
     
     # Procesar filas
     matched_count = 0
@@ -159,25 +137,11 @@ def enrich_csv():
     print(f"\n🔄 Enriqueciendo datos...")
     
     for row in rows:
-        sku = str(row.get("SKU", "")).strip().upper()
-        
-        if sku and sku in ceg_catalog:
-            ceg_data = ceg_catalog[sku]
-            row["Código CEG"] = ceg_data["code"]
-            row["Brand Name CEG"] = ceg_data["brand_name"]
-            row["Categoría CEG"] = ceg_data["category_name"]
-            row["Última Importación"] = ceg_data["last_importation_date"]
-            row["Base Price CEG"] = ceg_data["base_price"]
-            row["FOB CEG"] = ceg_data["fob"]
+        if enrich_row(row, ceg_catalog):
             matched_count += 1
         else:
-            # Si no hay match, dejar vacío
-            row["Código CEG"] = ""
-            row["Brand Name CEG"] = ""
-            row["Categoría CEG"] = ""
-            row["Última Importación"] = ""
-            row["Base Price CEG"] = ""
-            row["FOB CEG"] = ""
+            # Si no hay match, queda vacío
+            sku = str(row.get("SKU", "")).strip().upper()
             if sku:
                 unmatched_skus.add(sku)
     
@@ -10,6 +10,8 @@ import re
 from datetime import datetime
 from typing import Dict, Optional
 
+from parseo_fechas import DateParser, parse_row_dates
+
 # Archivos
 TU_CSV = "fuentes/catalogo_trade_unity.csv"
 INPUT_CSV = "inputs/ventas_historicas_items.csv"
@@ -25,81 +27,37 @@ TU_COLUMNS = {
     "Volumen (box)": "Volumen (box)",
 }
 
+# Columnas de fecha a formatear
+DATE_COLUMNS = [
+    "Fecha Creación",
+    "Fecha Actualización",
+    "Última Importación",
+]
+
+# Fechas del catálogo TU (se parsean por columna al cargarlo)
+TU_DATE_COLUMNS = ["Fecha de Creación (Magento)", "Fecha de última recepción CEG"]
+
+# Fechas que vienen de las etapas anteriores: "22/07/2024 18:43" (limpieza) y "09/09/2022" (CEG)
+VENTAS_DATES = DateParser([
+    "%d/%m/%Y %H:%M", "%d/%m/%Y", "%d/%m/%Y %H:%M:%S", "%d/%m/%y",
+    "%Y-%m-%d", "%Y-%m-%d %H:%M:%S",
+])
+
+
+def format_iso(dt: Optional[datetime]) -> str:
+    """datetime -> YYYY-MM-DD ("" si no hay fecha)."""
+    return dt.strftime("%Y-%m-%d") if dt else ""
+
 
 def parse_date_to_standard(date_str: str) -> str:
     """Convierte fecha a formato estándar YYYY-MM-DD para cálculos en Excel/Sheets."""
     if not date_str or date_str.lower() in ["null", ""]:
         return ""
     
-    date_str = str(date_str).strip()
-    
-    # Formato actual: "22/07/2024 18:43" o "07/09/2024"
-    try:
-        # Intentar formato "DD/MM/YYYY HH:MM" o "DD/MM/YYYY"
-        if " " in date_str:
-            date_part = date_str.split()[0]
-        else:
-            date_part = date_str
-        
-        # Parsear DD/MM/YYYY
-        parts = date_part.split("/")
-        if len(parts) == 3:
-            day, month, year = parts
-            # Validar y formatear
-            if len(year) == 2:
-                year = "20" + year if int(year) < 50 else "19" + year
-            return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-    except:
-        pass
-    
-    # Intentar otros formatos comunes
-    formats_to_try = [
-        "%Y-%m-%d",
-        "%d/%m/%Y",
-        "%m/%d/%Y",
-        "%Y-%m-%d %H:%M:%S",
-        "%d/%m/%Y %H:%M",
-    ]
-    
-    for fmt in formats_to_try:
-        try:
-            dt = datetime.strptime(date_str, fmt)
-            return dt.strftime("%Y-%m-%d")
-        except:
-            continue
+    dt = VENTAS_DATES.parse(date_str)
     
     # Si no se puede parsear, devolver original
-    return date_str
-
-
-def parse_tu_date(date_str: str) -> str:
-    """Parsea fechas del formato TU (ej: "12/1/02, 8:06 PM" o "7/20/24, 1:00 PM")."""
-    if not date_str or date_str.lower() in ["null", ""]:
-        return ""
-    
-    date_str = str(date_str).strip()
-    
-    # Formato TU: "12/1/02, 8:06 PM" o "7/20/24, 1:00 PM"
-    try:
-        # Separar fecha y hora
-        if "," in date_str:
-            date_part = date_str.split(",")[0].strip()
-        else:
-            date_part = date_str
-        
-        # Parsear M/D/YY o MM/DD/YY
-        parts = date_part.split("/")
-        if len(parts) == 3:
-            month, day, year = parts
-            # Ajustar año
-            if len(year) == 2:
-                year_int = int(year)
-                year = f"20{year}" if year_int < 50 else f"19{year}"
-            return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-    except:
-        pass
-    
-    return ""
+    return dt.strftime("%Y-%m-%d") if dt else str(date_str).strip()
 
 
 def load_tu_catalog() -> Dict[str, Dict[str, str]]:
@@ -110,23 +68,28 @@ def load_tu_catalog() -> Dict[str, Dict[str, str]]:
     
     try:
         with open(TU_CSV, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            count = 0
-            for row in reader:
-                sku = str(row.get("sku", "")).strip().upper()
-                if not sku:
-                    continue
-                
-                # Extraer las columnas necesarias
-                catalog[sku] = {
-                    "Fecha Creación Magento": parse_tu_date(row.get("Fecha de Creación (Magento)", "")),
-                    "Cantidad por Paquete Comercial": str(row.get("Cantidad por Paquete Comercial", "")).strip(),
-                    "EAN": str(row.get("EAN", "")).strip(),
-                    "Tipo de Marca": str(row.get("Tipo de Marca", "")).strip(),
-                    "Fecha Última Recepción CEG": parse_tu_date(row.get("Fecha de última recepción CEG", "")),
-                    "Volumen (box)": str(row.get("Volumen (box)", "")).strip(),
-                }
-                count += 1
+            rows = list(csv.DictReader(f))
+        
+        # Fechas del catálogo: formato inferido por columna ("7/20/24, 1:00 PM" es mes
+        # primero, "25/11/2025" es día primero)
+        dates = parse_row_dates(rows, TU_DATE_COLUMNS, source=TU_CSV)
+        
+        count = 0
+        for i, row in enumerate(rows):
+            sku = str(row.get("sku", "")).strip().upper()
+            if not sku:
+                continue
+            
+            # Extraer las columnas necesarias
+            catalog[sku] = {
+                "Fecha Creación Magento": format_iso(dates["Fecha de Creación (Magento)"][i]),
+                "Cantidad por Paquete Comercial": str(row.get("Cantidad por Paquete Comercial", "")).strip(),
+                "EAN": str(row.get("EAN", "")).strip(),
+                "Tipo de Marca": str(row.get("Tipo de Marca", "")).strip(),
+                "Fecha Última Recepción CEG": format_iso(dates["Fecha de última recepción CEG"][i]),
+                "Volumen (box)": str(row.get("Volumen (box)", "")).strip(),
+            }
+            count += 1
                 
         print(f"   ✅ {count} productos cargados del catálogo TU")
         
@@ -140,6 +103,21 @@ def load_tu_catalog() -> Dict[str, Dict[str, str]]:
     return catalog
 
 
+def enrich_row(row: Dict[str, str], tu_catalog: Dict[str, Dict[str, str]]) -> bool:
+    """Formatea las fechas y agrega las columnas TU (vacías si no hay match). True si hubo match."""
+    # Formatear fechas existentes
+    for date_col in DATE_COLUMNS:
+        if date_col in row:
+            row[date_col] = parse_date_to_standard(row.get(date_col, ""))
+    
+    # Enriquecer con datos TU
+    sku = str(row.get("SKU", "")).strip().upper()
+    tu_data = tu_catalog.get(sku) if sku else None
+    for col in TU_COLUMNS.values():
+        row[col] = tu_data[col] if tu_data else ""
+    return tu_data is not None
+
+
 def enrich_and_format_dates():
     """Enriquece el CSV con datos TU y formatea fechas."""
     
@@ -166,13 +144,6 @@ def enrich_and_format_dates():
     # Agregar nuevas columnas al final
     new_headers = list(headers) + list(TU_COLUMNS.values())
     
-    # Columnas de fecha a formatear
-    date_columns = [
-        "Fecha Creación",
-        "Fecha Actualización",
-        "Última Importación",
-    ]
-    
     # Procesar filas
     matched_count = 0
     unmatched_skus = set()
@@ -180,31 +151,11 @@ def enrich_and_format_dates():
     print(f"\n🔄 Procesando datos...")
     
     for row in rows:
-        # Formatear fechas existentes
-        for date_col in date_columns:
-            if date_col in row:
-                row[date_col] = parse_date_to_standard(row.get(date_col, ""))
-        
-        # Enriquecer con datos TU
-        sku = str(row.get("SKU", "")).strip().upper()
-        
-        if sku and sku in tu_catalog:
-            tu_data = tu_catalog[sku]
-            row["Fecha Creación Magento"] = tu_data["Fecha Creación Magento"]
-            row["Cantidad por Paquete Comercial"] = tu_data["Cantidad por Paquete Comercial"]
-            row["EAN"] = tu_data["EAN"]
-            row["Tipo de Marca"] = tu_data["Tipo de Marca"]
-            row["Fecha Última Recepción CEG"] = tu_data["Fecha Última Recepción CEG"]
-            row["Volumen (box)"] = tu_data["Volumen (box)"]
+        if enrich_row(row, tu_catalog):
             matched_count += 1
         else:
-            # Si no hay match, dejar vacío
-            row["Fecha Creación Magento"] = ""
-            row["Cantidad por Paquete Comercial"] = ""
-            row["EAN"] = ""
-            row["Tipo de Marca"] = ""
-            row["Fecha Última Recepción CEG"] = ""
-            row["Volumen (box)"] = ""
+            # Si no hay match, queda vacío
+            sku = str(row.get("SKU", "")).strip().upper()
             if sku:
                 unmatched_skus.add(sku)
     
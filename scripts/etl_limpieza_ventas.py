@@ -7,13 +7,17 @@ Script de ETL y limpieza de datos de ventas históricas.
 """
 
 import csv
+import os
 import re
-from datetime import datetime
-from typing import Dict, List, Optional, Any
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Tuple
 from decimal import Decimal, InvalidOperation
 
+from parseo_fechas import DateParser
+
 # Archivos
 INPUT_CSV = "ventas_historicas_items_raw.csv"
+ENRICHED_CSV = "ventas_historicas_items_enriched.csv"
 OUTPUT_CSV = "ventas_historicas_items_limpio.csv"
 
 # Campos que pertenecen a la ORDEN (se propagan a todas las líneas)
@@ -36,6 +40,13 @@ ITEM_FIELDS = [
 # Campos adicionales si existe el CSV enriquecido
 ENRICHED_FIELDS = ["category_ids", "category_names", "brand"]
 
+# Streaming: leer, limpiar y escribir de a CHUNK_ROWS filas (la RAM no crece con el histórico).
+# False = cargar todo el CSV en memoria antes de escribir (la salida es la misma).
+STREAM = True
+CHUNK_ROWS = 5000
+
+MAGENTO_DATES = DateParser(["%Y-%m-%d %H:%M:%S"])
+
 
 def normalize_cuit(cuit: str) -> str:
     """Normaliza CUIT: quita guiones y espacios, valida formato."""
@@ -52,12 +63,9 @@ def normalize_date(date_str: str) -> str:
     """Normaliza fecha: YYYY-MM-DD HH:MM:SS -> DD/MM/YYYY HH:MM"""
     if not date_str:
         return ""
-    try:
-        # Intenta parsear formato Magento: "2024-07-22 18:43:31"
-        dt = datetime.strptime(date_str.strip(), "%Y-%m-%d %H:%M:%S")
-        return dt.strftime("%d/%m/%Y %H:%M")
-    except:
-        return date_str
+    # Formato Magento: "2024-07-22 18:43:31" (memo: se repite en todas las líneas de la orden)
+    dt = MAGENTO_DATES.parse(date_str)
+    return dt.strftime("%d/%m/%Y %H:%M") if dt else date_str
 
 
 def normalize_number(value: Any, decimals: int = 2) -> str:
@@ -124,12 +132,10 @@ def format_currency(value: Any, currency: str = "USD") -> str:
         return str(value)
 
 
-def process_csv():
-    """Procesa el CSV: propaga datos de orden y limpia."""
-    
-    # Detectar si existe CSV enriquecido
+def detect_input() -> Tuple[str, bool, Optional[List[str]]]:
+    """Usa el CSV enriquecido si existe, si no el RAW. Devuelve (archivo, has_enriched, headers del enriquecido)."""
     try:
-        with open("ventas_historicas_items_enriched.csv", "r", encoding="utf-8") as f:
+        with open(ENRICHED_CSV, "r", encoding="utf-8") as f:
             reader = csv.DictReader(f)
             has_enriched = True
             enriched_headers = reader.fieldnames
@@ -137,20 +143,12 @@ def process_csv():
         has_enriched = False
         enriched_headers = None
     
-    input_file = "ventas_historicas_items_enriched.csv" if has_enriched else INPUT_CSV
-    
-    # Leer CSV
-    rows: List[Dict[str, str]] = []
-    with open(input_file, "r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            rows.append(dict(row))
-    
-    if not rows:
-        print("ERROR: CSV vacío o no encontrado")
-        return
-    
-    # Headers finales (ordenados lógicamente)
+    input_file = ENRICHED_CSV if has_enriched else INPUT_CSV
+    return input_file, has_enriched, enriched_headers
+
+
+def build_final_headers(has_enriched: bool, enriched_headers: Optional[List[str]]) -> List[str]:
+    """Headers finales (ordenados lógicamente)."""
     final_headers = [
         # Orden
         "Número de Orden", "ID Orden", "Fecha Creación", "Fecha Actualización", "Estado",
@@ -167,83 +165,129 @@ def process_csv():
     
     if has_enriched and "category_ids" in (enriched_headers or []):
         final_headers.extend(["Categorías IDs", "Categorías", "Marca"])
+    return final_headers
+
+
+def clean_row(row: Dict[str, str], current_order_data: Dict[str, str], has_enriched: bool) -> Dict[str, str]:
+    """
+    Limpia una línea. current_order_data es el estado entre filas: los datos de la orden
+    en curso, que se propagan a todas sus líneas (se actualiza cuando cambia increment_id).
+    """
+    increment_id = row.get("increment_id", "").strip()
+    
+    # Si cambió la orden, actualizar datos de orden
+    if increment_id and increment_id != current_order_data.get("increment_id"):
+        for field in ORDER_FIELDS:
+            current_order_data[field] = row.get(field, "")
+    
+    # Crear fila de salida
+    out_row: Dict[str, str] = {}
+    
+    # Datos de orden (normalizados)
+    out_row["Número de Orden"] = current_order_data.get("increment_id", "")
+    out_row["ID Orden"] = normalize_number(current_order_data.get("entity_id", ""), 0)
+    out_row["Fecha Creación"] = normalize_date(current_order_data.get("created_at", ""))
+    out_row["Fecha Actualización"] = normalize_date(current_order_data.get("updated_at", ""))
+    out_row["Estado"] = normalize_status(current_order_data.get("status", ""))
+    
+    out_row["Email Cliente"] = clean_text(current_order_data.get("customer_email", ""))
+    out_row["Nombre Cliente"] = clean_text(current_order_data.get("customer_firstname", ""))
+    out_row["Apellido Cliente"] = clean_text(current_order_data.get("customer_lastname", ""))
+    out_row["CUIT Cliente"] = normalize_cuit(current_order_data.get("customer_taxvat", ""))
+    
+    currency = current_order_data.get("order_currency_code", "USD")
+    out_row["Moneda Orden"] = currency
+    out_row["Moneda Base"] = current_order_data.get("base_currency_code", currency)
+    out_row["Tasa Cambio"] = normalize_number(current_order_data.get("currency_rate", ""), 4)
+    
+    out_row["Total Orden"] = format_currency(current_order_data.get("grand_total", ""), currency)
+    out_row["Subtotal Orden"] = format_currency(current_order_data.get("subtotal", ""), currency)
+    out_row["Descuento Orden"] = format_currency(current_order_data.get("discount_amount_order", ""), currency)
+    out_row["Envío"] = format_currency(current_order_data.get("shipping_amount", ""), currency)
+    out_row["Impuesto Orden"] = format_currency(current_order_data.get("tax_amount_order", ""), currency)
+    
+    # Datos de item
+    out_row["ID Item"] = normalize_number(row.get("item_id", ""), 0)
+    out_row["ID Item Padre"] = normalize_number(row.get("parent_item_id", ""), 0) if row.get("parent_item_id") else ""
+    out_row["Tipo Producto"] = clean_text(row.get("product_type", ""))
+    out_row["SKU"] = clean_text(row.get("sku", ""))
+    out_row["Nombre Producto"] = clean_text(row.get("name", ""))
+    out_row["Cantidad"] = normalize_number(row.get("qty_ordered", ""), 0)
+    
+    out_row["Precio Original"] = format_currency(row.get("original_price", ""), currency)
+    out_row["Precio Venta"] = format_currency(row.get("price", ""), currency)
+    out_row["Precio con IVA"] = format_currency(row.get("price_incl_tax", ""), currency)
+    
+    out_row["Descuento Item"] = format_currency(row.get("discount_amount_item", ""), currency)
+    out_row["Descuento % Item"] = normalize_percent(row.get("discount_percent_item", ""))
+    
+    out_row["Total Item"] = format_currency(row.get("row_total", ""), currency)
+    out_row["Total Item con IVA"] = format_currency(row.get("row_total_incl_tax", ""), currency)
     
-    # Procesar: propagar datos de orden
+    out_row["IVA % Item"] = normalize_percent(row.get("tax_percent_item", ""))
+    out_row["Impuesto Item"] = format_currency(row.get("tax_amount_item", ""), currency)
+    
+    # Datos enriquecidos (si existen)
+    if has_enriched:
+        out_row["Categorías IDs"] = clean_text(row.get("category_ids", ""))
+        out_row["Categorías"] = clean_text(row.get("category_names", ""))
+        out_row["Marca"] = clean_text(row.get("brand", ""))
+    
+    return out_row
+
+
+def iter_chunks(rows: Iterable[Dict[str, str]], size: Optional[int] = CHUNK_ROWS) -> Iterator[List[Dict[str, str]]]:
+    """Agrupa las filas del reader en listas de a lo sumo size filas (None = todas en una)."""
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def clean_chunks(rows: Iterable[Dict[str, str]], has_enriched: bool,
+                 size: Optional[int] = CHUNK_ROWS) -> Iterator[List[Dict[str, str]]]:
+    """
+    Limpia las filas de a chunks. current_order_data vive fuera del loop de chunks, así que una
+    orden partida entre dos chunks sigue propagando sus datos a las líneas del chunk siguiente.
+    """
     current_order_data: Dict[str, str] = {}
-    output_rows: List[Dict[str, str]] = []
+    for chunk in iter_chunks(rows, size):
+        yield [clean_row(row, current_order_data, has_enriched) for row in chunk]
+
+
+def process_csv():
+    """Procesa el CSV: propaga datos de orden y limpia."""
     
-    for row in rows:
-        increment_id = row.get("increment_id", "").strip()
-        
-        # Si cambió la orden, actualizar datos de orden
-        if increment_id and increment_id != current_order_data.get("increment_id"):
-            for field in ORDER_FIELDS:
-                current_order_data[field] = row.get(field, "")
-        
-        # Crear fila de salida
-        out_row: Dict[str, str] = {}
-        
-        # Datos de orden (normalizados)
-        out_row["Número de Orden"] = current_order_data.get("increment_id", "")
-        out_row["ID Orden"] = normalize_number(current_order_data.get("entity_id", ""), 0)
-        out_row["Fecha Creación"] = normalize_date(current_order_data.get("created_at", ""))
-        out_row["Fecha Actualización"] = normalize_date(current_order_data.get("updated_at", ""))
-        out_row["Estado"] = normalize_status(current_order_data.get("status", ""))
-        
-        out_row["Email Cliente"] = clean_text(current_order_data.get("customer_email", ""))
-        out_row["Nombre Cliente"] = clean_text(current_order_data.get("customer_firstname", ""))
-        out_row["Apellido Cliente"] = clean_text(current_order_data.get("customer_lastname", ""))
-        out_row["CUIT Cliente"] = normalize_cuit(current_order_data.get("customer_taxvat", ""))
-        
-        currency = current_order_data.get("order_currency_code", "USD")
-        out_row["Moneda Orden"] = currency
-        out_row["Moneda Base"] = current_order_data.get("base_currency_code", currency)
-        out_row["Tasa Cambio"] = normalize_number(current_order_data.get("currency_rate", ""), 4)
-        
-        out_row["Total Orden"] = format_currency(current_order_data.get("grand_total", ""), currency)
-        out_row["Subtotal Orden"] = format_currency(current_order_data.get("subtotal", ""), currency)
-        out_row["Descuento Orden"] = format_currency(current_order_data.get("discount_amount_order", ""), currency)
-        out_row["Envío"] = format_currency(current_order_data.get("shipping_amount", ""), currency)
-        out_row["Impuesto Orden"] = format_currency(current_order_data.get("tax_amount_order", ""), currency)
-        
-        # Datos de item
-        out_row["ID Item"] = normalize_number(row.get("item_id", ""), 0)
-        out_row["ID Item Padre"] = normalize_number(row.get("parent_item_id", ""), 0) if row.get("parent_item_id") else ""
-        out_row["Tipo Producto"] = clean_text(row.get("product_type", ""))
-        out_row["SKU"] = clean_text(row.get("sku", ""))
-        out_row["Nombre Producto"] = clean_text(row.get("name", ""))
-        out_row["Cantidad"] = normalize_number(row.get("qty_ordered", ""), 0)
-        
-        out_row["Precio Original"] = format_currency(row.get("original_price", ""), currency)
-        out_row["Precio Venta"] = format_currency(row.get("price", ""), currency)
-        out_row["Precio con IVA"] = format_currency(row.get("price_incl_tax", ""), currency)
-        
-        out_row["Descuento Item"] = format_currency(row.get("discount_amount_item", ""), currency)
-        out_row["Descuento % Item"] = normalize_percent(row.get("discount_percent_item", ""))
-        
-        out_row["Total Item"] = format_currency(row.get("row_total", ""), currency)
-        out_row["Total Item con IVA"] = format_currency(row.get("row_total_incl_tax", ""), currency)
-        
-        out_row["IVA % Item"] = normalize_percent(row.get("tax_percent_item", ""))
-        out_row["Impuesto Item"] = format_currency(row.get("tax_amount_item", ""), currency)
-        
-        # Datos enriquecidos (si existen)
-        if has_enriched:
-            out_row["Categorías IDs"] = clean_text(row.get("category_ids", ""))
-            out_row["Categorías"] = clean_text(row.get("category_names", ""))
-            out_row["Marca"] = clean_text(row.get("brand", ""))
-        
-        output_rows.append(out_row)
+    # Detectar si existe CSV enriquecido
+    input_file, has_enriched, enriched_headers = detect_input()
+    final_headers = build_final_headers(has_enriched, enriched_headers)
     
-    # Escribir CSV limpio
-    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8-sig") as f:  # utf-8-sig para Excel
-        writer = csv.DictWriter(f, fieldnames=final_headers, extrasaction="ignore")
+    total_rows = 0
+    orders: set = set()
+    tmp_output = OUTPUT_CSV + ".tmp"
+    with open(input_file, "r", encoding="utf-8", newline="") as fin, \
+            open(tmp_output, "w", newline="", encoding="utf-8-sig") as fout:  # utf-8-sig para Excel
+        writer = csv.DictWriter(fout, fieldnames=final_headers, extrasaction="ignore")
         writer.writeheader()
-        writer.writerows(output_rows)
+        
+        # Procesar de a chunks: propagar datos de orden, limpiar y escribir
+        chunks = clean_chunks(csv.DictReader(fin), has_enriched, CHUNK_ROWS if STREAM else None)
+        for output_rows in chunks:
+            writer.writerows(output_rows)
+            total_rows += len(output_rows)
+            orders.update(r.get("Número de Orden", "") for r in output_rows)
+    
+    if not total_rows:
+        os.remove(tmp_output)
+        print("ERROR: CSV vacío o no encontrado")
+        return
+    os.replace(tmp_output, OUTPUT_CSV)
     
     print(f"✅ CSV limpio generado: {OUTPUT_CSV}")
-    print(f"   Total de filas procesadas: {len(output_rows)}")
-    print(f"   Total de órdenes únicas: {len(set(r.get('Número de Orden', '') for r in output_rows))}")
+    print(f"   Total de filas procesadas: {total_rows}")
+    print(f"   Total de órdenes únicas: {len(orders)}")
     print(f"\n📊 Columnas generadas:")
     for i, header in enumerate(final_headers, 1):
         print(f"   {i:2d}. {header}")
@@ -0,0 +1,653 @@
+"""
+Motor ETL de ventas en una sola pasada.
+
+Corre las mismas etapas que la cadena de scripts
+  etl_limpieza_ventas → enriquecer_con_ceg → limpiar_csv_final → filtrar_ordenes_activas →
+  enriquecer_con_tu_y_formatear_fechas → calcular_cantidad_unitarias → calcular_precios_unitarios →
+  reordenar_y_calcular_margenes → limpiar_y_enriquecer_final
+pero como transformaciones en memoria: lee el export (enriched o RAW) una vez, pasa cada fila por
+todas las etapas y escribe inputs/ventas_historicas_items.csv una sola vez. Cada etapa usa las
+funciones de fila de su script, así que la salida es la misma que correr los 9 scripts en orden.
+
+Con INCREMENTAL = True guarda en ETL_STATE_DB las líneas ya limpias (por item_id) y en la próxima
+corrida solo pasan por las etapas las órdenes nuevas o modificadas del export; las demás se reusan
+y solo se les recalculan los días desde hoy. La salida es la misma que procesando todo.
+
+Con VERIFY_AGAINST_CHAIN = True además corre la cadena de scripts en un directorio temporal y
+compara, etapa por etapa, el CSV de cada script contra el de la etapa equivalente del motor.
+
+Uso: python scripts/etl_pipeline_ventas.py
+"""
+
+import contextlib
+import csv
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import etl_limpieza_ventas as limpieza  # noqa: E402
+import enriquecer_con_ceg as ceg  # noqa: E402
+import limpiar_csv_final as limpiar  # noqa: E402
+import filtrar_ordenes_activas as filtrar  # noqa: E402
+import enriquecer_con_tu_y_formatear_fechas as tu_fechas  # noqa: E402
+import calcular_cantidad_unitarias as cantidad  # noqa: E402
+import calcular_precios_unitarios as precios  # noqa: E402
+import reordenar_y_calcular_margenes as margenes  # noqa: E402
+import limpiar_y_enriquecer_final as final  # noqa: E402
+import ventas_tipadas  # noqa: E402
+
+# =========================================================
+# HARDCODE
+# =========================================================
+OUTPUT_CSV = final.OUTPUT_CSV               # inputs/ventas_historicas_items.csv
+VERIFY_AGAINST_CHAIN = False                # True = comparar cada etapa contra su script (más lento)
+WRITE_PARQUET = True                        # además del CSV, el intermedio tipado (requiere pyarrow)
+WORKERS = os.cpu_count() or 1               # procesos para las etapas (1 = todo en este proceso)
+PARTITION_ROWS = 2000                       # filas por partición (se corta en la próxima orden nueva)
+INCREMENTAL = True                          # procesar solo órdenes nuevas o modificadas (False = todo)
+ETL_STATE_DB = "etl_ventas_state.sqlite"    # líneas ya limpias por item_id (se puede borrar)
+
+
+# =========================================================
+# Etapas
+# =========================================================
+class Stage:
+    """
+    Una etapa de la cadena: headers_fn arma los headers de salida (una vez) y row_fn transforma la
+    fila en memoria. row_fn devuelve True/False para el contador de la etapa; si drops=True, False
+    descarta la fila (filtro).
+    """
+
+    def __init__(self, name: str, module, script_fn: str, headers_fn: Callable[[List[str]], List[str]],
+                 row_fn: Callable[[Dict[str, str]], bool], counter: Optional[str] = None, drops: bool = False):
+        self.name = name
+        self.module = module
+        self.script_fn = script_fn
+        self.headers_fn = headers_fn
+        self.row_fn = row_fn
+        self.counter = counter
+        self.drops = drops
+        self.rows_in = 0
+        self.rows_out = 0
+        self.hits = 0
+
+    def apply(self, row: Dict[str, str]) -> bool:
+        """Aplica la etapa a la fila. False = la fila se descarta."""
+        self.rows_in += 1
+        hit = self.row_fn(row)
+        if hit:
+            self.hits += 1
+        if self.drops and not hit:
+            return False
+        self.rows_out += 1
+        return True
+
+
+def build_stages() -> List[Stage]:
+    """Carga los catálogos una sola vez y arma las etapas 2..9 (la 1 es la lectura del export)."""
+    ceg_catalog = ceg.load_ceg_catalog()
+    if not ceg_catalog:
+        raise SystemExit("❌ No se pudo cargar el catálogo CEG. Abortando.")
+    tu_catalog = tu_fechas.load_tu_catalog()
+    if not tu_catalog:
+        raise SystemExit("❌ No se pudo cargar el catálogo TU. Abortando.")
+    tu_categories = final.load_tu_categories()
+
+    return [
+        Stage("enriquecer_con_ceg", ceg, "enrich_csv",
+              lambda h: list(h) + list(ceg.CEG_COLUMNS),
+              lambda row: ceg.enrich_row(row, ceg_catalog), counter="match CEG"),
+        Stage("limpiar_csv_final", limpiar, "clean_csv",
+              limpiar.clean_headers,
+              lambda row: bool(limpiar.clean_row(row))),
+        Stage("filtrar_ordenes_activas", filtrar, "filter_orders",
+              list,
+              filtrar.keep_row, counter="mantenidas", drops=True),
+        Stage("enriquecer_con_tu_y_formatear_fechas", tu_fechas, "enrich_and_format_dates",
+              lambda h: list(h) + list(tu_fechas.TU_COLUMNS.values()),
+              lambda row: tu_fechas.enrich_row(row, tu_catalog), counter="match TU"),
+        Stage("calcular_cantidad_unitarias", cantidad, "calculate_unit_quantities",
+              cantidad.add_header,
+              cantidad.calculate_row, counter="cantidades calculadas"),
+        Stage("calcular_precios_unitarios", precios, "calculate_unit_prices",
+              lambda h: list(h) + precios.UNIT_PRICE_COLUMNS,
+              precios.calculate_row, counter="precios calculados"),
+        Stage("reordenar_y_calcular_margenes", margenes, "reorder_and_calculate_margins",
+              margenes.reorder_headers,
+              margenes.calculate_row, counter="márgenes calculados"),
+        Stage("limpiar_y_enriquecer_final", final, "clean_and_enrich",
+              final.reorder_headers,
+              lambda row: final.clean_row(row, tu_categories)[0], counter="categorías 2° nivel"),
+    ]
+
+
+def _cell(value) -> str:
+    """
+    Valor tal como lo vería el script siguiente al releer el CSV: DictWriter escribe None como ""
+    y los scripts releen sin newline="", así que \\r\\n y \\r dentro de un campo vuelven como \\n.
+    """
+    if value is None:
+        return ""
+    value = str(value)
+    if "\r" in value:
+        value = value.replace("\r\n", "\n").replace("\r", "\n")
+    return value
+
+
+def _project(row: Dict[str, str], headers: List[str]) -> Dict[str, str]:
+    """La fila que leería la etapa siguiente: solo las columnas escritas, las que faltan vacías."""
+    return {h: _cell(row.get(h, "")) for h in headers}
+
+
+# =========================================================
+# Motor
+# =========================================================
+def _values(row: Dict[str, str], headers: List[str]) -> List[str]:
+    """La fila como la escribe DictWriter(extrasaction="ignore"): los valores en el orden de headers."""
+    return [row.get(h, "") for h in headers]
+
+
+def process_row(raw: Dict[str, str], current_order_data: Dict[str, str], stages: List[Stage],
+                stage_headers: List[List[str]], has_enriched: bool,
+                dumps: Optional[List[Callable[[Dict[str, str]], None]]] = None) -> Optional[Dict[str, str]]:
+    """
+    Pasa una fila del export por todas las etapas; None si la descarta el filtro.
+    Con dumps (una función por etapa) también entrega la fila que escribe cada etapa.
+    """
+    row = limpieza.clean_row(raw, current_order_data, has_enriched)
+    if dumps:
+        dumps[0](row)
+    row = _project(row, stage_headers[0])
+
+    for i, stage in enumerate(stages, 1):
+        if not stage.apply(row):
+            return None
+        if i < len(stages):
+            row = _project(row, stage_headers[i])
+        if dumps:
+            dumps[i](row)
+    return row
+
+
+def process_rows(raws: Iterable[Dict[str, str]], stages: List[Stage], stage_headers: List[List[str]],
+                 has_enriched: bool, dumps: Optional[List[Callable[[Dict[str, str]], None]]] = None
+                 ) -> Iterator[Dict[str, str]]:
+    """
+    Pasa cada fila del export por todas las etapas y devuelve las que pasan el filtro.
+    Los datos de orden se propagan desde vacío, así que raws tiene que empezar en una orden nueva.
+    """
+    current_order_data: Dict[str, str] = {}
+    for raw in raws:
+        row = process_row(raw, current_order_data, stages, stage_headers, has_enriched, dumps)
+        if row is not None:
+            yield row
+
+
+def partition_by_order(raws: Iterable[Dict[str, str]], size: int = PARTITION_ROWS) -> Iterator[List[Dict[str, str]]]:
+    """
+    Corta el export en particiones de ~size filas, siempre donde empieza una orden nueva
+    (increment_id distinto): las líneas de una orden, que heredan sus datos de la primera,
+    quedan todas en la misma partición. Con size=1, una orden por partición.
+    """
+    part: List[Dict[str, str]] = []
+    last_id = None
+    for raw in raws:
+        increment_id = (raw.get("increment_id") or "").strip()
+        if len(part) >= size and increment_id and increment_id != last_id:
+            yield part
+            part = []
+        if increment_id:
+            last_id = increment_id
+        part.append(raw)
+    if part:
+        yield part
+
+
+def _add_counters(stages: List[Stage], counters: List[Tuple[int, int, int]]) -> None:
+    for stage, (rows_in, rows_out, hits) in zip(stages, counters):
+        stage.rows_in += rows_in
+        stage.rows_out += rows_out
+        stage.hits += hits
+
+
+# Estado de cada proceso del pool. Con fork hereda las etapas ya armadas por el padre;
+# con spawn (Windows/macOS) el initializer vuelve a cargar los catálogos.
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(has_enriched: bool, stage_headers: List[List[str]]) -> None:
+    if "stages" not in _worker:
+        with contextlib.redirect_stdout(io.StringIO()):
+            _worker["stages"] = build_stages()
+        _worker["has_enriched"] = has_enriched
+        _worker["stage_headers"] = stage_headers
+
+
+def _run_partition(raws: List[Dict[str, str]], dump: bool = False, by_line: bool = False):
+    """
+    Corre una partición (en un worker o en este proceso). Devuelve (filas finales, filas de cada
+    etapa, contadores de la partición). Con by_line las filas finales quedan alineadas con raws:
+    None en las que descartó el filtro.
+    """
+    stages = _worker["stages"]
+    stage_headers = _worker["stage_headers"]
+    before = [(s.rows_in, s.rows_out, s.hits) for s in stages]
+
+    dumps = [[] for _ in stage_headers] if dump else None
+    sinks = None
+    if dump:
+        sinks = [lambda row, d=d, h=h: d.append(_values(row, h)) for d, h in zip(dumps, stage_headers)]
+
+    rows = []
+    current_order_data: Dict[str, str] = {}
+    for raw in raws:
+        row = process_row(raw, current_order_data, stages, stage_headers, _worker["has_enriched"], sinks)
+        if row is not None:
+            rows.append(_values(row, stage_headers[-1]))
+        elif by_line:
+            rows.append(None)
+
+    # Los contadores de la partición se devuelven y los suma el que llama; se restauran porque en
+    # este proceso (WORKERS = 1) las etapas son las mismas del padre
+    counters = []
+    for stage, (rows_in, rows_out, hits) in zip(stages, before):
+        counters.append((stage.rows_in - rows_in, stage.rows_out - rows_out, stage.hits - hits))
+        stage.rows_in, stage.rows_out, stage.hits = rows_in, rows_out, hits
+    return rows, dumps, counters
+
+
+class PartitionRunner:
+    """
+    Corre particiones con _run_partition en un pool de WORKERS procesos (o en este proceso si
+    WORKERS = 1) y entrega cada resultado a su callback en el orden en que se enviaron. Hay a lo
+    sumo 2 * WORKERS resultados en vuelo, así que la RAM no crece con el histórico.
+    """
+
+    def __init__(self, stages: List[Stage], stage_headers: List[List[str]], has_enriched: bool,
+                 workers: int = WORKERS):
+        _worker.update(stages=stages, stage_headers=stage_headers, has_enriched=has_enriched)
+        self.workers = max(1, workers)
+        self.pending: Deque[Tuple[Future, Callable]] = deque()
+        self.ex = None
+        if self.workers > 1:
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context("fork" if "fork" in methods else None)
+            self.ex = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=_init_worker,
+                                          initargs=(has_enriched, stage_headers))
+
+    def run(self, raws: List[Dict[str, str]], done: Callable, **kwargs) -> None:
+        """Procesa la partición; done(resultado de _run_partition) se llama en orden."""
+        if self.ex:
+            future = self.ex.submit(_run_partition, raws, **kwargs)
+        else:
+            future = Future()
+            future.set_result(_run_partition(raws, **kwargs))
+        self._push(future, done)
+
+    def ready(self, value: Any, done: Callable) -> None:
+        """Un resultado que no hay que procesar; sale en orden con los demás."""
+        future: Future = Future()
+        future.set_result(value)
+        self._push(future, done)
+
+    def _push(self, future: Future, done: Callable) -> None:
+        self.pending.append((future, done))
+        while len(self.pending) > 2 * self.workers:
+            self._collect()
+
+    def _collect(self) -> None:
+        future, done = self.pending.popleft()
+        done(future.result())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            while self.pending and exc_type is None:
+                self._collect()
+        finally:
+            if self.ex:
+                self.ex.shutdown(cancel_futures=exc_type is not None)
+        return False
+
+
+def run_parallel(raws: Iterable[Dict[str, str]], stages: List[Stage], stage_headers: List[List[str]],
+                 has_enriched: bool, writer, dump_writers: List) -> None:
+    """
+    Reparte las particiones (partition_by_order) en WORKERS procesos y escribe los resultados en
+    el orden original. Los contadores de cada partición se suman a las etapas del padre.
+    """
+    def done(result) -> None:
+        rows, dumps, counters = result
+        writer.writerows(rows)
+        for w, dump_rows in zip(dump_writers, dumps or []):
+            w.writerows(dump_rows)
+        _add_counters(stages, counters)
+
+    with PartitionRunner(stages, stage_headers, has_enriched) as runner:
+        for part in partition_by_order(raws):
+            runner.run(part, done, dump=bool(dump_writers))
+
+
+# =========================================================
+# Incremental
+# =========================================================
+def state_fingerprint(stage_headers: List[List[str]]) -> str:
+    """
+    Huella de todo lo que, además de la orden, define las filas limpias: el código de los módulos
+    de scripts/ cargados (el motor y sus etapas), los catálogos CEG/TU y los headers de cada etapa.
+    Si cambia, el estado no sirve y se reprocesa todo.
+    """
+    h = hashlib.sha256()
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    paths = {
+        os.path.abspath(module.__file__)
+        for module in list(sys.modules.values())
+        if getattr(module, "__file__", None) and os.path.dirname(os.path.abspath(module.__file__)) == scripts_dir
+    }
+    # el CSV CEG que carga la etapa (puede ser la ruta alternativa), no solo CEG_CSV
+    for path in sorted(paths) + [ceg.ceg_catalog_path() or ceg.CEG_CSV, tu_fechas.TU_CSV, final.TU_CSV]:
+        try:
+            with open(path, "rb") as f:
+                h.update(os.path.basename(path).encode("utf-8") + b"\0" + f.read())
+        except FileNotFoundError:
+            h.update(os.path.basename(path).encode("utf-8") + b"\0-")
+    h.update(json.dumps(stage_headers).encode("utf-8"))
+    return h.hexdigest()
+
+
+def order_hash(order: List[Dict[str, str]]) -> str:
+    """sha1 de las líneas RAW de una orden (columnas y valores, en orden)."""
+    return hashlib.sha1(json.dumps([list(raw.items()) for raw in order]).encode("utf-8")).hexdigest()
+
+
+class EtlState:
+    """
+    Líneas ya limpias en SQLite, por item_id: la huella de su orden en el export y la fila de salida
+    (NULL si el filtro la descarta). Cada corrida marca las líneas que vio; al cerrar se borran las
+    de órdenes que ya no están en el export.
+    """
+
+    def __init__(self, path: str, fingerprint: str):
+        self._db = sqlite3.connect(path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS lines (
+                item_id TEXT PRIMARY KEY, order_hash TEXT, output TEXT, run INTEGER
+            )""")
+        old = self._db.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if not old or old[0] != fingerprint:
+            self._db.execute("DELETE FROM lines")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+        self.run = (self._db.execute("SELECT MAX(run) FROM lines").fetchone()[0] or 0) + 1
+
+    def lookup(self, item_ids: List[str], order_hash: str) -> Optional[List[Optional[List[str]]]]:
+        """Filas de salida de la orden si todas sus líneas están con la misma huella; si no, None."""
+        if not all(item_ids) or len(set(item_ids)) != len(item_ids):
+            return None
+        marks = ",".join("?" * len(item_ids))
+        found = {
+            item_id: (h, output)
+            for item_id, h, output in self._db.execute(
+                f"SELECT item_id, order_hash, output FROM lines WHERE item_id IN ({marks})", item_ids)
+        }
+        if len(found) != len(item_ids) or any(h != order_hash for h, _ in found.values()):
+            return None
+        self._db.execute(f"UPDATE lines SET run = ? WHERE item_id IN ({marks})", [self.run] + item_ids)
+        return [json.loads(found[item_id][1]) if found[item_id][1] else None for item_id in item_ids]
+
+    def store(self, item_ids: List[str], order_hash: str, outputs: List[Optional[List[Any]]]) -> None:
+        self._db.executemany("INSERT OR REPLACE INTO lines VALUES (?, ?, ?, ?)", [
+            (item_id, order_hash, json.dumps(["" if v is None else str(v) for v in out]) if out else None, self.run)
+            for item_id, out in zip(item_ids, outputs) if item_id
+        ])
+
+    def close(self, commit: bool = True) -> None:
+        """Guarda la corrida (commit=False la descarta: el estado queda como estaba)."""
+        if commit:
+            self._db.execute("DELETE FROM lines WHERE run != ?", (self.run,))
+            self._db.commit()
+        self._db.close()
+
+
+def run_incremental(raws: Iterable[Dict[str, str]], stages: List[Stage], stage_headers: List[List[str]],
+                    has_enriched: bool, writer) -> Tuple[int, int, int]:
+    """
+    Como run_parallel, pero las órdenes que ya están en ETL_STATE_DB sin cambios en el export no
+    pasan por las etapas: se reusan sus filas limpias y solo se recalculan los días desde hoy.
+    Las órdenes nuevas o modificadas se procesan (de a PARTITION_ROWS filas) y se guardan.
+    Devuelve (filas leídas, filas escritas, órdenes reusadas).
+    """
+    headers = stage_headers[-1]
+    state = EtlState(ETL_STATE_DB, state_fingerprint(stage_headers))
+    counts = {"read": 0, "written": 0, "reused": 0}
+
+    def write(outputs: List[Optional[List[str]]]) -> None:
+        rows = [out for out in outputs if out is not None]
+        writer.writerows(rows)
+        counts["written"] += len(rows)
+
+    def reused(outputs: List[Optional[List[str]]]) -> None:
+        for out in outputs:
+            if out is not None:
+                row = dict(zip(headers, out))
+                final.set_days_since(row)
+                out[:] = _values(row, headers)
+        write(outputs)
+
+    def processed(orders: List[Tuple[List[str], str]]) -> Callable:
+        def done(result) -> None:
+            outputs, _, counters = result
+            _add_counters(stages, counters)
+            i = 0
+            for item_ids, h in orders:
+                state.store(item_ids, h, outputs[i:i + len(item_ids)])
+                i += len(item_ids)
+            write(outputs)
+        return done
+
+    try:
+        with PartitionRunner(stages, stage_headers, has_enriched) as runner:
+            batch: List[Dict[str, str]] = []
+            batch_orders: List[Tuple[List[str], str]] = []
+
+            def flush() -> None:
+                if batch:
+                    runner.run(list(batch), processed(list(batch_orders)), by_line=True)
+                    batch.clear()
+                    batch_orders.clear()
+
+            for order in partition_by_order(raws, size=1):
+                counts["read"] += len(order)
+                item_ids = [(raw.get("item_id") or "").strip() for raw in order]
+                h = order_hash(order)
+                cached = state.lookup(item_ids, h)
+                if cached is None:
+                    batch.extend(order)
+                    batch_orders.append((item_ids, h))
+                    if len(batch) >= PARTITION_ROWS:
+                        flush()
+                    continue
+                flush()
+                counts["reused"] += 1
+                runner.ready(cached, reused)
+            flush()
+    except BaseException:
+        state.close(commit=False)
+        raise
+    state.close()
+    return counts["read"], counts["written"], counts["reused"]
+
+
+def run_pipeline(output_csv: str = OUTPUT_CSV, dump_dir: Optional[str] = None) -> List[Stage]:
+    """
+    Lee el export una vez, pasa cada fila por todas las etapas y escribe output_csv una vez.
+    Con WORKERS > 1 las etapas corren en un pool de procesos, por particiones de órdenes enteras.
+    Con INCREMENTAL solo pasan por las etapas las órdenes nuevas o modificadas (ver run_incremental).
+    Con dump_dir también escribe el CSV de cada etapa (1.csv .. 9.csv) para compararlo con la cadena
+    (siempre procesando todo).
+    """
+    input_file, has_enriched, enriched_headers = limpieza.detect_input()
+    stages = build_stages()
+
+    # Headers de cada etapa: se calculan una sola vez
+    stage_headers = [limpieza.build_final_headers(has_enriched, enriched_headers)]
+    for stage in stages:
+        stage_headers.append(stage.headers_fn(stage_headers[-1]))
+
+    os.makedirs(os.path.dirname(output_csv) or ".", exist_ok=True)
+    tmp_output = output_csv + ".tmp"
+
+    with contextlib.ExitStack() as stack:
+        dumps = []
+        if dump_dir:
+            for i, headers in enumerate(stage_headers, 1):
+                f = stack.enter_context(open(os.path.join(dump_dir, f"{i}.csv"), "w", newline="", encoding="utf-8-sig"))
+                w = csv.writer(f)
+                w.writerow(headers)
+                dumps.append(w)
+
+        fin = stack.enter_context(open(input_file, "r", encoding="utf-8", newline=""))
+        fout = stack.enter_context(open(tmp_output, "w", newline="", encoding="utf-8-sig"))
+        writer = csv.writer(fout)
+        writer.writerow(stage_headers[-1])
+
+        reader = csv.DictReader(fin)
+        reused = None
+        if INCREMENTAL and not dump_dir:
+            print(f"📖 Leyendo {input_file} y procesando las órdenes nuevas o modificadas ({ETL_STATE_DB})...")
+            rows_read, rows_written, reused = run_incremental(reader, stages, stage_headers, has_enriched, writer)
+        elif WORKERS > 1:
+            print(f"📖 Leyendo {input_file} y procesando {len(stages) + 1} etapas en {WORKERS} procesos...")
+            run_parallel(reader, stages, stage_headers, has_enriched, writer, dumps)
+        else:
+            print(f"📖 Leyendo {input_file} y procesando {len(stages) + 1} etapas en una pasada...")
+            sinks = [lambda row, w=w, h=h: w.writerow(_values(row, h)) for w, h in zip(dumps, stage_headers)]
+            for row in process_rows(reader, stages, stage_headers, has_enriched, sinks or None):
+                writer.writerow(_values(row, stage_headers[-1]))
+
+    if reused is None:
+        # Toda fila leída entra a la primera etapa; las que salen de la última son las escritas
+        rows_read = stages[0].rows_in
+        rows_written = stages[-1].rows_out
+
+    if not rows_read:
+        os.remove(tmp_output)
+        raise SystemExit("ERROR: CSV vacío o no encontrado")
+    os.replace(tmp_output, output_csv)
+
+    print(f"   ✅ {rows_read} filas leídas, {rows_written} escritas en {output_csv}")
+    if reused is not None:
+        print(f"   ♻️  {reused} órdenes sin cambios reusadas del estado, {stages[0].rows_in} filas procesadas")
+
+    # Intermedio tipado para los análisis (ventas_tipadas.load_ventas)
+    if WRITE_PARQUET:
+        parquet_path = os.path.splitext(output_csv)[0] + ".parquet"
+        if ventas_tipadas.write_ventas_parquet(output_csv, parquet_path):
+            print(f"   ✅ Tipado: {parquet_path}")
+        else:
+            print(f"   ⚠️  Sin pyarrow: no se generó {parquet_path} (los análisis tipan el CSV al cargarlo)")
+    print("\n📊 Etapas:")
+    print(f"   {'etl_limpieza_ventas':<38} {stages[0].rows_in:>7} filas")
+    for stage in stages:
+        line = f"   {stage.name:<38} {stage.rows_in:>7} filas"
+        if stage.counter:
+            line += f"  ({stage.counter}: {stage.hits})"
+        print(line)
+    return stages
+
+
+# =========================================================
+# Verificación contra la cadena de scripts
+# =========================================================
+@contextlib.contextmanager
+def _patched(module, **values):
+    old = {k: getattr(module, k) for k in values}
+    for k, v in values.items():
+        setattr(module, k, v)
+    try:
+        yield
+    finally:
+        for k, v in old.items():
+            setattr(module, k, v)
+
+
+def run_chain(work_dir: str, stages: List[Stage]) -> List[str]:
+    """Corre los 9 scripts en orden, cada uno sobre la salida del anterior, y devuelve sus CSV."""
+    paths = []
+    steps = [(limpieza, "process_csv")] + [(s.module, s.script_fn) for s in stages]
+    for i, (module, fn) in enumerate(steps, 1):
+        out = os.path.join(work_dir, f"{i}.csv")
+        values = {"OUTPUT_CSV": out}
+        if paths:
+            values["INPUT_CSV"] = paths[-1]
+        with _patched(module, **values), contextlib.redirect_stdout(io.StringIO()):
+            getattr(module, fn)()
+        paths.append(out)
+    return paths
+
+
+def _first_diff(a: str, b: str) -> Optional[str]:
+    with open(a, "rb") as fa, open(b, "rb") as fb:
+        for n, (la, lb) in enumerate(zip(fa, fb), 1):
+            if la != lb:
+                return f"línea {n}:\n      cadena: {la[:200]!r}\n      motor:  {lb[:200]!r}"
+        rest_a, rest_b = fa.read(), fb.read()
+    if rest_a or rest_b:
+        return "distinta cantidad de líneas"
+    return None
+
+
+def verify_against_chain() -> bool:
+    """Corre motor y cadena en un directorio temporal y compara el CSV de cada etapa byte a byte."""
+    tmp = tempfile.mkdtemp(prefix="etl_verify_")
+    try:
+        chain_dir = os.path.join(tmp, "cadena")
+        fused_dir = os.path.join(tmp, "motor")
+        os.makedirs(chain_dir)
+        os.makedirs(fused_dir)
+
+        print("\n🔍 Verificando contra la cadena de scripts...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            stages = run_pipeline(os.path.join(fused_dir, "final.csv"), dump_dir=fused_dir)
+        chain_paths = run_chain(chain_dir, stages)
+
+        ok = True
+        names = ["etl_limpieza_ventas"] + [s.name for s in stages]
+        for i, (name, chain_csv) in enumerate(zip(names, chain_paths), 1):
+            diff = _first_diff(chain_csv, os.path.join(fused_dir, f"{i}.csv"))
+            if diff:
+                ok = False
+                print(f"   ❌ {i}. {name}: difiere en {diff}")
+            else:
+                print(f"   ✅ {i}. {name}")
+        return ok
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    t0 = time.perf_counter()
+    run_pipeline()
+    print(f"\n⏱️  {time.perf_counter() - t0:.1f}s")
+
+    if VERIFY_AGAINST_CHAIN and not verify_against_chain():
+        raise SystemExit("❌ El motor no coincide con la cadena de scripts")
+
+
+if __name__ == "__main__":
+    print("🔄 Iniciando ETL de ventas (una pasada)...")
+    main()
+    print("\n✨ Proceso completado!")
@@ -1,79 +1,795 @@
+import asyncio
+import contextlib
 import csv
+import gzip
+import hashlib
+import json
 import math
+import os
+import queue
+import random
+import shutil
+import sqlite3
 import time
+import zlib
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, Dict, List, Optional, Tuple, Set
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Set
 
 import requests
 from tqdm import tqdm
 
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+try:
+    import ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
+
 # =========================================================
 # HARDCODE (como pediste)
 # =========================================================
 API_URL = "https://www.tradeunity.com.ar/rest/V1/orders"
 API_TOKEN = "ih8enp7eks5g2ddp170zlj4bdckyjjpl"
 
-PAGE_SIZE = 100              # 50/100/200 según el server
+PAGE_SIZE = 100              # 50/100/200 según el server (con STREAM_DECODE subirlo no sube la RAM)
 MAX_WORKERS = 16             # si te rate-limitea, bajalo a 8
+PAGE_WINDOW = 32             # máx. páginas de orders en vuelo (descarga concurrente)
 REQUEST_TIMEOUT = 120
 
+# Las páginas de /orders se decodifican en streaming (ijson) order por order y se escriben
+# directo a su part-file: nunca se arma el árbol JSON de la página entera en memoria.
+# Sin ijson instalado se decodifica la página completa con json (como antes).
+STREAM_DECODE = True
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Engine de descarga: "async" (asyncio + aiohttp, concurrencia adaptativa) o "threads"
+# (ThreadPoolExecutor con MAX_WORKERS fijo). Sin aiohttp instalado cae a "threads".
+# En "async" no hace falta tocar MAX_WORKERS: la concurrencia arranca en
+# ASYNC_START_CONCURRENCY y se ajusta sola (AIMD) según 429/5xx y Retry-After.
+EXPORT_ENGINE = "async"
+ASYNC_START_CONCURRENCY = 8
+ASYNC_MIN_CONCURRENCY = 1
+ASYNC_MAX_CONCURRENCY = 64
+ASYNC_RATE_LIMIT = 50.0      # req/s máximo (token bucket); None = sin tope
+ASYNC_BURST = 20
+ASYNC_DECREASE_COOLDOWN = 1.0  # seg. mínimos entre dos recortes de concurrencia
+ASYNC_IO_THREADS = 4         # threads para lo bloqueante del engine (cache SQLite, json.loads)
+
 # Enrichment (catálogo actual)
 ENRICH_PRODUCTS = True
-INCLUDE_CATEGORY_NAMES = True      # OJO: puede ser muy lento
+# Pipeline: el enrich corre en paralelo a la descarga de orders (los SKUs de cada página se
+# resuelven apenas llegan) y el RAW + CSV enriquecido se escriben en la misma pasada, sin releer
+# el RAW. False = flujo en pasos (RAW completo -> enrich de todos los SKUs -> build_final_csv).
+STREAM_ENRICH = True
+PIPELINE_QUEUE_SIZE = 64     # páginas / lotes de SKUs encolados entre etapas (backpressure)
+INCLUDE_CATEGORY_NAMES = True      # el árbol de categorías se baja una sola vez (GET /categories)
 BRAND_ATTRIBUTE_CODES = ["manufacturer", "brand", "marca"]  # probamos en este orden
 
+# Mirror local de productos: se llena con búsquedas bulk (sku IN (...)) y se
+# refresca incrementalmente por updated_at. El enrich pasa a ser un lookup local.
+PRODUCT_MIRROR_JSON = "productos_mirror.json"
+PRODUCT_BATCH_SIZE = 100     # SKUs por request a /products
+
+# Dead-letter del enrich: SKUs que quedaron sin datos (request fallido, SKU inexistente, options
+# de marca que no bajaron) con la causa. RETRY_DEAD_LETTERS = True reintenta solo esos SKUs y
+# parchea sus columnas en el CSV enriquecido, sin re-exportar ni re-enriquecer el resto.
+ENRICH_DEAD_LETTER_JSON = "enrich_dead_letter.json"
+RETRY_DEAD_LETTERS = False
+
+# Proyección: pedir con fields= solo lo que usamos (orders: lo que sale de ORDER_COLUMNS /
+# ITEM_COLUMNS; productos: lo que guarda el mirror). Mucho menos payload y JSON para decodear.
+FIELD_PROJECTION = True
+PRODUCT_FIELDS = ["sku", "updated_at", "custom_attributes", "extension_attributes.category_links"]
+
 RAW_CSV = "ventas_historicas_items_raw.csv"
 OUT_CSV = "ventas_historicas_items_enriched.csv"
 
+# Sync incremental: si ya existe el RAW y hay watermark, solo bajamos
+# las orders con updated_at >= watermark y las upserteamos en el RAW.
+INCREMENTAL_SYNC = True
+STATE_JSON = "ventas_export_state.json"
+
+# Export full particionado por ventanas de created_at (SHARD_MONTHS meses): cada ventana se
+# pagina por separado y en paralelo (SHARD_PARALLELISM ventanas a la vez). Las consultas quedan
+# cortas (sin currentPage altos, que en Magento son lentos) y lo que se crea durante la corrida
+# solo mueve la última ventana. Se unen en orden y se deduplica por item_id.
+SHARDED_EXPORT = False
+SHARD_MONTHS = 1
+SHARD_PARALLELISM = 4
+
+# Checkpoints: si el export se corta, la próxima corrida sigue desde acá.
+# Se borra solo cuando main() termina OK.
+CHECKPOINT_DIR = "ventas_export_checkpoint"
+
+# Archivo de orders crudas: NDJSON gzip, un archivo por mes de created_at (orders_YYYY-MM.ndjson.gz).
+# Con REPLAY_FROM_ARCHIVE = True main() rearma RAW + enriched desde el archivo, el mirror de
+# productos y el cache HTTP, sin ningún request a Magento (p.ej. tras tocar effective_item_values).
+# Ojo: con FIELD_PROJECTION se archiva lo proyectado; para poder agregar columnas nuevas sin
+# re-bajar, correr el export con FIELD_PROJECTION = False.
+ORDER_ARCHIVE = True
+ORDER_ARCHIVE_DIR = "ventas_archive"
+REPLAY_FROM_ARCHIVE = False
+
+# Cache HTTP persistente (SQLite) entre corridas. TTL por endpoint (segundos, 0 = no se cachea);
+# la primera regla cuyo prefijo matchea el path bajo /rest/V1 gana. Vencido el TTL se revalida
+# con If-None-Match / If-Modified-Since si el server mandó ETag / Last-Modified.
+HTTP_CACHE_ENABLED = True
+HTTP_CACHE_DB = "magento_http_cache.sqlite"
+HTTP_CACHE_TTLS = [
+    ("/orders", 0),                       # siempre fresco (el sync incremental ya acota)
+    ("/products/attributes/", 24 * 3600),  # options de marca
+    ("/categories", 24 * 3600),           # árbol de categorías
+    ("/products/", 12 * 3600),            # GET /products/{sku}
+    ("/products", 0),                     # búsquedas searchCriteria (el mirror ya es incremental)
+]
+
+# Telemetría de la corrida: latencias por endpoint (percentiles + histograma), status, reintentos,
+# tiempo durmiendo (backoff / Retry-After / limiter) y bytes. Se escribe como JSON junto a los CSV
+# y se resume en consola al terminar (también si la corrida falla). None = no escribir el JSON.
+RUN_REPORT_JSON = "ventas_export_report.json"
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
 
 # =========================================================
 # HTTP helpers (robustos con backoff)
 # =========================================================
 _thread_local = threading.local()
 
+def _auth_headers() -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {API_TOKEN}",
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+    }
+
 def _get_session() -> requests.Session:
     """Una Session por thread (requests.Session no es thread-safe)."""
     if getattr(_thread_local, "session", None) is None:
         s = requests.Session()
-        s.headers.update({
-            "Authorization": f"Bearer {API_TOKEN}",
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-        })
+        s.headers.update(_auth_headers())
         _thread_local.session = s
     return _thread_local.session
 
-def http_get_json(url: str, params: Optional[Dict[str, str]] = None, max_retries: int = 8) -> Any:
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After viene en segundos o como fecha HTTP."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HttpCache:
+    """Cache de respuestas GET en SQLite: key(url+params) -> body (zlib) + ETag/Last-Modified."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY, url TEXT, body BLOB,
+                etag TEXT, last_modified TEXT, stored_at REAL
+            )""")
+        self._db.commit()
+
+    @staticmethod
+    def key(url: str, params: Optional[Dict[str, str]]) -> str:
+        raw = url + "?" + json.dumps(sorted((params or {}).items()))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, etag, last_modified, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        return {"body": zlib.decompress(row[0]).decode("utf-8"),
+                "etag": row[1], "last_modified": row[2], "stored_at": row[3]}
+
+    def put(self, key: str, url: str, body: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, url, zlib.compress(body.encode("utf-8")), etag, last_modified, time.time()),
+            )
+            self._db.commit()
+
+    def touch(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("UPDATE responses SET stored_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+
+
+_http_cache: Optional[HttpCache] = None
+_http_cache_lock = threading.Lock()
+
+def get_http_cache() -> Optional[HttpCache]:
+    global _http_cache
+    if not HTTP_CACHE_ENABLED:
+        return None
+    with _http_cache_lock:
+        if _http_cache is None:
+            _http_cache = HttpCache(HTTP_CACHE_DB)
+    return _http_cache
+
+def cache_ttl_for(url: str) -> int:
+    path = url[len(REST_ROOT):] if url.startswith(REST_ROOT) else url
+    for prefix, ttl in HTTP_CACHE_TTLS:
+        if path.startswith(prefix):
+            return ttl
+    return 0
+
+
+class CachedLookup:
+    """Resultado de mirar el cache antes de un GET: body fresco, o headers para revalidar."""
+
+    def __init__(self, url: str, params: Optional[Dict[str, str]], max_age: Optional[float]):
+        ttl = cache_ttl_for(url)
+        self.url = url
+        self.cache = get_http_cache() if ttl > 0 else None
+        self.key = HttpCache.key(url, params) if self.cache else ""
+        self.entry = self.cache.get(self.key) if self.cache else None
+        max_age = ttl if max_age is None else max_age
+        self.fresh = bool(self.entry) and time.time() - self.entry["stored_at"] < max_age
+
+        self.headers: Dict[str, str] = {}
+        if self.entry and self.entry["etag"]:
+            self.headers["If-None-Match"] = self.entry["etag"]
+        if self.entry and self.entry["last_modified"]:
+            self.headers["If-Modified-Since"] = self.entry["last_modified"]
+
+    def not_modified(self) -> Any:
+        self.cache.touch(self.key)
+        return json.loads(self.entry["body"])
+
+    def store(self, body: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        if self.cache:
+            self.cache.put(self.key, self.url, body, etag, last_modified)
+
+
+TRANSIENT_STATUS = (429, 500, 502, 503, 504)
+
+
+def endpoint_name(url: str) -> str:
+    """Agrupa URLs por endpoint para la telemetría (orders, product, products_search, ...)."""
+    path = url[len(REST_ROOT):] if url.startswith(REST_ROOT) else url
+    if path.startswith("/orders"):
+        return "orders"
+    if path.startswith("/products/attributes/"):
+        return "attribute_options"
+    if path.startswith("/products/"):
+        return "product"
+    if path.startswith("/products"):
+        return "products_search"
+    if path.startswith("/categories"):
+        return "categories"
+    return path.split("?", 1)[0]
+
+
+class Telemetry:
+    """Contadores de la corrida por endpoint y tiempos por fase. Thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.time()
+            self.endpoints: Dict[str, Dict[str, Any]] = {}
+            self.phases: Dict[str, float] = {}
+
+    def _ep(self, endpoint: str) -> Dict[str, Any]:
+        ep = self.endpoints.get(endpoint)
+        if ep is None:
+            ep = self.endpoints[endpoint] = {
+                "latencies": [], "status": {}, "retries": 0, "sleep_s": 0.0,
+                "limiter_wait_s": 0.0, "bytes": 0, "cache_fresh": 0,
+            }
+        return ep
+
+    def request(self, endpoint: str, status: Any, seconds: float, nbytes: int = 0) -> None:
+        """Un intento HTTP terminado (status numérico o nombre de la excepción)."""
+        with self._lock:
+            ep = self._ep(endpoint)
+            ep["latencies"].append(seconds)
+            ep["status"][str(status)] = ep["status"].get(str(status), 0) + 1
+            ep["bytes"] += nbytes
+
+    def retry(self, endpoint: str, sleep_s: float = 0.0) -> None:
+        with self._lock:
+            ep = self._ep(endpoint)
+            ep["retries"] += 1
+            ep["sleep_s"] += sleep_s
+
+    def add(self, endpoint: str, field: str, value: float = 1) -> None:
+        with self._lock:
+            self._ep(endpoint)[field] += value
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - t0
+
+    @staticmethod
+    def _bucket_label(bound: Optional[int]) -> str:
+        return f"<={bound}ms" if bound is not None else f">{LATENCY_BUCKETS_MS[-1]}ms"
+
+    @staticmethod
+    def _percentile(sorted_values: List[float], q: float) -> float:
+        if not sorted_values:
+            return 0.0
+        return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {}
+            for name, ep in sorted(self.endpoints.items()):
+                lat = sorted(ep["latencies"])
+                hist = {self._bucket_label(b): 0 for b in LATENCY_BUCKETS_MS + [None]}
+                for v in lat:
+                    hist[self._bucket_label(next((b for b in LATENCY_BUCKETS_MS if v * 1000 <= b), None))] += 1
+                endpoints[name] = {
+                    "requests": len(lat),
+                    "status": dict(sorted(ep["status"].items())),
+                    "retries": ep["retries"],
+                    "cache_fresh": ep["cache_fresh"],
+                    "bytes": ep["bytes"],
+                    "sleep_s": round(ep["sleep_s"], 3),
+                    "limiter_wait_s": round(ep["limiter_wait_s"], 3),
+                    "latency_ms": {
+                        "p50": round(self._percentile(lat, 0.50) * 1000, 1),
+                        "p90": round(self._percentile(lat, 0.90) * 1000, 1),
+                        "p99": round(self._percentile(lat, 0.99) * 1000, 1),
+                        "max": round(lat[-1] * 1000, 1) if lat else 0.0,
+                        "mean": round(sum(lat) / len(lat) * 1000, 1) if lat else 0.0,
+                    },
+                    "latency_histogram": hist,
+                }
+            return {
+                "started_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+                "elapsed_s": round(time.time() - self.started, 3),
+                "config": {"EXPORT_ENGINE": EXPORT_ENGINE, "PAGE_SIZE": PAGE_SIZE, "MAX_WORKERS": MAX_WORKERS,
+                           "PAGE_WINDOW": PAGE_WINDOW, "FIELD_PROJECTION": FIELD_PROJECTION,
+                           "STREAM_DECODE": STREAM_DECODE and HAS_IJSON},
+                "phases_s": {k: round(v, 3) for k, v in self.phases.items()},
+                "single_flight_coalesced": _inflight.coalesced + _attribute_options.coalesced,
+                "single_flight_memo_hits": _inflight.memo_hits + _attribute_options.memo_hits,
+                "endpoints": endpoints,
+            }
+
+    def summarize(self, path: Optional[str]) -> None:
+        rep = self.report()
+        if path:
+            _write_json_atomic(path, rep)
+        print(f"\nTelemetría ({rep['elapsed_s']:.1f}s) " + " | ".join(f"{k} {v:.1f}s" for k, v in rep["phases_s"].items()))
+        for name, ep in rep["endpoints"].items():
+            lat = ep["latency_ms"]
+            print(f"  {name:<18} req={ep['requests']:<6} p50={lat['p50']:.0f}ms p90={lat['p90']:.0f}ms "
+                  f"p99={lat['p99']:.0f}ms retries={ep['retries']} sleep={ep['sleep_s']:.1f}s "
+                  f"limiter={ep['limiter_wait_s']:.1f}s MB={ep['bytes'] / 1e6:.1f} cache={ep['cache_fresh']}")
+        if path:
+            print(f"Reporte -> {path}")
+
+_telemetry = Telemetry()
+
+class BodySink:
+    """
+    Destino de un body que se consume en streaming (ver http_get_json(stream_to=...)):
+    feed() recibe los bytes a medida que llegan, finish() devuelve el resultado y abort()
+    descarta lo parcial si el request falla a mitad (el reintento arranca con un sink nuevo).
+    """
+
+    def feed(self, chunk: bytes) -> None:
+        raise NotImplementedError
+
+    def finish(self) -> Any:
+        raise NotImplementedError
+
+    def abort(self) -> None:
+        pass
+
+SinkFactory = Callable[[], BodySink]
+
+
+class SingleFlight:
+    """
+    Coalesce llamadas concurrentes con la misma key: la primera ejecuta fn y las demás
+    esperan y reciben el mismo resultado (o la misma excepción). Thread-safe.
+    memo=True además guarda el resultado para siempre (cache en memoria del proceso);
+    memo=False solo junta las llamadas que se pisan en el tiempo.
+    keep decide qué resultados se memoizan (p. ej. no los errores): los que no, solo los
+    reciben las llamadas que ya estaban esperando y la próxima vuelve a ejecutar fn.
+    coalesced cuenta las llamadas que esperaron un fn en vuelo; memo_hits las que leyeron
+    un resultado ya guardado.
+    El resultado es compartido: no mutarlo.
+    """
+
+    def __init__(self, memo: bool = False, keep: Optional[Callable[[Any], bool]] = None):
+        self.memo = memo
+        self.keep = keep
+        self.coalesced = 0
+        self.memo_hits = 0
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            fut = self._calls.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._calls[key] = Future()
+            elif fut.done():
+                self.memo_hits += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return fut.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self._calls.pop(key, None)
+            fut.set_exception(e)
+            raise
+        if not self.memo or (self.keep is not None and not self.keep(result)):
+            # Se saca antes de publicar el resultado: quien llegue después ejecuta fn de nuevo
+            with self._lock:
+                self._calls.pop(key, None)
+        fut.set_result(result)
+        return result
+
+_inflight = SingleFlight()
+
+def http_get_json(url: str, params: Optional[Dict[str, str]] = None, max_retries: int = 8,
+                  max_age: Optional[float] = None, stream_to: Optional[SinkFactory] = None) -> Any:
+    """
+    GET JSON con backoff. Si el endpoint tiene TTL (HTTP_CACHE_TTLS) pasa por el cache en disco:
+    entrada fresca -> sin red; vencida -> request condicional (304 = reusamos el body).
+    max_age pisa el TTL solo para esta lectura (max_age=0 fuerza revalidar).
+    Con stream_to el body no se decodifica acá: se le pasa por chunks a un sink nuevo por
+    intento y se devuelve sink.finish() (solo para endpoints sin cache, TTL 0).
+    Con EXPORT_ENGINE="async" el request lo hace el engine asyncio (mismo pool y limiter).
+    GETs idénticos concurrentes (misma url+params) comparten un solo request (single-flight).
+    """
+    if REPLAY_FROM_ARCHIVE:
+        return _offline_get_json(url, params)
+    if stream_to:
+        return _http_get_json(url, params, max_retries, max_age, stream_to)
+    key = f"{HttpCache.key(url, params)}|{max_age}"
+    return _inflight.do(key, lambda: _http_get_json(url, params, max_retries, max_age))
+
+def _http_get_json(url: str, params: Optional[Dict[str, str]], max_retries: int,
+                   max_age: Optional[float], stream_to: Optional[SinkFactory] = None) -> Any:
+    engine = get_async_engine()
+    if engine:
+        return engine.submit(url, params, max_retries, max_age, stream_to).result()
+
+    ep = endpoint_name(url)
+    lookup = CachedLookup(url, params, max_age)
+    if lookup.fresh:
+        _telemetry.add(ep, "cache_fresh")
+        return json.loads(lookup.entry["body"])
+
     backoff = 1.0
     last_err = None
     for _ in range(max_retries):
+        t0 = time.perf_counter()
         try:
-            r = _get_session().get(url, params=params, timeout=REQUEST_TIMEOUT)
+            r = _get_session().get(url, params=params, timeout=REQUEST_TIMEOUT, headers=lookup.headers,
+                                   stream=bool(stream_to))
+            if r.status_code == 304 and lookup.entry:
+                _telemetry.request(ep, 304, time.perf_counter() - t0)
+                return lookup.not_modified()
+
+            if r.status_code == 200 and stream_to:
+                sink = stream_to()
+                nbytes = 0
+                try:
+                    for chunk in r.iter_content(STREAM_CHUNK_BYTES):
+                        nbytes += len(chunk)
+                        sink.feed(chunk)
+                    result = sink.finish()
+                except BaseException:
+                    sink.abort()
+                    raise
+                finally:
+                    r.close()
+                _telemetry.request(ep, 200, time.perf_counter() - t0, nbytes)
+                return result
+
+            _telemetry.request(ep, r.status_code, time.perf_counter() - t0, len(r.content))
             if r.status_code == 200:
+                lookup.store(r.text, r.headers.get("ETag"), r.headers.get("Last-Modified"))
                 return r.json()
 
-            # retry transient
-            if r.status_code in (429, 500, 502, 503, 504):
-                time.sleep(min(backoff, 30))
+            # retry transient (respetando Retry-After si viene)
+            if r.status_code in TRANSIENT_STATUS:
+                wait = parse_retry_after(r.headers.get("Retry-After"))
+                wait = wait if wait is not None else min(backoff, 30)
+                _telemetry.retry(ep, wait)
+                time.sleep(wait)
                 backoff *= 2
                 continue
 
             # hard fail
             raise RuntimeError(f"HTTP {r.status_code} | {url} | {r.text[:800]}")
         except Exception as e:
+            if isinstance(e, requests.RequestException):
+                _telemetry.request(ep, type(e).__name__, time.perf_counter() - t0)
             last_err = e
+            _telemetry.retry(ep, min(backoff, 30))
             time.sleep(min(backoff, 30))
             backoff *= 2
     raise RuntimeError(f"Max retries excedido | {url} | last_err={last_err}")
 
 
+def _offline_get_json(url: str, params: Optional[Dict[str, str]] = None) -> Any:
+    """Replay: nada de red, solo lo que haya en el cache HTTP (sin importar el TTL)."""
+    cache = get_http_cache()
+    entry = cache.get(HttpCache.key(url, params)) if cache else None
+    if entry is None:
+        raise RuntimeError(f"Replay offline: {url} no está en el cache HTTP")
+    return json.loads(entry["body"])
+
+
+# =========================================================
+# Engine asyncio: pool de conexiones compartido + rate limit adaptativo (AIMD)
+# =========================================================
+class AdaptiveLimiter:
+    """
+    Token bucket (ASYNC_RATE_LIMIT req/s) + ventana de concurrencia AIMD:
+    cada respuesta OK suma 1/limit (≈ +1 por "ronda"), cada 429/5xx la divide por 2
+    (como mucho una vez por ASYNC_DECREASE_COOLDOWN) y un Retry-After pausa a todos.
+    Vive dentro del loop del engine: no necesita locks.
+    """
+
+    def __init__(self):
+        self.limit = float(ASYNC_START_CONCURRENCY)
+        self.in_flight = 0
+        self.tokens = float(ASYNC_BURST)
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.peak_limit = self.limit
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        while True:
+            async with self._cond:
+                pause = self.paused_until - time.monotonic()
+                if pause <= 0:
+                    if self.in_flight < int(self.limit):
+                        self.in_flight += 1
+                        break
+                    await self._cond.wait()
+                    continue
+            # La pausa por Retry-After se duerme sin el lock: los release() de los requests en
+            # vuelo siguen entrando y la ventana AIMD se sigue actualizando
+            await asyncio.sleep(pause)
+        await self._take_token()
+
+    async def _take_token(self) -> None:
+        if not ASYNC_RATE_LIMIT:
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(ASYNC_BURST, self.tokens + (now - self.last_refill) * ASYNC_RATE_LIMIT)
+            self.last_refill = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / ASYNC_RATE_LIMIT)
+
+    async def release(self, throttled: bool, retry_after: Optional[float] = None) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                if now - self.last_decrease >= ASYNC_DECREASE_COOLDOWN:
+                    self.limit = max(ASYNC_MIN_CONCURRENCY, self.limit / 2)
+                    self.last_decrease = now
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+            else:
+                self.limit = min(ASYNC_MAX_CONCURRENCY, self.limit + 1 / self.limit)
+                self.peak_limit = max(self.peak_limit, self.limit)
+            self._cond.notify_all()
+
+
+class AsyncEngine:
+    """
+    Loop asyncio en un thread propio con una aiohttp.ClientSession compartida.
+    submit() se puede llamar desde cualquier thread y devuelve un concurrent.futures.Future.
+    """
+
+    def __init__(self):
+        # Lo bloqueante (SQLite del cache, json.loads de bodies enteros) corre en este pool y no en
+        # el loop: si no, frena a todos los requests en vuelo y al limiter mientras dura
+        self._io = ThreadPoolExecutor(max_workers=ASYNC_IO_THREADS, thread_name_prefix="magento-io")
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="magento-async", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+
+    async def _start(self) -> None:
+        self.limiter = AdaptiveLimiter()
+        self.session = aiohttp.ClientSession(
+            headers=_auth_headers(),
+            connector=aiohttp.TCPConnector(limit=ASYNC_MAX_CONCURRENCY),
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+        )
+
+    def submit(self, url: str, params: Optional[Dict[str, str]] = None, max_retries: int = 8,
+               max_age: Optional[float] = None, stream_to: Optional[SinkFactory] = None) -> Future:
+        return asyncio.run_coroutine_threadsafe(
+            self.get_json(url, params, max_retries, max_age, stream_to), self.loop)
+
+    async def _off_loop(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """fn(*args) en el pool de IO (ASYNC_IO_THREADS), sin bloquear el loop."""
+        return await asyncio.wrap_future(self._io.submit(fn, *args))
+
+    @staticmethod
+    def _store_and_parse(lookup: CachedLookup, body: str, resp_headers: Any) -> Any:
+        lookup.store(body, resp_headers.get("ETag"), resp_headers.get("Last-Modified"))
+        return json.loads(body)
+
+    async def get_json(self, url: str, params: Optional[Dict[str, str]], max_retries: int,
+                       max_age: Optional[float], stream_to: Optional[SinkFactory] = None) -> Any:
+        ep = endpoint_name(url)
+        if cache_ttl_for(url) > 0:
+            lookup = await self._off_loop(CachedLookup, url, params, max_age)
+        else:
+            lookup = CachedLookup(url, params, max_age)  # sin cache: no toca SQLite
+        if lookup.fresh:
+            _telemetry.add(ep, "cache_fresh")
+            return await self._off_loop(json.loads, lookup.entry["body"])
+
+        backoff = 1.0
+        last_err = None
+        for _ in range(max_retries):
+            t_wait = time.perf_counter()
+            await self.limiter.acquire()
+            t0 = time.perf_counter()
+            _telemetry.add(ep, "limiter_wait_s", t0 - t_wait)  # incluye pausas por Retry-After
+            throttled, retry_after, error = False, None, None
+            try:
+                try:
+                    async with self.session.get(url, params=params, headers=lookup.headers) as r:
+                        status = r.status
+                        resp_headers = r.headers
+                        if status == 200 and stream_to:
+                            # un corte a mitad del body cae en el except de abajo y se reintenta
+                            result, nbytes = await self._stream(r, stream_to)
+                            _telemetry.request(ep, 200, time.perf_counter() - t0, nbytes)
+                            return result
+                        body = await r.text()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    _telemetry.request(ep, type(e).__name__, time.perf_counter() - t0)
+                    throttled, error = True, e
+                else:
+                    _telemetry.request(ep, status, time.perf_counter() - t0, len(body.encode("utf-8")))
+                    if status in TRANSIENT_STATUS:
+                        throttled = True
+                        retry_after = parse_retry_after(resp_headers.get("Retry-After"))
+            finally:
+                # Siempre, también si la tarea se cancela (fetch_pages_ordered cancela las páginas
+                # pendientes): si no, el slot queda tomado e in_flight no vuelve a bajar
+                await self.limiter.release(throttled=throttled, retry_after=retry_after)
+
+            if error is not None:
+                last_err = error
+                _telemetry.retry(ep, min(backoff, 30))
+                await asyncio.sleep(min(backoff, 30))
+                backoff *= 2
+                continue
+
+            if status in TRANSIENT_STATUS:
+                last_err = RuntimeError(f"HTTP {status}")
+                if retry_after is None:
+                    # sin Retry-After: backoff corto con jitter, el limiter ya bajó la concurrencia
+                    wait = min(backoff, 30) * random.uniform(0.5, 1.0)
+                    _telemetry.retry(ep, wait)
+                    await asyncio.sleep(wait)
+                    backoff *= 2
+                else:
+                    _telemetry.retry(ep)  # la espera la hace el limiter (limiter_wait_s)
+                continue
+
+            if status == 304 and lookup.entry:
+                return await self._off_loop(lookup.not_modified)
+            if status == 200:
+                return await self._off_loop(self._store_and_parse, lookup, body, resp_headers)
+            raise RuntimeError(f"HTTP {status} | {url} | {body[:800]}")
+        raise RuntimeError(f"Max retries excedido | {url} | last_err={last_err}")
+
+    async def _stream(self, r: "aiohttp.ClientResponse", stream_to: SinkFactory) -> Any:
+        # feed() (ijson + escritura de la part) corre en el pool de IO, de a uno y en orden:
+        # mientras se decodifica un chunk el loop ya recibe el siguiente (a lo sumo uno en espera)
+        sink = stream_to()
+        nbytes = 0
+        feeding: Optional[Future] = None
+        try:
+            async for chunk in r.content.iter_chunked(STREAM_CHUNK_BYTES):
+                nbytes += len(chunk)
+                if feeding is not None:
+                    await asyncio.wrap_future(feeding)
+                feeding = self._io.submit(sink.feed, chunk)
+            if feeding is not None:
+                await asyncio.wrap_future(feeding)
+            return await self._off_loop(sink.finish), nbytes
+        except BaseException:
+            # shield: el abort termina aunque la tarea se cancele de nuevo; el reintento reabre
+            # los mismos .tmp, así que tiene que haber terminado antes
+            await asyncio.shield(self._off_loop(self._abort_sink, sink, feeding))
+            raise
+
+    @staticmethod
+    def _abort_sink(sink: BodySink, feeding: Optional[Future]) -> None:
+        if feeding is not None and not feeding.cancel():
+            feeding.exception()  # espera al feed() en curso: no cerrar el archivo debajo suyo
+        sink.abort()
+
+    def close(self) -> None:
+        async def _close():
+            await self.session.close()
+        asyncio.run_coroutine_threadsafe(_close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self._io.shutdown(wait=True)
+        print(f"Engine async: concurrencia final {int(self.limiter.limit)} (pico {int(self.limiter.peak_limit)})")
+
+
+_async_engine: Optional[AsyncEngine] = None
+_async_engine_lock = threading.Lock()
+
+def get_async_engine() -> Optional[AsyncEngine]:
+    """El engine asyncio si EXPORT_ENGINE="async" (y aiohttp está instalado); si no, None -> threads."""
+    global _async_engine
+    if EXPORT_ENGINE != "async" or not HAS_AIOHTTP:
+        return None
+    with _async_engine_lock:
+        if _async_engine is None:
+            _async_engine = AsyncEngine()
+    return _async_engine
+
+def close_async_engine() -> None:
+    global _async_engine
+    with _async_engine_lock:
+        if _async_engine is not None:
+            _async_engine.close()
+            _async_engine = None
+
+
 # =========================================================
 # Magento endpoints
 # =========================================================
 REST_ROOT = API_URL[:-len("/orders")]  # ".../rest/V1"
 
-def fetch_orders_page(page: int) -> Dict[str, Any]:
+Request = Tuple[str, Dict[str, str]]  # (url, params)
+
+def orders_page_request(page: int, updated_since: Optional[str] = None,
+                        created_window: Optional[Tuple[str, Optional[str]]] = None) -> Request:
     # Sin filtros: trae todo. Le damos sort para estabilidad.
     params = {
         "searchCriteria[sortOrders][0][field]": "created_at",
@@ -81,7 +797,27 @@ def fetch_orders_page(page: int) -> Dict[str, Any]:
         "searchCriteria[pageSize]": str(PAGE_SIZE),
         "searchCriteria[currentPage]": str(page),
     }
-    return http_get_json(API_URL, params=params)
+    if FIELD_PROJECTION:
+        params["fields"] = ORDERS_FIELDS
+    filters: List[Tuple[str, str, str]] = []
+    # Incremental: solo orders modificadas desde el watermark (gteq -> idempotente)
+    if updated_since:
+        filters.append(("updated_at", updated_since, "gteq"))
+    # Shard: created_at en [desde, hasta); hasta=None -> ventana abierta
+    if created_window:
+        filters.append(("created_at", created_window[0], "gteq"))
+        if created_window[1]:
+            filters.append(("created_at", created_window[1], "lt"))
+    for i, (field, value, cond) in enumerate(filters):  # un filter_group por filtro = AND
+        params.update({
+            f"searchCriteria[filter_groups][{i}][filters][0][field]": field,
+            f"searchCriteria[filter_groups][{i}][filters][0][value]": value,
+            f"searchCriteria[filter_groups][{i}][filters][0][condition_type]": cond,
+        })
+    return API_URL, params
+
+def fetch_orders_page(page: int, updated_since: Optional[str] = None) -> Dict[str, Any]:
+    return http_get_json(*orders_page_request(page, updated_since))
 
 def get_custom_attr(product_json: Dict[str, Any], code: str) -> Optional[Any]:
     for a in product_json.get("custom_attributes", []) or []:
@@ -89,40 +825,68 @@ def get_custom_attr(product_json: Dict[str, Any], code: str) -> Optional[Any]:
             return a.get("value")
     return None
 
-def fetch_product(sku: str) -> Dict[str, Any]:
+def try_fetch_product(sku: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    """GET /products/{sku} -> (producto, None) o ({}, causa del error)."""
     sku = (sku or "").strip()
     if not sku:
-        return {}
+        return {}, "SKU vacío"
     url = f"{REST_ROOT}/products/{requests.utils.quote(sku, safe='')}"
+    params = {"fields": fields_projection(PRODUCT_FIELDS)} if FIELD_PROJECTION else None
     try:
-        return http_get_json(url)
-    except Exception:
-        return {}
+        return http_get_json(url, params=params) or {}, None
+    except Exception as e:
+        return {}, str(e)
 
-def fetch_attribute_options(attribute_code: str) -> Dict[str, str]:
+def fetch_product(sku: str) -> Dict[str, Any]:
+    return try_fetch_product(sku)[0]
+
+def products_search_request(filters: List[Tuple[str, str, str]], page: int, page_size: int) -> Request:
+    """GET /products con searchCriteria. filters = [(field, value, condition_type)] (AND entre sí)."""
+    params = {
+        "searchCriteria[pageSize]": str(page_size),
+        "searchCriteria[currentPage]": str(page),
+    }
+    for i, (field, value, cond) in enumerate(filters):
+        params.update({
+            f"searchCriteria[filter_groups][{i}][filters][0][field]": field,
+            f"searchCriteria[filter_groups][{i}][filters][0][value]": value,
+            f"searchCriteria[filter_groups][{i}][filters][0][condition_type]": cond,
+        })
+    if FIELD_PROJECTION:
+        params["fields"] = fields_projection(["total_count"] + [f"items.{f}" for f in PRODUCT_FIELDS])
+    return f"{REST_ROOT}/products", params
+
+def try_fetch_attribute_options(attribute_code: str) -> Tuple[Dict[str, str], Optional[str]]:
+    """option_id -> label del atributo, o ({}, causa del error)."""
     url = f"{REST_ROOT}/products/attributes/{requests.utils.quote(attribute_code, safe='')}/options"
     try:
         data = http_get_json(url) or []
-    except Exception:
-        return {}
+    except Exception as e:
+        return {}, str(e)
     m = {}
     for opt in data:
         v = str(opt.get("value", "")).strip()
         l = str(opt.get("label", "")).strip()
         if v:
             m[v] = l
-    return m
+    return m, None
 
-def fetch_category_name(cat_id: str) -> str:
-    cat_id = str(cat_id).strip()
-    if not cat_id:
-        return ""
-    url = f"{REST_ROOT}/categories/{requests.utils.quote(cat_id, safe='')}"
-    try:
-        data = http_get_json(url)
-        return str(data.get("name", "")).strip()
-    except Exception:
-        return ""
+def fetch_attribute_options(attribute_code: str) -> Dict[str, str]:
+    return try_fetch_attribute_options(attribute_code)[0]
+
+# Los errores no se memoizan: una falla transitoria no deja el atributo vacío el resto de la corrida
+_attribute_options = SingleFlight(memo=True, keep=lambda result: result[1] is None)
+
+def get_attribute_options(attribute_code: str) -> Tuple[Dict[str, str], Optional[str]]:
+    """
+    try_fetch_attribute_options memoizado y thread-safe: un solo request OK por atributo (y por
+    corrida). Si falla, las llamadas que ya esperaban comparten el error y la siguiente reintenta.
+    """
+    return _attribute_options.do(attribute_code, lambda: try_fetch_attribute_options(attribute_code))
+
+def fetch_category_tree(max_age: Optional[float] = None) -> Dict[str, Any]:
+    """GET /categories: devuelve el árbol completo (id, name, level, children_data)."""
+    return http_get_json(f"{REST_ROOT}/categories", max_age=max_age)
 
 
 # =========================================================
@@ -155,105 +919,964 @@ def effective_item_values(item: Dict[str, Any], parent: Optional[Dict[str, Any]]
 # =========================================================
 # Export Paso 1: Orders -> RAW CSV (sin enrich) + set de SKUs
 # =========================================================
-RAW_HEADERS = [
-    # Order header
-    "increment_id", "entity_id", "created_at", "updated_at", "status",
-    "customer_email", "customer_firstname", "customer_lastname", "customer_taxvat",
-    "order_currency_code", "base_currency_code", "currency_rate",
-    "grand_total", "subtotal", "discount_amount_order", "shipping_amount", "tax_amount_order",
-    # Item
-    "item_id", "parent_item_id", "product_type", "sku", "name", "qty_ordered",
-    "original_price", "price", "price_incl_tax",
-    "discount_amount_item", "discount_percent_item",
-    "row_total", "row_total_incl_tax",
-    "tax_percent_item", "tax_amount_item",
+# (columna RAW, campo de Magento). Los campos de order con "." son anidados.
+ORDER_COLUMNS = [
+    ("increment_id", "increment_id"), ("entity_id", "entity_id"),
+    ("created_at", "created_at"), ("updated_at", "updated_at"), ("status", "status"),
+    ("customer_email", "customer_email"), ("customer_firstname", "customer_firstname"),
+    ("customer_lastname", "customer_lastname"), ("customer_taxvat", "customer_taxvat"),
+    ("order_currency_code", "order_currency_code"), ("base_currency_code", "base_currency_code"),
+    ("currency_rate", "extension_attributes.currency_rate"),
+    ("grand_total", "grand_total"), ("subtotal", "subtotal"),
+    ("discount_amount_order", "discount_amount"), ("shipping_amount", "shipping_amount"),
+    ("tax_amount_order", "tax_amount"),
+]
+# Los campos de precio del item pasan por effective_item_values (fallback al parent)
+ITEM_COLUMNS = [
+    ("item_id", "item_id"), ("parent_item_id", "parent_item_id"), ("product_type", "product_type"),
+    ("sku", "sku"), ("name", "name"), ("qty_ordered", "qty_ordered"),
+    ("original_price", "original_price"), ("price", "price"), ("price_incl_tax", "price_incl_tax"),
+    ("discount_amount_item", "discount_amount"), ("discount_percent_item", "discount_percent"),
+    ("row_total", "row_total"), ("row_total_incl_tax", "row_total_incl_tax"),
+    ("tax_percent_item", "tax_percent"), ("tax_amount_item", "tax_amount"),
 ]
+RAW_HEADERS = [h for h, _ in ORDER_COLUMNS] + [h for h, _ in ITEM_COLUMNS]
+ENTITY_ID_IDX = RAW_HEADERS.index("entity_id")
+CREATED_AT_IDX = RAW_HEADERS.index("created_at")
+SKU_IDX = RAW_HEADERS.index("sku")
+ITEM_ID_IDX = RAW_HEADERS.index("item_id")
+
+
+def fields_projection(paths: List[str]) -> str:
+    """["items.sku", "items.extension_attributes.x", "total_count"] -> "items[sku,extension_attributes[x]],total_count"."""
+    tree: Dict[str, Any] = {}
+    for path in paths:
+        node = tree
+        for part in path.split("."):
+            node = node.setdefault(part, {})
+
+    def render(node: Dict[str, Any]) -> str:
+        return ",".join(k + (f"[{render(v)}]" if v else "") for k, v in node.items())
+
+    return render(tree)
+
+# fields= de /orders: exactamente lo que usa order_rows (sale de las columnas de arriba)
+ORDERS_FIELDS = fields_projection(
+    ["total_count"]
+    + [f"items.{src}" for _, src in ORDER_COLUMNS]
+    + [f"items.items.{src}" for _, src in ITEM_COLUMNS]
+)
+
+
+def _get_path(obj: Dict[str, Any], path: str) -> Any:
+    for part in path.split(".")[:-1]:
+        obj = obj.get(part) or {}
+    return obj.get(path.split(".")[-1], "")
 
-def export_raw_and_collect_skus() -> Set[str]:
-    first = fetch_orders_page(1)
-    total_count = int(first.get("total_count", 0) or 0)
+def order_rows(o: Dict[str, Any]) -> List[List[Any]]:
+    """Aplana una order de Magento en filas RAW (una por item), en el orden de RAW_HEADERS."""
+    order_values = [_get_path(o, src) for _, src in ORDER_COLUMNS]
+
+    items = o.get("items", []) or []
+    items_by_id = {str(i.get("item_id")): i for i in items if i.get("item_id") is not None}
+
+    rows = []
+    for it in items:
+        parent = items_by_id.get(str(it.get("parent_item_id"))) if it.get("parent_item_id") else None
+        eff = effective_item_values(it, parent)
+
+        row = order_values + [eff[src] if src in eff else it.get(src, "") for _, src in ITEM_COLUMNS]
+        row[SKU_IDX] = str(row[SKU_IDX] or "").strip()
+        rows.append(row)
+    return rows
+
+
+# =========================================================
+# Estado del export (watermark updated_at para sync incremental)
+# =========================================================
+def _read_json(path: str) -> Optional[Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def _write_json_atomic(path: str, obj: Any) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def load_state() -> Dict[str, Any]:
+    return _read_json(STATE_JSON) or {}
+
+def save_state(state: Dict[str, Any]) -> None:
+    _write_json_atomic(STATE_JSON, state)
+
+
+# =========================================================
+# Checkpoints: una part-file CSV por página + manifest (export reanudable)
+# =========================================================
+def _part_path(job_dir: str, page: int) -> str:
+    return os.path.join(job_dir, f"page_{page:06d}.csv")
+
+def _archive_part_path(job_dir: str, page: int) -> str:
+    """Orders crudas de la página (NDJSON), para el archivo por mes (ver ORDER_ARCHIVE)."""
+    return os.path.join(job_dir, f"page_{page:06d}.ndjson")
+
+def _load_manifest(job_dir: str, key: str) -> Dict[str, Any]:
+    """Manifest de páginas completas. Si cambió la consulta (key) o el PAGE_SIZE, arranca de cero."""
+    m = _read_json(os.path.join(job_dir, "manifest.json"))
+    if not m or m.get("key") != key or m.get("page_size") != PAGE_SIZE or m.get("archive") != ORDER_ARCHIVE:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        m = {"key": key, "page_size": PAGE_SIZE, "archive": ORDER_ARCHIVE, "total_pages": 0, "pages": {}}
+    os.makedirs(job_dir, exist_ok=True)
+    return m
+
+def _save_manifest(job_dir: str, manifest: Dict[str, Any]) -> None:
+    _write_json_atomic(os.path.join(job_dir, "manifest.json"), manifest)
+
+class OrderPartWriter(BodySink):
+    """
+    Sink de una página de /orders: decodifica el JSON a medida que llegan los bytes (ijson)
+    y escribe las filas de cada order a la part-file apenas se cierra la order, así en memoria
+    hay una sola order por página en vuelo. Tmp + rename: nunca queda una part a medias.
+    """
+
+    def __init__(self, path: str, archive_path: Optional[str] = None):
+        self.path = path
+        self.archive_path = archive_path
+        self._f = open(path + ".tmp", "w", newline="", encoding="utf-8")
+        self._w = csv.writer(self._f)
+        self._archive = open(archive_path + ".tmp", "w", encoding="utf-8") if archive_path else None
+        self.orders = 0
+        self.total_count = 0
+        self.max_updated_at = ""
+        self.skus: Set[str] = set()
+
+        self._streaming = STREAM_DECODE and HAS_IJSON
+        self._chunks: List[bytes] = []
+        if self._streaming:
+            self._events = ijson.sendable_list()
+            self._parser = ijson.parse_coro(self._events, use_float=True)  # floats = mismo CSV que json
+            self._builder = None
+
+    def feed(self, chunk: bytes) -> None:
+        if not self._streaming:
+            self._chunks.append(chunk)
+            return
+        self._parser.send(chunk)
+        self._drain()
+
+    def _drain(self) -> None:
+        for prefix, event, value in self._events:
+            if self._builder is not None:
+                self._builder.event(event, value)
+                if prefix == "items.item" and event == "end_map":
+                    self._write_order(self._builder.value)
+                    self._builder = None
+            elif prefix == "items.item" and event == "start_map":
+                self._builder = ijson.ObjectBuilder()
+                self._builder.event(event, value)
+            elif prefix == "total_count" and event == "number":
+                self.total_count = int(value)
+        del self._events[:]
+
+    def _write_order(self, o: Dict[str, Any]) -> None:
+        rows = order_rows(o)
+        self._w.writerows(rows)
+        if self._archive:
+            self._archive.write(json.dumps(o, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.orders += 1
+        self.max_updated_at = max(self.max_updated_at, str(o.get("updated_at") or ""))
+        self.skus.update(row[SKU_IDX] for row in rows if row[SKU_IDX])
+
+    def finish(self) -> Dict[str, Any]:
+        if self._streaming:
+            self._parser.close()
+            self._drain()
+        else:
+            data = json.loads(b"".join(self._chunks))
+            self._chunks = []
+            self.total_count = int(data.get("total_count", 0) or 0)
+            for o in data.get("items", []) or []:
+                self._write_order(o)
+        self._f.close()
+        if self._archive:
+            self._archive.close()
+            os.replace(self.archive_path + ".tmp", self.archive_path)
+        os.replace(self.path + ".tmp", self.path)
+        return {
+            "orders": self.orders,
+            "max_updated_at": self.max_updated_at,
+            "skus": sorted(self.skus),
+            "total_count": self.total_count,
+        }
+
+    def abort(self) -> None:
+        self._f.close()
+        tmps = [self.path + ".tmp"]
+        if self._archive:
+            self._archive.close()
+            tmps.append(self.archive_path + ".tmp")
+        for tmp in tmps:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+def _part_sink(job_dir: str, page: int) -> SinkFactory:
+    archive_path = _archive_part_path(job_dir, page) if ORDER_ARCHIVE else None
+    return lambda: OrderPartWriter(_part_path(job_dir, page), archive_path)
+
+def download_order_pages(job_dir: str, key: str, request_for: Callable[[int], Request],
+                         desc: str = "Descargando orders", progress: bool = True,
+                         on_page: Optional[Callable[[int, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Baja todas las páginas de una consulta de /orders a part-files en job_dir.
+    Las páginas ya completas del manifest no se vuelven a pedir; solo se repiten
+    las incompletas (la última página puede haber crecido desde la corrida anterior).
+    on_page(page, info) se llama en orden de página apenas cada part-file está lista
+    (también para las reanudadas): es la entrada de la siguiente etapa del pipeline.
+    """
+    manifest = _load_manifest(job_dir, key)
+    done: Dict[str, Dict[str, Any]] = manifest["pages"]
+
+    first = http_get_json(*request_for(1), stream_to=_part_sink(job_dir, 1))
+    total_count = first.pop("total_count")
     total_pages = max(1, math.ceil(total_count / PAGE_SIZE)) if total_count else 1
+    manifest["total_pages"] = total_pages
+
+    for p in list(done):
+        if done[p]["orders"] < PAGE_SIZE or int(p) > total_pages:
+            del done[p]
+    if len(done) > 1 and progress:
+        print(f"Reanudando export: {len(done)}/{total_pages} páginas ya descargadas en {job_dir}")
+
+    done["1"] = first
+    _save_manifest(job_dir, manifest)
+
+    # cada página se escribe a su part-file mientras se descarga; acá solo llega el resumen
+    next_page = 1
+
+    def hand_off(upto: int) -> None:
+        nonlocal next_page
+        while on_page and next_page <= upto:
+            on_page(next_page, done[str(next_page)])
+            next_page += 1
+
+    missing = [p for p in range(2, total_pages + 1) if str(p) not in done]
+    pages = fetch_pages_ordered(missing, request_for, sink_for=lambda p: _part_sink(job_dir, p))
+    for page, info in tqdm(pages, total=len(missing), desc=desc, unit="page", disable=not progress):
+        info.pop("total_count", None)
+        done[str(page)] = info
+        _save_manifest(job_dir, manifest)
+        hand_off(page)
+    hand_off(total_pages)
+
+    return manifest
+
+def read_part_rows(job_dir: str, page: int) -> Iterator[List[str]]:
+    with open(_part_path(job_dir, page), "r", newline="", encoding="utf-8") as f:
+        yield from csv.reader(f)
+
+def iter_part_rows(job_dir: str, manifest: Dict[str, Any]) -> Iterator[List[str]]:
+    for page in range(1, manifest["total_pages"] + 1):
+        yield from read_part_rows(job_dir, page)
+
+
+def fetch_pages_ordered(pages: Iterable[int], request_for: Callable[[int], Request],
+                        sink_for: Optional[Callable[[int], SinkFactory]] = None,
+                        return_exceptions: bool = False) -> Iterator[Tuple[int, Any]]:
+    """
+    Descarga páginas en paralelo con una ventana acotada (PAGE_WINDOW): con el engine async
+    la concurrencia la regula el limiter; con threads, MAX_WORKERS.
+    Las páginas que terminan antes esperan su turno: se yieldean (page, data) en el orden
+    de `pages`, así el único writer (el consumidor) escribe un resultado determinístico.
+    Con sink_for cada página se consume en streaming (ver BodySink) y data es sink.finish().
+    Con return_exceptions una página que falla se yieldea como (page, excepción) en vez de cortar.
+    """
+    engine = get_async_engine()
+    ex = None if engine else ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+    def submit(page: int) -> Future:
+        url, params = request_for(page)
+        stream_to = sink_for(page) if sink_for else None
+        if engine:
+            return engine.submit(url, params, stream_to=stream_to)
+        return ex.submit(http_get_json, url, params, stream_to=stream_to)
+
+    page_iter = iter(pages)
+    window: deque = deque()
+    try:
+        for page in page_iter:
+            window.append((page, submit(page)))
+            if len(window) >= PAGE_WINDOW:
+                break
+        while window:
+            page, fut = window.popleft()
+            try:
+                data = fut.result()
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                data = e
+            nxt = next(page_iter, None)
+            if nxt is not None:
+                window.append((nxt, submit(nxt)))
+            yield page, data
+    finally:
+        if ex:
+            ex.shutdown(wait=True, cancel_futures=True)
+        else:
+            for _, fut in window:
+                fut.cancel()
+
+
+# =========================================================
+# Pipeline del export: etapas en threads unidas por colas acotadas
+# =========================================================
+_STOP = object()
+
+@contextlib.contextmanager
+def consumer_stage(consume: Callable[[Any], None]) -> Iterator[Callable[[Any], None]]:
+    """
+    Corre consume(item) en un thread aparte, alimentado por una cola de PIPELINE_QUEUE_SIZE:
+    el with entrega put(item), que bloquea si la etapa va atrasada (backpressure). Al salir
+    espera a que se consuma todo; si la etapa falla, su excepción sube en el productor.
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+
+    def run() -> None:
+        while True:
+            item = q.get()
+            if item is _STOP:
+                return
+            consume(item)
+
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        fut = ex.submit(run)
+
+        def put(item: Any) -> None:
+            while True:
+                try:
+                    q.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    if fut.done():
+                        fut.result()
+                        raise RuntimeError("La etapa del pipeline terminó antes de tiempo")
+
+        try:
+            yield put
+        finally:
+            put(_STOP)
+        fut.result()
+
+
+class ExportWriter:
+    """
+    Único writer del export: cada fila va al RAW y, con enricher (STREAM_ENRICH), también al
+    CSV enriquecido en la misma pasada. Los dos se escriben a .tmp y se renombran al salir
+    del with sin error (si algo falla quedan los archivos de la corrida anterior).
+    """
+
+    def __init__(self, enricher: Optional["StreamEnricher"] = None):
+        self.enricher = enricher
+        self._targets = [(RAW_CSV, RAW_HEADERS)]
+        if enricher:
+            self._targets.append((OUT_CSV, RAW_HEADERS + ENRICH_HEADERS))
+        self._files: List[Any] = []
+
+    def __enter__(self) -> "ExportWriter":
+        writers = []
+        for path, headers in self._targets:
+            f = open(path + ".tmp", "w", newline="", encoding="utf-8")
+            self._files.append(f)
+            writers.append(csv.writer(f))
+            writers[-1].writerow(headers)
+        self._raw = writers[0]
+        self._out = writers[1] if self.enricher else None
+        return self
+
+    def writerow(self, row: List[Any]) -> None:
+        self._raw.writerow(row)
+        if self._out is not None:
+            sku = str(row[SKU_IDX] or "").strip() if len(row) > SKU_IDX else ""
+            self._out.writerow(list(row) + list(self.enricher.get(sku)))
+
+    def writerows(self, rows: Iterable[List[Any]]) -> None:
+        for row in rows:
+            self.writerow(row)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        for f in self._files:
+            f.close()
+        for path, _ in self._targets:
+            if exc_type is None:
+                os.replace(path + ".tmp", path)
+            else:
+                with contextlib.suppress(OSError):
+                    os.remove(path + ".tmp")
+
+
+def _prefetch_skus(enricher: Optional["StreamEnricher"]) -> Optional[Callable[[int, Dict[str, Any]], None]]:
+    """on_page que pasa los SKUs de cada página al enricher apenas se descarga."""
+    if not enricher:
+        return None
+    return lambda page, info: enricher.submit(info["skus"])
+
+
+def export_raw_and_collect_skus(enricher: Optional["StreamEnricher"] = None) -> Set[str]:
+    state = load_state()
+    watermark = state.get("updated_at_watermark") or ""
+
+    if INCREMENTAL_SYNC and watermark and os.path.exists(RAW_CSV):
+        sku_set, new_watermark = _sync_incremental(watermark, enricher)
+    elif SHARDED_EXPORT:
+        sku_set, new_watermark = _export_sharded(enricher)
+    else:
+        sku_set, new_watermark = _export_full(enricher)
+
+    if new_watermark:
+        state["updated_at_watermark"] = max(new_watermark, watermark)
+    state["last_run"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    save_state(state)
+
+    print(f"OK RAW -> {RAW_CSV}" + (f" | FINAL -> {OUT_CSV}" if enricher else ""))
+    print(f"SKUs únicos detectados: {len(sku_set)}")
+    return sku_set
+
+
+def _manifest_summary(*manifests: Dict[str, Any]) -> Tuple[Set[str], str]:
+    pages = [info for m in manifests for info in m["pages"].values()]
+    sku_set = {sku for info in pages for sku in info["skus"]}
+    watermark = max((info["max_updated_at"] for info in pages), default="")
+    return sku_set, watermark
+
+
+def _export_full(enricher: Optional["StreamEnricher"] = None) -> Tuple[Set[str], str]:
+    """
+    Descarga -> writer en etapas: cada part-file terminada pasa (en orden) al thread writer,
+    que la vuelca al RAW y al CSV final mientras se siguen bajando las páginas siguientes.
+    """
+    job_dir = os.path.join(CHECKPOINT_DIR, "orders_full")
+    prefetch = _prefetch_skus(enricher)
+
+    with ExportWriter(enricher) as out, \
+         consumer_stage(lambda page: out.writerows(read_part_rows(job_dir, page))) as write_page:
+        def on_page(page: int, info: Dict[str, Any]) -> None:
+            if prefetch:
+                prefetch(page, info)
+            write_page(page)
+
+        manifest = download_order_pages(job_dir, "full", lambda p: orders_page_request(p), on_page=on_page)
+
+    if ORDER_ARCHIVE:
+        archive_job_orders([(job_dir, manifest)], replace=True)
+    return _manifest_summary(manifest)
+
+
+def shard_windows(first_created_at: str) -> List[Tuple[str, Optional[str]]]:
+    """Ventanas [desde, hasta) de SHARD_MONTHS meses desde el mes de la primera order hasta hoy (UTC)."""
+    y, m = int(first_created_at[:4]), int(first_created_at[5:7])
+    now = time.gmtime()
+    windows: List[Tuple[str, Optional[str]]] = []
+    while (y, m) <= (now.tm_year, now.tm_mon):
+        ny, nm = y + (m - 1 + SHARD_MONTHS) // 12, (m - 1 + SHARD_MONTHS) % 12 + 1
+        windows.append((f"{y:04d}-{m:02d}-01 00:00:00", f"{ny:04d}-{nm:02d}-01 00:00:00"))
+        y, m = ny, nm
+    # la última queda abierta: entra lo que se cree durante la corrida
+    windows[-1] = (windows[-1][0], None)
+    return windows
+
+
+def _export_sharded(enricher: Optional["StreamEnricher"] = None) -> Tuple[Set[str], str]:
+    """
+    Export full por ventanas de created_at (ver SHARDED_EXPORT). Cada ventana es un job
+    reanudable propio (mismo esquema de part-files + manifest) y se bajan en paralelo.
+    Como las ventanas no se pisan, deduplicar por item_id dentro de cada una alcanza
+    (cubre filas repetidas si la paginación se corre durante la corrida).
+    """
+    url, params = orders_page_request(1)
+    first = http_get_json(url, dict(params, **{"searchCriteria[pageSize]": "1"}))
+    items = first.get("items", []) or []
+    windows = shard_windows(str(items[0].get("created_at") or "")) if items else []
+    print(f"Export particionado: {len(windows)} ventanas de {SHARD_MONTHS} mes(es) desde {windows[0][0] if windows else '-'}")
+
+    root = os.path.join(CHECKPOINT_DIR, "orders_sharded")
+
+    def run(window: Tuple[str, Optional[str]]) -> Tuple[str, Dict[str, Any]]:
+        lo, hi = window
+        job_dir = os.path.join(root, f"shard_{lo[:7]}")
+        key = f"created_at>={lo}" + (f"&created_at<{hi}" if hi else "")
+        manifest = download_order_pages(job_dir, key, lambda p: orders_page_request(p, created_window=window),
+                                        progress=False, on_page=_prefetch_skus(enricher))
+        return job_dir, manifest
+
+    # ex.map entrega las ventanas en orden: cada una se escribe apenas termina (y las anteriores)
+    jobs: List[Tuple[str, Dict[str, Any]]] = []
+    dupes = 0
+    with ThreadPoolExecutor(max_workers=SHARD_PARALLELISM) as ex, ExportWriter(enricher) as out:
+        for job_dir, manifest in tqdm(ex.map(run, windows), total=len(windows),
+                                      desc="Descargando orders por ventana", unit="shard"):
+            jobs.append((job_dir, manifest))
+            seen: Set[str] = set()
+            for row in iter_part_rows(job_dir, manifest):
+                if row[ITEM_ID_IDX] in seen:
+                    dupes += 1
+                    continue
+                seen.add(row[ITEM_ID_IDX])
+                out.writerow(row)
+    if dupes:
+        print(f"Export particionado: {dupes} filas repetidas descartadas (item_id)")
+
+    if ORDER_ARCHIVE:
+        archive_job_orders(jobs, replace=True)
+    return _manifest_summary(*(m for _, m in jobs))
+
+
+def _sync_incremental(watermark: str, enricher: Optional["StreamEnricher"] = None) -> Tuple[Set[str], str]:
+    """
+    Baja solo las orders con updated_at >= watermark y las upsertea en el RAW:
+    - orders existentes (mismo entity_id) se reemplazan en su lugar (todas sus líneas/item_id)
+    - orders nuevas se agregan al final, ordenadas por created_at
+    """
+    print(f"Sync incremental desde updated_at >= {watermark}")
+
+    job_dir = os.path.join(CHECKPOINT_DIR, "orders_incremental")
+    manifest = download_order_pages(job_dir, f"updated_at>={watermark}",
+                                    lambda p: orders_page_request(p, watermark),
+                                    desc="Descargando orders modificadas", on_page=_prefetch_skus(enricher))
+
+    # Por order, sus líneas por item_id: si una order vieja se modifica durante la corrida entra
+    # al filtro y corre la paginación, y la fila del borde de cada página llega dos veces.
+    # Queda la última copia (como en _export_sharded).
+    changed: Dict[str, Dict[str, List[str]]] = {}
+    created_at: Dict[str, str] = {}
+    dupes = 0
+    for row in iter_part_rows(job_dir, manifest):
+        eid = row[ENTITY_ID_IDX]
+        lines = changed.setdefault(eid, {})
+        if row[ITEM_ID_IDX] in lines:
+            dupes += 1
+        lines[row[ITEM_ID_IDX]] = row
+        created_at[eid] = row[CREATED_AT_IDX]
+    _, new_watermark = _manifest_summary(manifest)
+
+    print(f"Orders nuevas/modificadas: {len(changed)}")
+    if dupes:
+        print(f"Sync incremental: {dupes} filas repetidas descartadas (item_id)")
+
+    sku_set: Set[str] = set()
+    emitted: Set[str] = set()
+
+    # el writer va primero: el RAW viejo se cierra antes de que se reemplace
+    with ExportWriter(enricher) as out, open(RAW_CSV, "r", newline="", encoding="utf-8") as fin:
+        r = csv.reader(fin)
+        next(r, None)
+
+        def emit(rows: List[List[Any]]):
+            for row in rows:
+                sku = str(row[SKU_IDX] or "").strip()
+                if sku:
+                    sku_set.add(sku)
+                out.writerow(row)
+
+        for row in r:
+            eid = row[ENTITY_ID_IDX] if len(row) > ENTITY_ID_IDX else ""
+            if eid in changed:
+                if eid not in emitted:
+                    emit(list(changed[eid].values()))
+                    emitted.add(eid)
+                continue
+            emit([row])
+
+        for eid in sorted((e for e in changed if e not in emitted), key=lambda e: created_at[e]):
+            emit(list(changed[eid].values()))
+
+    if ORDER_ARCHIVE:
+        archive_job_orders([(job_dir, manifest)], replace=False)
+    return sku_set, new_watermark
+
+
+# =========================================================
+# Archivo NDJSON por mes + replay offline (RAW desde el archivo, cero requests)
+# =========================================================
+def _archive_month_path(archive_dir: str, month: str) -> str:
+    return os.path.join(archive_dir, f"orders_{month}.ndjson.gz")
+
+def archive_job_orders(jobs: List[Tuple[str, Dict[str, Any]]], replace: bool) -> None:
+    """
+    Pasa las orders crudas de los jobs [(job_dir, manifest)] (page_*.ndjson) al archivo por mes, en streaming.
+    replace=True (export full): el archivo se arma de cero y reemplaza al anterior.
+    replace=False (incremental): se agrega un member gzip nuevo a cada mes tocado; la order
+    vieja queda en el archivo y el replay se queda con la última versión por entity_id.
+    Cada mes se escribe a .tmp + rename (copiando los bytes viejos sin recomprimir).
+    """
+    out_dir = ORDER_ARCHIVE_DIR + ".tmp" if replace else ORDER_ARCHIVE_DIR
+    if replace:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir, exist_ok=True)
+
+    writers: Dict[str, Tuple[Any, gzip.GzipFile]] = {}  # mes -> (archivo .tmp, gzip member nuevo)
+
+    def writer_for(month: str) -> gzip.GzipFile:
+        if month not in writers:
+            path = _archive_month_path(out_dir, month)
+            raw = open(path + ".tmp", "wb")
+            if not replace and os.path.exists(path):
+                with open(path, "rb") as old:
+                    shutil.copyfileobj(old, raw)
+            writers[month] = (raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0))
+        return writers[month][1]
+
+    n = 0
+    try:
+        for job_dir, manifest in jobs:
+            for page in range(1, manifest["total_pages"] + 1):
+                with open(_archive_part_path(job_dir, page), "r", encoding="utf-8") as f:
+                    for line in f:
+                        month = str(json.loads(line).get("created_at") or "")[:7] or "sin_fecha"
+                        writer_for(month).write(line.encode("utf-8"))
+                        n += 1
+    finally:
+        for raw, gz in writers.values():
+            gz.close()
+            raw.close()
+
+    for month in writers:
+        path = _archive_month_path(out_dir, month)
+        os.replace(path + ".tmp", path)
+    if replace:
+        shutil.rmtree(ORDER_ARCHIVE_DIR, ignore_errors=True)
+        os.replace(out_dir, ORDER_ARCHIVE_DIR)
+    print(f"Archivo de orders: {n} orders en {len(writers)} meses -> {ORDER_ARCHIVE_DIR}/")
+
+def iter_archived_orders() -> Iterator[Dict[str, Any]]:
+    """Orders del archivo, un mes por vez: última versión por entity_id, en orden de created_at."""
+    months = sorted(f for f in os.listdir(ORDER_ARCHIVE_DIR) if f.endswith(".ndjson.gz"))
+    for name in tqdm(months, desc="Replay archivo", unit="mes"):
+        latest: Dict[str, Dict[str, Any]] = {}
+        with gzip.open(os.path.join(ORDER_ARCHIVE_DIR, name), "rt", encoding="utf-8") as f:
+            for line in f:
+                o = json.loads(line)
+                latest[str(o.get("entity_id", ""))] = o  # el dict conserva la posición original
+        yield from sorted(latest.values(), key=lambda o: str(o.get("created_at") or ""))
+
+def replay_raw_from_archive(enricher: Optional["StreamEnricher"] = None) -> Set[str]:
+    if not os.path.isdir(ORDER_ARCHIVE_DIR):
+        raise SystemExit(f"REPLAY_FROM_ARCHIVE=True pero no existe {ORDER_ARCHIVE_DIR}/ (correr el export una vez)")
 
     sku_set: Set[str] = set()
+    with ExportWriter(enricher) as out:
+        for o in iter_archived_orders():
+            rows = order_rows(o)
+            out.writerows(rows)
+            sku_set.update(row[SKU_IDX] for row in rows if row[SKU_IDX])
 
-    with open(RAW_CSV, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(RAW_HEADERS)
-
-        def process_page(data: Dict[str, Any]):
-            orders = data.get("items", []) or []
-            for o in orders:
-                inc = o.get("increment_id", "")
-                entity_id = o.get("entity_id", "")
-                created = o.get("created_at", "")
-                updated = o.get("updated_at", "")
-                status = o.get("status", "")
-
-                email = o.get("customer_email", "")
-                fn = o.get("customer_firstname", "")
-                ln = o.get("customer_lastname", "")
-                taxvat = o.get("customer_taxvat", "")
-
-                order_currency = o.get("order_currency_code", "")
-                base_currency = o.get("base_currency_code", "")
-                currency_rate = (o.get("extension_attributes") or {}).get("currency_rate", "")
-
-                grand_total = o.get("grand_total", "")
-                subtotal = o.get("subtotal", "")
-                discount_amount_order = o.get("discount_amount", "")
-                shipping_amount = o.get("shipping_amount", "")
-                tax_amount_order = o.get("tax_amount", "")
-
-                items = o.get("items", []) or []
-                items_by_id = {str(i.get("item_id")): i for i in items if i.get("item_id") is not None}
-
-                for it in items:
-                    parent = items_by_id.get(str(it.get("parent_item_id"))) if it.get("parent_item_id") else None
-                    eff = effective_item_values(it, parent)
-
-                    sku = str(it.get("sku", "") or "").strip()
-                    if sku:
-                        sku_set.add(sku)
-
-                    w.writerow([
-                        inc, entity_id, created, updated, status,
-                        email, fn, ln, taxvat,
-                        order_currency, base_currency, currency_rate,
-                        grand_total, subtotal, discount_amount_order, shipping_amount, tax_amount_order,
-                        it.get("item_id", ""), it.get("parent_item_id", ""), it.get("product_type", ""),
-                        sku, it.get("name", ""), it.get("qty_ordered", ""),
-                        eff["original_price"], eff["price"], eff["price_incl_tax"],
-                        eff["discount_amount"], eff["discount_percent"],
-                        eff["row_total"], eff["row_total_incl_tax"],
-                        eff["tax_percent"], eff["tax_amount"],
-                    ])
-
-        # page 1
-        process_page(first)
-
-        # restantes
-        for page in tqdm(range(2, total_pages + 1), desc="Descargando orders", unit="page"):
-            data = fetch_orders_page(page)
-            process_page(data)
-
-    print(f"OK RAW -> {RAW_CSV}")
+    print(f"OK RAW (replay) -> {RAW_CSV}" + (f" | FINAL -> {OUT_CSV}" if enricher else ""))
     print(f"SKUs únicos detectados: {len(sku_set)}")
     return sku_set
 
 
+# =========================================================
+# Dead-letter del enrich (SKUs sin datos + causa) y retry dirigido
+# =========================================================
+class DeadLetters:
+    """SKUs cuyo enrich falló en esta corrida: sku -> {"stage", "error"}. Thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, str]] = {}
+
+    def add(self, sku: str, stage: str, error: str) -> None:
+        with self._lock:
+            self.entries.setdefault(sku, {"stage": stage, "error": str(error)[:500]})
+
+    def save(self, retried: Optional[Set[str]] = None) -> None:
+        """
+        Corrida normal (retried=None): el archivo pasa a ser exactamente los fallos de esta corrida.
+        Retry: se sacan los SKUs que se arreglaron y los que siguen fallando suman un intento.
+        """
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        previous = _read_json(ENRICH_DEAD_LETTER_JSON) or {}
+        out = {sku: e for sku, e in previous.items() if retried is not None and sku not in retried}
+        for sku, e in sorted(self.entries.items()):
+            prev = previous.get(sku, {})
+            out[sku] = {
+                "stage": e["stage"],
+                "error": e["error"],
+                "first_failed_at": prev.get("first_failed_at", now),
+                "last_failed_at": now,
+                "attempts": int(prev.get("attempts", 0)) + 1,
+            }
+        if out:
+            _write_json_atomic(ENRICH_DEAD_LETTER_JSON, out)
+            print(f"Dead-letter: {len(out)} SKUs sin enrich -> {ENRICH_DEAD_LETTER_JSON} (RETRY_DEAD_LETTERS=True para reintentar)")
+        elif os.path.exists(ENRICH_DEAD_LETTER_JSON):
+            os.remove(ENRICH_DEAD_LETTER_JSON)
+
+_dead_letters = DeadLetters()
+
+
+def enriched_csv_missing_headers() -> List[str]:
+    """Columnas de enrich que le faltan a OUT_CSV (un CSV de antes de category_paths no las tiene todas)."""
+    with open(OUT_CSV, "r", newline="", encoding="utf-8") as f:
+        headers = next(csv.reader(f), [])
+    return [h for h in ["sku"] + ENRICH_HEADERS if h not in headers]
+
+def patch_enriched_csv(enrich_map: Dict[str, Tuple[str, str, str, str]]) -> int:
+    """Reescribe solo las columnas de enrich de las filas cuyos SKUs están en enrich_map (tmp + rename)."""
+    missing = enriched_csv_missing_headers()
+    if missing:
+        raise SystemExit(f"{OUT_CSV} no tiene las columnas {', '.join(missing)}: no se puede parchear "
+                         f"(es de una versión anterior; regenerarlo con build_final_csv o un export completo)")
+    tmp = OUT_CSV + ".tmp"
+    patched = 0
+    with open(OUT_CSV, "r", newline="", encoding="utf-8") as fin, \
+         open(tmp, "w", newline="", encoding="utf-8") as fout:
+        r = csv.reader(fin)
+        w = csv.writer(fout)
+        headers = next(r)
+        w.writerow(headers)
+        sku_i = headers.index("sku")
+        enrich_i = [headers.index(h) for h in ENRICH_HEADERS]
+        for row in r:
+            sku = row[sku_i].strip() if len(row) > sku_i else ""
+            if sku in enrich_map:
+                for i, v in zip(enrich_i, enrich_map[sku]):
+                    row[i] = v
+                patched += 1
+            w.writerow(row)
+    os.replace(tmp, OUT_CSV)
+    return patched
+
+def rebuild_enriched_csv() -> None:
+    """OUT_CSV con columnas viejas: se rearma entero desde el RAW (el resto de los SKUs sale del mirror)."""
+    if not os.path.exists(RAW_CSV):
+        raise SystemExit(f"{OUT_CSV} es de una versión anterior (faltan {', '.join(enriched_csv_missing_headers())}) "
+                         f"y no existe {RAW_CSV} para regenerarlo: correr el export completo")
+    with open(RAW_CSV, "r", newline="", encoding="utf-8") as f:
+        skus = {(row.get("sku") or "").strip() for row in csv.DictReader(f)} - {""}
+    enrich_map = enrich_skus(skus, refresh_updated=False)
+    build_final_csv(enrich_map)
+
+def retry_dead_letters() -> None:
+    """Reintenta el enrich solo de los SKUs del dead-letter y parchea OUT_CSV."""
+    pending = _read_json(ENRICH_DEAD_LETTER_JSON) or {}
+    if not pending:
+        print(f"Dead-letter vacío ({ENRICH_DEAD_LETTER_JSON}): nada para reintentar")
+        return
+    if not os.path.exists(OUT_CSV):
+        raise SystemExit(f"RETRY_DEAD_LETTERS=True pero no existe {OUT_CSV} (correr el export completo primero)")
+
+    skus = set(pending)
+    print(f"Reintentando enrich de {len(skus)} SKUs del dead-letter")
+    # sacarlos del mirror: se vuelven a pedir a Magento (solo ellos, sin refresh por updated_at)
+    mirror = load_product_mirror()
+    for sku in skus:
+        mirror["products"].pop(sku, None)
+    save_product_mirror(mirror)
+
+    missing = enriched_csv_missing_headers()
+    if missing:
+        print(f"{OUT_CSV} no tiene {', '.join(missing)} (versión anterior): se rearma entero desde {RAW_CSV}")
+        rebuild_enriched_csv()
+        done = f"{OUT_CSV} regenerado"
+    else:
+        enrich_map = enrich_skus(skus, refresh_updated=False)
+        done = f"{patch_enriched_csv(enrich_map)} filas parcheadas en {OUT_CSV}"
+    fixed = len(skus - set(_dead_letters.entries))
+    print(f"Dead-letter: {fixed}/{len(skus)} SKUs arreglados | {done}")
+    _dead_letters.save(retried=skus)
+
+
+# =========================================================
+# Mirror local de productos (reemplaza un GET /products/{sku} por SKU)
+# =========================================================
+def slim_product(p: Dict[str, Any]) -> Dict[str, Any]:
+    """Nos quedamos solo con lo que usa el enrich (mismo shape que la respuesta de Magento)."""
+    keep = set(BRAND_ATTRIBUTE_CODES) | {"category_ids"}
+    return {
+        "sku": p.get("sku", ""),
+        "updated_at": p.get("updated_at", ""),
+        "custom_attributes": [a for a in p.get("custom_attributes", []) or [] if a.get("attribute_code") in keep],
+        "extension_attributes": {
+            "category_links": (p.get("extension_attributes") or {}).get("category_links") or [],
+        },
+    }
+
+def load_product_mirror() -> Dict[str, Any]:
+    m = _read_json(PRODUCT_MIRROR_JSON) or {}
+    m.setdefault("updated_at_watermark", "")
+    m.setdefault("products", {})
+    return m
+
+def save_product_mirror(mirror: Dict[str, Any]) -> None:
+    _write_json_atomic(PRODUCT_MIRROR_JSON, mirror)
+
+def _upsert_products(mirror: Dict[str, Any], items: List[Dict[str, Any]]) -> str:
+    newest = ""
+    for p in items:
+        sku = str(p.get("sku", "") or "").strip()
+        if sku:
+            mirror["products"][sku] = slim_product(p)
+            newest = max(newest, str(p.get("updated_at") or ""))
+    return newest
+
+def refresh_updated_products(mirror: Dict[str, Any]) -> str:
+    """
+    Si el mirror ya tiene watermark: baja los productos con updated_at >= watermark (paginado)
+    y los upsertea. Devuelve el updated_at más nuevo visto.
+    """
+    watermark = mirror["updated_at_watermark"]
+    newest = watermark
+    if not (watermark and mirror["products"]):
+        return newest
+
+    flt = [("updated_at", watermark, "gteq")]
+    first = http_get_json(*products_search_request(flt, 1, PRODUCT_BATCH_SIZE))
+    total_pages = max(1, math.ceil(int(first.get("total_count", 0) or 0) / PRODUCT_BATCH_SIZE))
+    newest = max(newest, _upsert_products(mirror, first.get("items", []) or []))
+    pages = fetch_pages_ordered(range(2, total_pages + 1),
+                                lambda p: products_search_request(flt, p, PRODUCT_BATCH_SIZE))
+    for _, data in tqdm(pages, total=total_pages - 1, desc="Refrescando mirror de productos", unit="page"):
+        newest = max(newest, _upsert_products(mirror, data.get("items", []) or []))
+    print(f"Mirror productos: {int(first.get('total_count', 0) or 0)} modificados desde {watermark}")
+    return newest
+
+def fetch_missing_products(mirror: Dict[str, Any], skus: Iterable[str], progress: bool = True) -> str:
+    """
+    SKUs que faltan en el mirror: búsquedas bulk sku IN (...) de a PRODUCT_BATCH_SIZE, en paralelo.
+    Los SKUs que siguen sin datos (batch fallido o SKU inexistente) van al dead-letter.
+    Devuelve el updated_at más nuevo de lo que bajó.
+    """
+    newest = ""
+    missing = sorted(sku for sku in set(skus) if sku not in mirror["products"])
+    if REPLAY_FROM_ARCHIVE:
+        for sku in missing:
+            _dead_letters.add(sku, "product", "no está en el mirror (replay offline)")
+        return newest
+
+    # Magento separa los valores de "in" por coma: esos SKUs van de a uno
+    odd = [sku for sku in missing if "," in sku]
+    plain = [sku for sku in missing if "," not in sku]
+    batches = [plain[i:i + PRODUCT_BATCH_SIZE] for i in range(0, len(plain), PRODUCT_BATCH_SIZE)]
+    if progress:
+        print(f"Mirror productos: {len(mirror['products'])} en cache | faltan {len(missing)} SKUs ({len(batches)} requests)")
+
+    def batch_request(i: int) -> Request:
+        return products_search_request([("sku", ",".join(batches[i]), "in")], 1, PRODUCT_BATCH_SIZE)
+
+    for i, data in tqdm(fetch_pages_ordered(range(len(batches)), batch_request, return_exceptions=True),
+                        total=len(batches), desc="Bajando productos (bulk)", unit="batch", disable=not progress):
+        if isinstance(data, Exception):
+            for sku in batches[i]:
+                _dead_letters.add(sku, "product", f"batch sku IN falló: {data}")
+            continue
+        newest = max(newest, _upsert_products(mirror, data.get("items", []) or []))
+        save_product_mirror(mirror)  # checkpoint por batch
+
+    for sku in odd:
+        p, err = try_fetch_product(sku)
+        if err:
+            _dead_letters.add(sku, "product", err)
+        newest = max(newest, _upsert_products(mirror, [p] if p else []))
+
+    for sku in missing:
+        if sku not in mirror["products"]:
+            _dead_letters.add(sku, "product", "Magento no devolvió el SKU (borrado o renombrado)")
+    return newest
+
+def refresh_product_mirror(skus: Set[str], refresh_updated: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    Mirror al día para `skus`: productos modificados desde el watermark + los SKUs que faltan.
+    Devuelve sku -> producto (slim).
+    """
+    mirror = load_product_mirror()
+    if REPLAY_FROM_ARCHIVE:
+        missing = skus - mirror["products"].keys()
+        print(f"Replay: mirror de productos tal cual ({len(mirror['products'])} productos, {len(missing)} SKUs sin datos)")
+        fetch_missing_products(mirror, missing)  # solo los anota en el dead-letter
+        return mirror["products"]
+
+    newest = mirror["updated_at_watermark"]
+    if refresh_updated:
+        newest = max(newest, refresh_updated_products(mirror))
+    newest = max(newest, fetch_missing_products(mirror, skus))
+
+    mirror["updated_at_watermark"] = newest
+    save_product_mirror(mirror)
+    return mirror["products"]
+
+
+# =========================================================
+# Árbol de categorías (id -> nombre + path completo)
+# =========================================================
+def index_category_tree(tree: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+    """
+    Aplana el árbol de /categories en id -> {"name", "path"}.
+    El path excluye Root Catalog (level 0) y la raíz de la tienda (level 1):
+    "Máquinas y Herramientas > Taladros".
+    """
+    index: Dict[str, Dict[str, str]] = {}
+    stack = [(tree, 0, [])]
+    while stack:
+        node, depth, trail = stack.pop()
+        name = str(node.get("name", "") or "").strip()
+        level = node.get("level", depth)
+        path = trail + [name] if int(level) >= 2 and name else trail
+        cid = str(node.get("id", "")).strip()
+        if cid:
+            index[cid] = {"name": name, "path": " > ".join(path)}
+        for child in node.get("children_data", []) or []:
+            stack.append((child, depth + 1, path))
+    return index
+
+def load_category_index(refresh: bool = False) -> Dict[str, Dict[str, str]]:
+    """Índice de categorías. El árbol sale del cache HTTP (TTL de /categories) salvo refresh=True."""
+    index = index_category_tree(fetch_category_tree(max_age=0 if refresh else None))
+    print(f"Árbol de categorías: {len(index)} categorías")
+    return index
+
+
 # =========================================================
 # Enrichment: SKU -> category_ids/names + brand (cache + paralelismo)
 # =========================================================
-def enrich_skus(skus: Set[str]) -> Dict[str, Tuple[str, str, str]]:
+EMPTY_ENRICH = ("", "", "", "")
+
+class SkuEnricher:
     """
-    Return mapping:
-      sku -> (category_ids_str, category_names_str, brand_str)
+    sku -> (category_ids_str, category_names_str, brand_str, category_paths_str) a partir del
+    mirror de productos y el árbol de categorías. Los SKUs sin datos se anotan en _dead_letters
+    (ver ENRICH_DEAD_LETTER_JSON).
     """
-    product_cache: Dict[str, Dict[str, Any]] = {}
-    brand_options_cache: Dict[str, Dict[str, str]] = {}
-    category_name_cache: Dict[str, str] = {}
 
-    def get_brand_label(product_json: Dict[str, Any]) -> str:
+    def __init__(self, product_cache: Dict[str, Dict[str, Any]]):
+        self.product_cache = product_cache
+        self.category_index: Optional[Dict[str, Dict[str, str]]] = None
+        self._categories_refreshed = False
+
+    def load_categories(self, skus: Iterable[str]) -> None:
+        """Carga el árbol; si algún SKU usa una categoría que no está en el árbol cacheado, lo revalida (una vez)."""
+        if not INCLUDE_CATEGORY_NAMES:
+            return
+        if self.category_index is None:
+            self.category_index = load_category_index()
+        if self._categories_refreshed:
+            return
+        needed = {cid for sku in skus if sku in self.product_cache
+                  for cid in self.get_category_ids(self.product_cache[sku])}
+        unknown = needed - self.category_index.keys()
+        if unknown:
+            # puede haber categorías nuevas desde que se cacheó el árbol
+            print(f"{len(unknown)} categorías no están en el árbol cacheado -> revalidando")
+            self.category_index = load_category_index(refresh=True)
+            self._categories_refreshed = True
+
+    @staticmethod
+    def get_brand_label(sku: str, product_json: Dict[str, Any]) -> str:
         for code in BRAND_ATTRIBUTE_CODES:
             v = get_custom_attr(product_json, code)
             if v is None or str(v).strip() == "":
@@ -262,12 +1885,14 @@ def enrich_skus(skus: Set[str]) -> Dict[str, Tuple[str, str, str]]:
             s = str(v).strip()
             # si es option_id, mapear con options del mismo code
             if s.isdigit():
-                if code not in brand_options_cache:
-                    brand_options_cache[code] = fetch_attribute_options(code)
-                return brand_options_cache[code].get(s, s)
+                options, err = get_attribute_options(code)
+                if err:
+                    _dead_letters.add(sku, "brand", f"options de {code}: {err}")
+                return options.get(s, s)
             return s
         return ""
 
+    @staticmethod
     def get_category_ids(product_json: Dict[str, Any]) -> List[str]:
         cat_ids = get_custom_attr(product_json, "category_ids")
         if cat_ids is None:
@@ -284,58 +1909,204 @@ def enrich_skus(skus: Set[str]) -> Dict[str, Tuple[str, str, str]]:
             cat_ids = []
         return cat_ids
 
-    def get_category_names(cat_ids: List[str]) -> List[str]:
-        if not INCLUDE_CATEGORY_NAMES:
-            return []
-        names = []
-        for cid in cat_ids:
-            if cid in category_name_cache:
-                nm = category_name_cache[cid]
-            else:
-                nm = fetch_category_name(cid)
-                category_name_cache[cid] = nm
-            if nm:
-                names.append(nm)
-        return names
-
-    def enrich_one(sku: str) -> Tuple[str, str, str, str]:
-        # (sku, cat_ids_str, cat_names_str, brand)
-        if sku in product_cache:
-            p = product_cache[sku]
-        else:
-            p = fetch_product(sku)
-            product_cache[sku] = p
+    def get_category_field(self, cat_ids: List[str], field: str) -> List[str]:
+        index = self.category_index or {}
+        return [index[cid][field] for cid in cat_ids if cid in index and index[cid][field]]
 
+    def enrich_one(self, sku: str) -> Tuple[str, str, str, str]:
+        p = self.product_cache.get(sku)
         if not p:
-            return (sku, "", "", "")
+            return EMPTY_ENRICH
 
-        cat_ids = get_category_ids(p)
-        cat_names = get_category_names(cat_ids)
-        brand = get_brand_label(p)
+        cat_ids = self.get_category_ids(p)
+        cat_names = self.get_category_field(cat_ids, "name")
+        cat_paths = self.get_category_field(cat_ids, "path")
+        brand = self.get_brand_label(sku, p)
 
         cat_ids_str = "|".join(cat_ids) if cat_ids else ""
-        cat_names_str = "|".join([x for x in cat_names if x]) if cat_names else ""
-        return (sku, cat_ids_str, cat_names_str, brand)
+        cat_names_str = "|".join(cat_names)
+        cat_paths_str = "|".join(cat_paths)
+        return (cat_ids_str, cat_names_str, brand, cat_paths_str)
+
+
+def _print_single_flight() -> None:
+    coalesced = _inflight.coalesced + _attribute_options.coalesced
+    memo_hits = _inflight.memo_hits + _attribute_options.memo_hits
+    if coalesced or memo_hits:
+        print(f"Single-flight: {coalesced} requests repetidos evitados (esperaron uno en vuelo), "
+              f"{memo_hits} respuestas reusadas de memoria")
+
+def enrich_skus(skus: Set[str], refresh_updated: bool = True) -> Dict[str, Tuple[str, str, str, str]]:
+    """
+    Enrich en un paso (STREAM_ENRICH = False y retry del dead-letter). Return mapping:
+      sku -> (category_ids_str, category_names_str, brand_str, category_paths_str)
+    """
+    with _telemetry.phase("product_mirror"):
+        enricher = SkuEnricher(refresh_product_mirror(skus, refresh_updated=refresh_updated))
+
+    if INCLUDE_CATEGORY_NAMES:
+        with _telemetry.phase("categories"):
+            enricher.load_categories(skus)
 
-    out: Dict[str, Tuple[str, str, str]] = {}
+    out: Dict[str, Tuple[str, str, str, str]] = {}
 
     sku_list = sorted(list(skus))
     print(f"Enrich SKUs: {len(sku_list)} | workers={MAX_WORKERS} | category_names={INCLUDE_CATEGORY_NAMES}")
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
-        futures = {ex.submit(enrich_one, sku): sku for sku in sku_list}
+    with _telemetry.phase("enrich"), ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+        futures = {ex.submit(enricher.enrich_one, sku): sku for sku in sku_list}
         for fut in tqdm(as_completed(futures), total=len(futures), desc="Enriqueciendo productos", unit="sku"):
-            sku, cat_ids_str, cat_names_str, brand = fut.result()
-            out[sku] = (cat_ids_str, cat_names_str, brand)
+            out[futures[fut]] = fut.result()
 
+    _print_single_flight()
     return out
 
 
+class StreamEnricher(SkuEnricher):
+    """
+    Etapa de enrich del pipeline (STREAM_ENRICH). Un thread propio refresca el mirror por
+    watermark mientras arranca la descarga, y después recibe por una cola acotada los SKUs de
+    cada página de orders: baja en bulk los que faltan en el mirror y deja resuelto su enrich.
+    El writer pide get(sku): si el producto ya está en el mirror el join se hace en el acto,
+    y solo espera a este thread por SKUs que hay que bajar de Magento.
+    """
+
+    def __init__(self):
+        super().__init__({})
+        self._queue: "queue.Queue" = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        self._cond = threading.Condition()
+        self._submitted: Set[str] = set()
+        self._resolved: Dict[str, Tuple[str, str, str, str]] = {}
+        self._ready = threading.Event()   # mirror refrescado + árbol de categorías cargado
+        self._error: Optional[BaseException] = None
+        self._mirror: Dict[str, Any] = {}
+        self._newest = ""
+        self._downloaded = 0
+        self._thread = threading.Thread(target=self._run, name="enrich", daemon=True)
+        self._thread.start()
+
+    def submit(self, skus: Iterable[str]) -> None:
+        """Encola SKUs para resolver (los repetidos se ignoran)."""
+        with self._cond:
+            new = [sku for sku in (str(s or "").strip() for s in skus) if sku and sku not in self._submitted]
+            self._submitted.update(new)
+        if new:
+            self._put(new)
+
+    def get(self, sku: str) -> Tuple[str, str, str, str]:
+        if not sku:
+            return EMPTY_ENRICH
+        with self._cond:
+            value = self._resolved.get(sku)
+        if value is not None:
+            return value
+        if self._ready.is_set() and self._resolvable_now(sku):
+            value = self.enrich_one(sku)
+            with self._cond:
+                self._submitted.add(sku)
+                self._resolved[sku] = value
+            return value
+
+        self.submit([sku])
+        with self._cond:
+            while sku not in self._resolved:
+                self._check_alive()
+                self._cond.wait(0.5)
+            return self._resolved[sku]
+
+    def _resolvable_now(self, sku: str) -> bool:
+        """El producto ya está en el mirror y todas sus categorías en el árbol: no hace falta el thread."""
+        p = self.product_cache.get(sku)
+        if not p:
+            return False
+        return not INCLUDE_CATEGORY_NAMES or all(cid in self.category_index for cid in self.get_category_ids(p))
+
+    def _check_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"Falló el enrich en streaming: {self._error}") from self._error
+
+    def _check_alive(self) -> None:
+        self._check_error()
+        if not self._thread.is_alive():
+            raise RuntimeError("El thread de enrich terminó antes de tiempo")
+
+    def _put(self, item: Any) -> None:
+        while True:
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                self._check_alive()
+
+    def _run(self) -> None:
+        try:
+            mirror = load_product_mirror()
+            self._newest = mirror["updated_at_watermark"]
+            if not REPLAY_FROM_ARCHIVE:
+                with _telemetry.phase("product_mirror"):
+                    self._newest = max(self._newest, refresh_updated_products(mirror))
+            self._mirror = mirror
+            self.product_cache = mirror["products"]
+            if INCLUDE_CATEGORY_NAMES:
+                with _telemetry.phase("categories"):
+                    self.load_categories([])
+            self._ready.set()
+
+            done = False
+            while not done:
+                # bloquea hasta que llegue algo y después junta todo lo encolado en un solo lote
+                batch: List[str] = []
+                item = self._queue.get()
+                while True:
+                    if item is _STOP:
+                        done = True
+                        break
+                    batch.extend(item)
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if batch:
+                    self._resolve(batch)
+        except BaseException as e:
+            self._error = e
+        finally:
+            with self._cond:
+                self._cond.notify_all()
+
+    def _resolve(self, batch: List[str]) -> None:
+        with _telemetry.phase("enrich"):
+            missing = [sku for sku in batch if sku not in self.product_cache]
+            if missing:
+                self._newest = max(self._newest, fetch_missing_products(self._mirror, missing, progress=False))
+                self._downloaded += len(missing)
+            self.load_categories(batch)
+            resolved = {sku: self.enrich_one(sku) for sku in batch}
+        with self._cond:
+            self._resolved.update(resolved)
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        """Fin del pipeline: espera el último lote, guarda el mirror con el watermark nuevo y reporta."""
+        self._put(_STOP)
+        self._thread.join()
+        self._check_error()
+        if not REPLAY_FROM_ARCHIVE:
+            self._mirror["updated_at_watermark"] = self._newest
+            save_product_mirror(self._mirror)
+        print(f"Enrich en streaming: {len(self._resolved)} SKUs | {self._downloaded} bajados de Magento "
+              f"| mirror {len(self.product_cache)} productos | category_names={INCLUDE_CATEGORY_NAMES}")
+        _print_single_flight()
+
+
 # =========================================================
 # Paso 3: RAW -> OUT CSV (agrega columnas enrich)
 # =========================================================
-def build_final_csv(enrich_map: Dict[str, Tuple[str, str, str]]) -> None:
-    out_headers = RAW_HEADERS + ["category_ids", "category_names", "brand"]
+ENRICH_HEADERS = ["category_ids", "category_names", "brand", "category_paths"]
+
+def build_final_csv(enrich_map: Dict[str, Tuple[str, str, str, str]]) -> None:
+    """Flujo en pasos (STREAM_ENRICH = False): relee el RAW y agrega las columnas de enrich."""
+    out_headers = RAW_HEADERS + ENRICH_HEADERS
 
     with open(RAW_CSV, "r", newline="", encoding="utf-8") as fin, \
          open(OUT_CSV, "w", newline="", encoding="utf-8") as fout:
@@ -346,29 +2117,59 @@ def build_final_csv(enrich_map: Dict[str, Tuple[str, str, str]]) -> None:
 
         for row in tqdm(r, desc="Construyendo CSV final", unit="row"):
             sku = (row.get("sku") or "").strip()
-            cat_ids, cat_names, brand = ("", "", "")
+            enrich = EMPTY_ENRICH
             if sku and sku in enrich_map:
-                cat_ids, cat_names, brand = enrich_map[sku]
+                enrich = enrich_map[sku]
 
-            w.writerow([row.get(h, "") for h in RAW_HEADERS] + [cat_ids, cat_names, brand])
+            w.writerow([row.get(h, "") for h in RAW_HEADERS] + list(enrich))
 
     print(f"OK FINAL -> {OUT_CSV}")
 
 
 def main():
-    # sanity quick check
-    try:
-        _ = fetch_orders_page(1)
-    except Exception as e:
-        raise SystemExit(f"Error conectando a Magento. Revisá token/URL. Detalle: {e}")
+    if EXPORT_ENGINE == "async" and not HAS_AIOHTTP:
+        print("EXPORT_ENGINE='async' pero aiohttp no está instalado -> uso threads (MAX_WORKERS)")
 
-    skus = export_raw_and_collect_skus()
+    _telemetry.reset()
+    try:
+        if RETRY_DEAD_LETTERS:
+            with _telemetry.phase("retry_dead_letters"):
+                retry_dead_letters()
+            return
+        stream = ENRICH_PRODUCTS and STREAM_ENRICH
+        if REPLAY_FROM_ARCHIVE:
+            enricher = StreamEnricher() if stream else None
+            with _telemetry.phase("replay"):
+                skus = replay_raw_from_archive(enricher)
+        else:
+            # sanity quick check (1 sola order: no bajar una página entera solo para probar el token)
+            try:
+                with _telemetry.phase("sanity"):
+                    url, params = orders_page_request(1)
+                    _ = http_get_json(url, dict(params, **{"searchCriteria[pageSize]": "1"}))
+            except Exception as e:
+                raise SystemExit(f"Error conectando a Magento. Revisá token/URL. Detalle: {e}")
+
+            enricher = StreamEnricher() if stream else None
+            with _telemetry.phase("orders"):
+                skus = export_raw_and_collect_skus(enricher)
+
+        if enricher:
+            enricher.close()
+            _dead_letters.save()
+        elif ENRICH_PRODUCTS:
+            enrich_map = enrich_skus(skus)
+            with _telemetry.phase("final_csv"):
+                build_final_csv(enrich_map)
+            _dead_letters.save()
+        else:
+            print("ENRICH_PRODUCTS=False -> ya tenés el RAW CSV.")
+    finally:
+        close_async_engine()
+        _telemetry.summarize(RUN_REPORT_JSON)
 
-    if ENRICH_PRODUCTS:
-        enrich_map = enrich_skus(skus)
-        build_final_csv(enrich_map)
-    else:
-        print("ENRICH_PRODUCTS=False -> ya tenés el RAW CSV.")
+    # corrida completa: los checkpoints ya no hacen falta
+    shutil.rmtree(CHECKPOINT_DIR, ignore_errors=True)
 
 
 if __name__ == "__main__":
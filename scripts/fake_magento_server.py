@@ -0,0 +1,504 @@
+"""
+Magento 2 REST falso (offline) para probar y medir export_ventas_tradeunity.py sin tocar producción.
+
+Sirve datos sintéticos y deterministas (misma SEED -> mismos datos) en:
+  GET /rest/V1/orders                                (searchCriteria: filtros, pageSize, currentPage)
+  GET /rest/V1/products                              (searchCriteria: sku IN, updated_at gteq, ...)
+  GET /rest/V1/products/{sku}
+  GET /rest/V1/products/attributes/{code}/options
+  GET /rest/V1/categories                            (árbol completo)
+  GET /__stats                                       (contadores del server por endpoint/status, no es Magento)
+
+Respeta fields= (proyección), manda ETag y contesta 304 a If-None-Match, y puede inyectar
+latencia (más costo por offset en páginas hondas), 429 (con Retry-After) y 5xx. Uso:
+  python scripts/fake_magento_server.py
+y apuntar API_URL del export a http://127.0.0.1:8765/rest/V1/orders.
+"""
+
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlparse
+
+# =========================================================
+# HARDCODE
+# =========================================================
+HOST = "127.0.0.1"
+PORT = 8765
+SEED = 42
+
+# Volumen: páginas de orders = ceil(N_ORDERS / pageSize que pida el cliente)
+N_ORDERS = 5000
+MAX_ITEMS_PER_ORDER = 4
+CONFIGURABLE_RATE = 0.2        # % de items configurable (parent con precio + child simple en 0)
+N_PRODUCTS = 2000
+N_BRANDS = 60
+N_TOP_CATEGORIES = 8
+N_SUB_CATEGORIES = 6           # por categoría top
+
+# Latencia por request (ms): LATENCY_MS + uniforme(0, LATENCY_JITTER_MS)
+LATENCY_MS = 40
+LATENCY_JITTER_MS = 40
+# Costo de paginar hondo en /orders (LIMIT/OFFSET de MySQL): ms extra por cada 1000 filas salteadas
+OFFSET_COST_MS_PER_1000 = 0
+
+# Bytes de relleno por order (payment / addresses / status_histories, como el Magento real).
+# Con fields= el relleno no viaja.
+ORDER_PADDING_BYTES = 4000
+
+# Inyección de errores (probabilidad por request a /rest)
+ERROR_RATE_429 = 0.0
+ERROR_RATE_5XX = 0.0
+RETRY_AFTER_SECONDS = 1        # header Retry-After de los 429 (None = no se manda)
+
+GZIP_RESPONSES = True          # si el cliente manda Accept-Encoding: gzip (como nginx delante de Magento)
+REQUIRE_AUTH = True            # 401 si falta "Authorization: Bearer ..."
+
+ORDER_STATUSES = ["complete", "complete", "complete", "processing", "canceled", "closed", "pending"]
+START_DATE = datetime(2023, 1, 1)
+ORDER_SPACING_MINUTES = 97
+
+
+# =========================================================
+# Datos sintéticos
+# =========================================================
+def _ts(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+class FakeCatalog:
+    """Catálogo + orders generados a partir de SEED. Las orders se arman on-demand (no viven en memoria)."""
+
+    def __init__(self, n_orders: int = N_ORDERS, n_products: int = N_PRODUCTS, seed: int = SEED,
+                 padding: int = ORDER_PADDING_BYTES):
+        self.n_orders = n_orders
+        self.seed = seed
+        self.padding = padding
+        rng = random.Random(seed)
+        # texto pseudo-aleatorio: que el gzip no lo haga desaparecer
+        self._pad_text = "".join(rng.choices("abcdefghijklmnopqrstuvwxyz     0123456789", k=2 * padding + 1))
+
+        # Árbol: Root (1, level 0) > Default Category (2, level 1) > top (level 2) > sub (level 3)
+        self.leaf_ids: List[int] = []
+        tops = []
+        next_id = 3
+        for t in range(N_TOP_CATEGORIES):
+            top_id = next_id
+            next_id += 1
+            subs = []
+            for s in range(N_SUB_CATEGORIES):
+                subs.append({"id": next_id, "parent_id": top_id, "name": f"Sub {t + 1}.{s + 1}",
+                             "is_active": True, "position": s + 1, "level": 3, "product_count": 0,
+                             "children_data": []})
+                self.leaf_ids.append(next_id)
+                next_id += 1
+            tops.append({"id": top_id, "parent_id": 2, "name": f"Categoria {t + 1}", "is_active": True,
+                         "position": t + 1, "level": 2, "product_count": 0, "children_data": subs})
+        self.category_tree = {
+            "id": 1, "parent_id": 0, "name": "Root Catalog", "is_active": True, "position": 0, "level": 0,
+            "product_count": 0,
+            "children_data": [{"id": 2, "parent_id": 1, "name": "Default Category", "is_active": True,
+                               "position": 1, "level": 1, "product_count": 0, "children_data": tops}],
+        }
+
+        self.brand_options = [{"label": " ", "value": ""}] + [
+            {"label": f"Marca {b + 1}", "value": str(100 + b)} for b in range(N_BRANDS)
+        ]
+
+        self.products: Dict[str, Dict[str, Any]] = {}
+        for p in range(n_products):
+            sku = f"TU-{p + 1:05d}"
+            cats = rng.sample(self.leaf_ids, k=rng.randint(1, 2))
+            updated = START_DATE + timedelta(days=rng.randint(0, 900), seconds=rng.randint(0, 86399))
+            self.products[sku] = {
+                "id": p + 1,
+                "sku": sku,
+                "name": f"Producto {p + 1}",
+                "attribute_set_id": 4,
+                "price": round(rng.uniform(500, 90000), 2),
+                "status": 1,
+                "visibility": 4,
+                "type_id": "simple",
+                "created_at": _ts(START_DATE),
+                "updated_at": _ts(updated),
+                "weight": round(rng.uniform(0.1, 20), 2),
+                "extension_attributes": {
+                    "website_ids": [1],
+                    "category_links": [{"position": 0, "category_id": str(c)} for c in cats],
+                    "stock_item": {"item_id": p + 1, "product_id": p + 1, "stock_id": 1,
+                                   "qty": rng.randint(0, 500), "is_in_stock": True},
+                },
+                "custom_attributes": [
+                    {"attribute_code": "manufacturer", "value": rng.choice(self.brand_options[1:])["value"]},
+                    {"attribute_code": "category_ids", "value": [str(c) for c in cats]},
+                    {"attribute_code": "description", "value": "<p>" + "Lorem ipsum " * 20 + "</p>"},
+                    {"attribute_code": "url_key", "value": f"producto-{p + 1}"},
+                ],
+                "product_links": [],
+                "options": [],
+                "media_gallery_entries": [],
+                "tier_prices": [],
+            }
+        self.skus = list(self.products)
+
+        # Lo único que se precalcula de las orders: fechas (para filtrar sin generarlas)
+        self.order_created = [""] + [_ts(self._created_at(i)) for i in range(1, n_orders + 1)]
+        self.order_updated = [""] + [_ts(self._updated_at(i)) for i in range(1, n_orders + 1)]
+
+    def _created_at(self, i: int) -> datetime:
+        return START_DATE + timedelta(minutes=i * ORDER_SPACING_MINUTES)
+
+    def _updated_at(self, i: int) -> datetime:
+        return self._created_at(i) + timedelta(hours=(i * 7919) % 240)
+
+    def order_field(self, i: int, field: str) -> Any:
+        """Campo para filtrar; created_at / updated_at / entity_id sin generar la order entera."""
+        if field == "updated_at":
+            return self.order_updated[i]
+        if field == "created_at":
+            return self.order_created[i]
+        if field == "entity_id":
+            return i
+        return self.order(i).get(field)
+
+    def order(self, i: int) -> Dict[str, Any]:
+        rng = random.Random(self.seed * 1_000_003 + i)
+        items: List[Dict[str, Any]] = []
+        next_item_id = i * 100
+        for _ in range(rng.randint(1, MAX_ITEMS_PER_ORDER)):
+            sku = rng.choice(self.skus)
+            qty = rng.randint(1, 12)
+            price = self.products[sku]["price"]
+            disc_pct = rng.choice([0, 0, 0, 5, 10])
+            row = round(price * qty, 2)
+            disc = round(row * disc_pct / 100, 2)
+            tax = round((row - disc) * 0.21, 4)
+            prices = {
+                "original_price": price, "price": price, "price_incl_tax": round(price * 1.21, 4),
+                "base_price": price, "discount_amount": disc, "discount_percent": disc_pct,
+                "row_total": row, "row_total_incl_tax": round(row * 1.21, 4),
+                "tax_percent": 21, "tax_amount": tax,
+            }
+            common = {"order_id": i, "sku": sku, "name": self.products[sku]["name"], "qty_ordered": qty,
+                      "weight": self.products[sku]["weight"], "created_at": _ts(self._created_at(i)),
+                      "store_id": 1, "is_virtual": 0}
+            if rng.random() < CONFIGURABLE_RATE:
+                parent_id = next_item_id
+                items.append(dict(common, item_id=parent_id, product_type="configurable", **prices))
+                zeros = {k: 0 for k in prices}
+                items.append(dict(common, item_id=parent_id + 1, parent_item_id=parent_id,
+                                  product_type="simple", **zeros))
+                next_item_id += 2
+            else:
+                items.append(dict(common, item_id=next_item_id, product_type="simple", **prices))
+                next_item_id += 1
+
+        parents = [it for it in items if "parent_item_id" not in it]
+        subtotal = round(sum(it["row_total"] for it in parents), 2)
+        discount = round(sum(it["discount_amount"] for it in parents), 2)
+        tax = round(sum(it["tax_amount"] for it in parents), 4)
+        shipping = rng.choice([0, 0, 3500, 7200])
+        cust = rng.randint(1, max(1, self.n_orders // 8))
+        off = (i * 131) % (self.padding + 1)
+        pad = self._pad_text[off: off + self.padding]
+        address = {"firstname": f"Nombre{cust}", "lastname": f"Apellido{cust}", "street": [pad[: self.padding // 4]],
+                   "city": "CABA", "postcode": "1000", "country_id": "AR", "telephone": "1100000000"}
+        return {
+            "entity_id": i,
+            "increment_id": f"{100000000 + i}",
+            "created_at": _ts(self._created_at(i)),
+            "updated_at": self.order_updated[i],
+            "status": ORDER_STATUSES[rng.randrange(len(ORDER_STATUSES))],
+            "state": "complete",
+            "customer_email": f"cliente{cust}@example.com",
+            "customer_firstname": f"Nombre{cust}",
+            "customer_lastname": f"Apellido{cust}",
+            "customer_taxvat": f"30{cust:09d}",
+            "order_currency_code": "ARS",
+            "base_currency_code": "ARS",
+            "grand_total": round(subtotal - discount + tax + shipping, 2),
+            "subtotal": subtotal,
+            "discount_amount": -discount,
+            "shipping_amount": shipping,
+            "tax_amount": tax,
+            "items": items,
+            "billing_address": address,
+            "payment": {"method": "checkmo", "additional_information": [pad[: self.padding // 2]]},
+            "status_histories": [{"comment": pad[: self.padding // 4], "created_at": _ts(self._created_at(i))}],
+            "extension_attributes": {
+                "currency_rate": 1,
+                "shipping_assignments": [{"shipping": {"address": address, "method": "flatrate_flatrate"}}],
+            },
+        }
+
+
+# =========================================================
+# searchCriteria + fields=
+# =========================================================
+def parse_search_criteria(q: Dict[str, str]) -> Tuple[List[List[Tuple[str, str, str]]], int, int]:
+    """-> (filter_groups [[(field, value, condition)]], pageSize, currentPage). Grupos = AND, filtros = OR."""
+    groups: Dict[int, Dict[int, Dict[str, str]]] = {}
+    for k, v in q.items():
+        if not k.startswith("searchCriteria[filter_groups]"):
+            continue
+        parts = k.replace("]", "").split("[")  # searchCriteria, filter_groups, g, filters, f, key
+        if len(parts) != 6:
+            continue
+        groups.setdefault(int(parts[2]), {}).setdefault(int(parts[4]), {})[parts[5]] = v
+    out = []
+    for g in sorted(groups):
+        out.append([(f.get("field", ""), f.get("value", ""), f.get("condition_type", "eq"))
+                    for _, f in sorted(groups[g].items())])
+    page_size = int(q.get("searchCriteria[pageSize]", 0) or 0)
+    page = int(q.get("searchCriteria[currentPage]", 1) or 1)
+    return out, page_size, page
+
+def _match(actual: Any, value: str, cond: str) -> bool:
+    a = "" if actual is None else str(actual)
+    if cond == "eq":
+        return a == value
+    if cond == "neq":
+        return a != value
+    if cond == "in":
+        return a in value.split(",")
+    if cond == "nin":
+        return a not in value.split(",")
+    if cond == "gteq":
+        return a >= value
+    if cond == "gt":
+        return a > value
+    if cond == "lteq":
+        return a <= value
+    if cond == "lt":
+        return a < value
+    if cond == "like":
+        return value.strip("%") in a
+    return False
+
+def matches(get_field, groups: List[List[Tuple[str, str, str]]]) -> bool:
+    return all(any(_match(get_field(f), v, c) for f, v, c in group) for group in groups)
+
+def paginate(ids: List[Any], page_size: int, page: int) -> List[Any]:
+    if not page_size:
+        return ids
+    # Quirk del Magento real: currentPage fuera de rango devuelve la última página
+    last = max(1, -(-len(ids) // page_size))
+    page = min(max(1, page), last)
+    return ids[(page - 1) * page_size: page * page_size]
+
+def parse_fields(spec: str) -> Dict[str, Any]:
+    """"items[sku,extension_attributes[x]],total_count" -> {"items": {"sku": {}, ...}, "total_count": {}}."""
+    root: Dict[str, Any] = {}
+    stack = [root]
+    token = ""
+    for ch in spec + ",":
+        if ch in ",[]":
+            if token:
+                stack[-1].setdefault(token.strip(), {})
+            if ch == "[":
+                stack.append(stack[-1][token.strip()])
+            elif ch == "]" and len(stack) > 1:
+                stack.pop()
+            token = ""
+        else:
+            token += ch
+    return root
+
+def project(obj: Any, tree: Dict[str, Any]) -> Any:
+    if not tree:
+        return obj
+    if isinstance(obj, list):
+        return [project(x, tree) for x in obj]
+    if isinstance(obj, dict):
+        return {k: project(obj[k], sub) for k, sub in tree.items() if k in obj}
+    return obj
+
+
+# =========================================================
+# HTTP
+# =========================================================
+class Stats:
+    """Contadores por endpoint y status HTTP (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests: Dict[str, Dict[str, int]] = {}
+            self.bytes_out = 0
+            self.injected_errors = 0
+
+    def record(self, endpoint: str, status: int, nbytes: int, injected: bool = False):
+        with self._lock:
+            by_status = self.requests.setdefault(endpoint, {})
+            by_status[str(status)] = by_status.get(str(status), 0) + 1
+            self.bytes_out += nbytes
+            self.injected_errors += int(injected)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"requests": {k: dict(v) for k, v in self.requests.items()},
+                    "bytes_out": self.bytes_out, "injected_errors": self.injected_errors}
+
+
+def _endpoint(path: str) -> str:
+    if path.endswith("/V1/orders"):
+        return "orders"
+    if "/V1/products/attributes/" in path:
+        return "attribute_options"
+    if path.endswith("/V1/products"):
+        return "products_search"
+    if "/V1/products/" in path:
+        return "product"
+    if "/V1/categories" in path:
+        return "categories"
+    return "other"
+
+
+class FakeMagentoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, como nginx
+    catalog: FakeCatalog
+    stats: Stats
+    config: Dict[str, Any]
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, endpoint: str, code: int, obj: Any, headers: Optional[Dict[str, str]] = None,
+              injected: bool = False):
+        body = json.dumps(obj, separators=(",", ":")).encode()
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if code == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            self.stats.record(endpoint, 304, 0)
+            return
+
+        if self.config["gzip"] and "gzip" in (self.headers.get("Accept-Encoding") or "") and len(body) > 512:
+            body = gzip.compress(body, compresslevel=5)
+            headers = dict(headers or {}, **{"Content-Encoding": "gzip"})
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if code == 200:
+            self.send_header("ETag", etag)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+        self.stats.record(endpoint, code, len(body), injected)
+
+    def do_GET(self):
+        u = urlparse(self.path)
+        q = dict(parse_qsl(u.query, keep_blank_values=True))
+        path = u.path.rstrip("/")
+
+        if path == "/__stats":
+            body = json.dumps(self.stats.snapshot()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        endpoint = _endpoint(path)
+        cfg = self.config
+        if cfg["require_auth"] and not (self.headers.get("Authorization") or "").startswith("Bearer "):
+            return self._send(endpoint, 401, {"message": "The consumer isn't authorized to access %resources."})
+
+        latency = cfg["latency_ms"] + random.uniform(0, cfg["latency_jitter_ms"])
+        if latency > 0:
+            time.sleep(latency / 1000.0)
+
+        r = random.random()
+        if r < cfg["error_rate_429"]:
+            headers = {"Retry-After": str(cfg["retry_after"])} if cfg["retry_after"] is not None else None
+            return self._send(endpoint, 429, {"message": "Too Many Requests"}, headers, injected=True)
+        if r < cfg["error_rate_429"] + cfg["error_rate_5xx"]:
+            return self._send(endpoint, random.choice([500, 502, 503]), {"message": "Internal Error"}, injected=True)
+
+        try:
+            result = self._route(endpoint, path, q)
+        except KeyError as e:
+            return self._send(endpoint, 404, {"message": f"The requested entity doesn't exist: {e}"})
+
+        if q.get("fields"):
+            result = project(result, parse_fields(q["fields"]))
+        self._send(endpoint, 200, result)
+
+    def _route(self, endpoint: str, path: str, q: Dict[str, str]) -> Any:
+        cat = self.catalog
+        if endpoint == "orders":
+            groups, page_size, page = parse_search_criteria(q)
+            ids = [i for i in range(1, cat.n_orders + 1)
+                   if matches(lambda f: cat.order_field(i, f), groups)]
+            if page_size and self.config["offset_cost_ms"]:
+                skipped = min(max(0, page - 1) * page_size, len(ids))
+                time.sleep(skipped / 1000 * self.config["offset_cost_ms"] / 1000.0)
+            return {"items": [cat.order(i) for i in paginate(ids, page_size, page)],
+                    "search_criteria": {"filter_groups": [], "page_size": page_size, "current_page": page},
+                    "total_count": len(ids)}
+        if endpoint == "products_search":
+            groups, page_size, page = parse_search_criteria(q)
+            skus = [s for s in cat.skus if matches(lambda f: cat.products[s].get(f), groups)]
+            return {"items": [cat.products[s] for s in paginate(skus, page_size, page)],
+                    "search_criteria": {"filter_groups": [], "page_size": page_size, "current_page": page},
+                    "total_count": len(skus)}
+        if endpoint == "product":
+            return cat.products[unquote(path.rsplit("/", 1)[-1])]
+        if endpoint == "attribute_options":
+            code = path.split("/attributes/", 1)[1].split("/", 1)[0]
+            if code != "manufacturer":
+                raise KeyError(code)
+            return cat.brand_options
+        if endpoint == "categories":
+            if path.endswith("/V1/categories"):
+                return cat.category_tree
+            raise KeyError(path.rsplit("/", 1)[-1])
+        raise KeyError(path)
+
+
+def make_server(host: str = HOST, port: int = PORT, n_orders: int = N_ORDERS, n_products: int = N_PRODUCTS,
+                latency_ms: float = LATENCY_MS, latency_jitter_ms: float = LATENCY_JITTER_MS,
+                offset_cost_ms: float = OFFSET_COST_MS_PER_1000,
+                padding: int = ORDER_PADDING_BYTES, error_rate_429: float = ERROR_RATE_429,
+                error_rate_5xx: float = ERROR_RATE_5XX, retry_after: Optional[int] = RETRY_AFTER_SECONDS,
+                gzip_responses: bool = GZIP_RESPONSES, require_auth: bool = REQUIRE_AUTH,
+                seed: int = SEED) -> ThreadingHTTPServer:
+    """Arma el server (sin arrancarlo). Los kwargs pisan el HARDCODE de arriba."""
+    random.seed(seed)
+    handler = type("Handler", (FakeMagentoHandler,), {
+        "catalog": FakeCatalog(n_orders=n_orders, n_products=n_products, seed=seed, padding=padding),
+        "stats": Stats(),
+        "config": {"latency_ms": latency_ms, "latency_jitter_ms": latency_jitter_ms, "offset_cost_ms": offset_cost_ms,
+                   "error_rate_429": error_rate_429, "error_rate_5xx": error_rate_5xx,
+                   "retry_after": retry_after, "gzip": gzip_responses, "require_auth": require_auth},
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def serve(**kwargs):
+    server = make_server(**kwargs)
+    host, port = server.server_address[:2]
+    print(f"Fake Magento en http://{host}:{port}/rest/V1 (Ctrl+C para cortar)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve()
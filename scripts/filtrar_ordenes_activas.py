@@ -27,6 +27,11 @@ STATES_TO_KEEP = [
 ]
 
 
+def keep_row(row: dict) -> bool:
+    """Se mantiene solo si el estado está en STATES_TO_KEEP."""
+    return row.get("Estado", "").strip() in STATES_TO_KEEP
+
+
 def filter_orders():
     """Filtra el CSV eliminando órdenes canceladas y cerradas."""
     
@@ -57,10 +62,8 @@ def filter_orders():
     removed_count = 0
     
     for row in rows:
-        estado = row.get("Estado", "").strip()
-        
         # Mantener si está en la lista de estados a mantener
-        if estado in STATES_TO_KEEP:
+        if keep_row(row):
             filtered_rows.append(row)
         else:
             removed_count += 1
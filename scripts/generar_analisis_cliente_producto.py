@@ -5,9 +5,11 @@ Agrupa ventas por cliente y SKU con todas las métricas agregadas.
 """
 
 import csv
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal
 from collections import defaultdict
 
+from parseo_numeros import parse_decimal
+
 try:
     import pandas as pd
     HAS_PANDAS = True
@@ -19,20 +21,6 @@ VENTAS_CSV = "ventas_historicas_items.csv"
 OUTPUT_CSV = "Analisis_Cliente_Producto.csv"
 
 
-def parse_decimal(value: str) -> Decimal:
-    """Convierte string a Decimal."""
-    if not value or value == "":
-        return Decimal("0")
-    
-    value_str = str(value).strip().replace("$", "").replace(" ", "").replace("%", "")
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return Decimal(value_str)
-    except (InvalidOperation, ValueError):
-        return Decimal("0")
-
-
 def format_number_european(value, decimals=2):
     """Formatea número en formato europeo: punto para miles, coma para decimales."""
     if value == 0 or value == "":
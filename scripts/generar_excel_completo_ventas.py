@@ -5,9 +5,10 @@ Incluye todas las hojas de análisis de ventas + nueva hoja de clientes.
 """
 
 import csv
-from decimal import Decimal, InvalidOperation
 from collections import defaultdict
 
+from parseo_numeros import parse_frame_numbers
+
 try:
     import pandas as pd
     HAS_PANDAS = True
@@ -19,20 +20,6 @@ VENTAS_CSV = "ventas_historicas_items.csv"
 OUTPUT_EXCEL = "EXCEL_COMPLETO_VENTAS_TradeUnity.xlsx"
 
 
-def parse_decimal(value: str) -> Decimal:
-    """Convierte string a Decimal."""
-    if not value or value == "":
-        return Decimal("0")
-    
-    value_str = str(value).strip().replace("$", "").replace(" ", "").replace("%", "")
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return Decimal(value_str)
-    except (InvalidOperation, ValueError):
-        return Decimal("0")
-
-
 def format_number(value, decimals=2):
     """Formatea número para mostrar."""
     if value == 0 or value == "":
@@ -57,10 +44,7 @@ def load_data():
         'Días desde Última Recepción CEG', 'Días desde Última Importación'
     ]
     
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.replace(',', '.').str.replace('%', '')
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    parse_frame_numbers(df, numeric_cols, source=VENTAS_CSV)
     
     print(f"   ✅ {len(df)} filas cargadas")
     return df
@@ -5,27 +5,15 @@ Cada análisis se guarda en un CSV individual para importar en spreadsheet.
 """
 
 import csv
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal
 from collections import defaultdict
 
+from parseo_numeros import parse_decimal
+
 # Archivos
 INPUT_CSV = "ventas_historicas_items.csv"
 
 
-def parse_decimal(value: str) -> Decimal:
-    """Convierte string con formato europeo a Decimal."""
-    if not value or value == "":
-        return Decimal("0")
-    
-    value_str = str(value).strip().replace("$", "").replace(" ", "").replace("%", "")
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return Decimal(value_str)
-    except (InvalidOperation, ValueError):
-        return Decimal("0")
-
-
 def format_number(value, decimals=2):
     """Formatea número para mostrar."""
     if value == 0 or value == "":
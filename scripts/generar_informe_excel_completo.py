@@ -5,9 +5,10 @@ y la hoja de ventas original.
 """
 
 import csv
-from decimal import Decimal, InvalidOperation
 from collections import defaultdict
 
+from parseo_numeros import parse_frame_numbers
+
 try:
     import pandas as pd
     HAS_PANDAS = True
@@ -24,20 +25,6 @@ INPUT_CSV = "ventas_historicas_items.csv"
 OUTPUT_EXCEL = "Informe_Completo_Ventas_TradeUnity.xlsx"
 
 
-def parse_decimal(value: str) -> Decimal:
-    """Convierte string con formato europeo a Decimal."""
-    if not value or value == "":
-        return Decimal("0")
-    
-    value_str = str(value).strip().replace("$", "").replace(" ", "").replace("%", "")
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return Decimal(value_str)
-    except (InvalidOperation, ValueError):
-        return Decimal("0")
-
-
 def format_number(value, decimals=2):
     """Formatea número para mostrar."""
     if value == 0 or value == "":
@@ -343,10 +330,7 @@ def generate_report():
         'Días desde Última Recepción CEG', 'Días desde Última Importación'
     ]
     
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.replace(',', '.').str.replace('%', '')
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    parse_frame_numbers(df, numeric_cols, source=INPUT_CSV)
     
     # Crear archivo Excel
     print(f"\n💾 Creando archivo Excel: {OUTPUT_EXCEL}")
@@ -17,13 +17,17 @@ Incluye:
 """
 
 import csv
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal
 from collections import defaultdict
 from datetime import datetime, date
 import statistics
 
+from parseo_fechas import parse_date, parse_dates
+from parseo_numeros import parse_row_columns
+
 try:
     import pandas as pd
+    import ventas_tipadas
     HAS_PANDAS = True
 except ImportError:
     HAS_PANDAS = False
@@ -36,36 +40,6 @@ OUTPUT_DIR = "outputs"
 OUTPUT_EXCEL = f"{OUTPUT_DIR}/TradeUnity Sales Inventory Analysis.xlsx"
 
 
-def parse_decimal(value: str) -> Decimal:
-    """Convierte string a Decimal."""
-    if not value or value == "":
-        return Decimal("0")
-    
-    value_str = str(value).strip().replace("$", "").replace(" ", "").replace("%", "")
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return Decimal(value_str)
-    except (InvalidOperation, ValueError):
-        return Decimal("0")
-
-
-def parse_date(date_str: str):
-    """Parsea fecha."""
-    if not date_str or date_str == "":
-        return None
-    
-    date_str = str(date_str).strip()
-    
-    for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%Y-%d-%m']:
-        try:
-            return datetime.strptime(date_str, fmt).date()
-        except:
-            continue
-    
-    return None
-
-
 def auto_adjust_column_widths(writer, sheet_name, df):
     """Ajusta automáticamente el ancho de las columnas en Excel."""
     try:
@@ -180,24 +154,31 @@ def load_catalog():
     catalog = {}
     
     with open(CATALOGO_TU, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            sku = str(row.get('sku', '')).strip().upper()
-            d365_ref = str(row.get('Código de Producto (D365)', '')).strip()
-            
-            if not sku:
-                continue
-            
-            catalog[sku] = {
-                'd365_reference': d365_ref,
-                'nombre': str(row.get('Nombre del Producto', '')).strip(),
-                'marca': str(row.get('Marca', '')).strip(),
-                'categoria_2': str(row.get('Categoría (2° Nivel)', '')).strip(),
-                'cantidad_paquete': parse_decimal(row.get('Cantidad por Paquete Comercial', '')),
-                'fob_unitario': parse_decimal(row.get('Costo FOB (Unitario)', '')),
-                'precio_plataforma_unitario': parse_decimal(row.get('Precio Plataforma (Unitario) – CEG', '')),
-                'volumen_box': parse_decimal(row.get('Volumen (box)', '')),
-            }
+        rows = list(csv.DictReader(f))
+    numbers = parse_row_columns(rows, [
+        'Cantidad por Paquete Comercial',
+        'Costo FOB (Unitario)',
+        'Precio Plataforma (Unitario) – CEG',
+        'Volumen (box)',
+    ], source=CATALOGO_TU)
+    
+    for i, row in enumerate(rows):
+        sku = str(row.get('sku', '')).strip().upper()
+        d365_ref = str(row.get('Código de Producto (D365)', '')).strip()
+        
+        if not sku:
+            continue
+        
+        catalog[sku] = {
+            'd365_reference': d365_ref,
+            'nombre': str(row.get('Nombre del Producto', '')).strip(),
+            'marca': str(row.get('Marca', '')).strip(),
+            'categoria_2': str(row.get('Categoría (2° Nivel)', '')).strip(),
+            'cantidad_paquete': numbers['Cantidad por Paquete Comercial'][i],
+            'fob_unitario': numbers['Costo FOB (Unitario)'][i],
+            'precio_plataforma_unitario': numbers['Precio Plataforma (Unitario) – CEG'][i],
+            'volumen_box': numbers['Volumen (box)'][i],
+        }
     
     print(f"   ✅ {len(catalog)} productos en catálogo")
     return catalog
@@ -210,22 +191,24 @@ def load_stock():
     stock_data = {}
     
     with open(STOCK_ERP, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            d365_ref = str(row.get('D365 Reference', '')).strip()
-            stock_cajas = parse_decimal(row.get('Pronosticado con pendiente', ''))
-            box_qty = parse_decimal(row.get('Box Qty', ''))
-            volumen = parse_decimal(row.get('Volumen', ''))
-            
-            if not d365_ref or stock_cajas == 0:
-                continue
-            
-            stock_data[d365_ref] = {
-                'stock_cajas': stock_cajas,
-                'box_qty': box_qty,
-                'volumen': volumen,
-                'nombre_erp': str(row.get('Nombre', '')).strip(),
-            }
+        rows = list(csv.DictReader(f))
+    numbers = parse_row_columns(rows, ['Pronosticado con pendiente', 'Box Qty', 'Volumen'], source=STOCK_ERP)
+    
+    for i, row in enumerate(rows):
+        d365_ref = str(row.get('D365 Reference', '')).strip()
+        stock_cajas = numbers['Pronosticado con pendiente'][i]
+        box_qty = numbers['Box Qty'][i]
+        volumen = numbers['Volumen'][i]
+        
+        if not d365_ref or stock_cajas == 0:
+            continue
+        
+        stock_data[d365_ref] = {
+            'stock_cajas': stock_cajas,
+            'box_qty': box_qty,
+            'volumen': volumen,
+            'nombre_erp': str(row.get('Nombre', '')).strip(),
+        }
     
     print(f"   ✅ {len(stock_data)} productos con stock")
     return stock_data
@@ -248,9 +231,9 @@ def load_ventas():
         print("   ✅ DataFrame vacío creado (sin datos de ventas históricas)")
         return df
     
-    df = pd.read_csv(VENTAS_CSV, encoding='utf-8-sig')
+    # Fechas y numéricos ya vienen tipados (ventas_tipadas); los vacíos cuentan como 0
+    df = ventas_tipadas.load_ventas(VENTAS_CSV)
     
-    # Convertir columnas numéricas
     numeric_cols = [
         'Cantidad', 'Cantidad Unitarias', 'Cantidad por Paquete Comercial',
         'Precio Original', 'Precio Venta', 'Precio Original Unitario', 
@@ -262,8 +245,7 @@ def load_ventas():
     
     for col in numeric_cols:
         if col in df.columns:
-            df[col] = df[col].astype(str).str.replace(',', '.').str.replace('%', '')
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+            df[col] = df[col].fillna(0)
     
     print(f"   ✅ {len(df)} filas cargadas")
     return df
@@ -294,7 +276,7 @@ def create_enhanced_summary_sheet(df, writer):
     
     # Filtrar desde 2024
     if 'Fecha Creación' in df.columns:
-        df['Fecha Creación'] = pd.to_datetime(df['Fecha Creación'], errors='coerce')
+        df['Fecha Creación'] = parse_dates(df['Fecha Creación'], source=VENTAS_CSV).values
         df['Año'] = df['Fecha Creación'].dt.year
         df['Mes'] = df['Fecha Creación'].dt.month
         df['Trimestre'] = df['Mes'].apply(lambda x: f"Q{(x-1)//3 + 1}")
@@ -316,11 +298,6 @@ def create_enhanced_summary_sheet(df, writer):
     margen_prom_plataforma = df_2024['% Margen sobre Plataforma'].mean()
     volumen_total = df_2024['Volumen del Item'].sum()
     
-    # Convertir Total Orden para cálculos
-    if 'Total Orden' in df_2024.columns:
-        df_2024['Total Orden'] = df_2024['Total Orden'].astype(str).str.replace(',', '.').str.replace('$', '').str.strip()
-        df_2024['Total Orden'] = pd.to_numeric(df_2024['Total Orden'], errors='coerce').fillna(0)
-    
     # Calcular promedio de orden usando Total Orden (valor completo de la orden)
     # NOTA: Si Looker/Odoo muestra valores diferentes, puede ser porque:
     # 1. Usa GMV (Gross Merchandise Value) en lugar de Total Orden
@@ -328,11 +305,6 @@ def create_enhanced_summary_sheet(df, writer):
     # 3. Tiene datos más actualizados que el CSV
     # Usamos .first() porque Total Orden es el mismo para todos los items de una orden
     if 'Total Orden' in df_2024.columns:
-        # Convertir Total Orden si no está convertido
-        if df_2024['Total Orden'].dtype == 'object':
-            df_2024['Total Orden'] = df_2024['Total Orden'].astype(str).str.replace(',', '.').str.replace('$', '').str.strip()
-            df_2024['Total Orden'] = pd.to_numeric(df_2024['Total Orden'], errors='coerce').fillna(0)
-        
         if df_2024['Total Orden'].sum() > 0:
             ordenes_totales = df_2024.groupby('Número de Orden')['Total Orden'].first()
         else:
@@ -427,8 +399,6 @@ def create_enhanced_summary_sheet(df, writer):
             elif metrica == 'Promedio de Orden (USD)':
                 # Usar Total Orden si está disponible, sino sumar Total Item con IVA
                 if 'Total Orden' in df_trim.columns:
-                    df_trim['Total Orden'] = df_trim['Total Orden'].astype(str).str.replace(',', '.').str.replace('$', '').str.strip()
-                    df_trim['Total Orden'] = pd.to_numeric(df_trim['Total Orden'], errors='coerce').fillna(0)
                     if df_trim['Total Orden'].sum() > 0:
                         ordenes_trim = df_trim.groupby('Número de Orden')['Total Orden'].first()
                     else:
@@ -439,8 +409,6 @@ def create_enhanced_summary_sheet(df, writer):
             elif metrica == 'Mediana de Ventas (USD)':
                 # Usar Total Orden si está disponible, sino sumar Total Item con IVA
                 if 'Total Orden' in df_trim.columns:
-                    df_trim['Total Orden'] = df_trim['Total Orden'].astype(str).str.replace(',', '.').str.replace('$', '').str.strip()
-                    df_trim['Total Orden'] = pd.to_numeric(df_trim['Total Orden'], errors='coerce').fillna(0)
                     if df_trim['Total Orden'].sum() > 0:
                         ordenes_trim = df_trim.groupby('Número de Orden')['Total Orden'].first()
                     else:
@@ -509,7 +477,7 @@ def create_cliente_producto_sheet(df, writer):
     """Crea hoja de análisis desglosado por Cliente y Producto."""
     print("📊 Creando análisis Cliente-Producto...")
     
-    cliente_producto = df.groupby(['Email Cliente', 'SKU']).agg({
+    cliente_producto = df.groupby(['Email Cliente', 'SKU'], observed=True).agg({
         'Nombre Cliente': 'first',
         'Apellido Cliente': 'first',
         'CUIT Cliente': 'first',
@@ -737,7 +705,7 @@ def create_analisis_por_cliente_detallado(df, writer):
     auto_adjust_column_widths(writer, '04_Análisis por Cliente', df_clientes)
     
     # Resumen por cliente
-    resumen_clientes = df.groupby('Email Cliente').agg({
+    resumen_clientes = df.groupby('Email Cliente', observed=True).agg({
         'Nombre Cliente': 'first',
         'Apellido Cliente': 'first',
         'CUIT Cliente': 'first',
@@ -765,7 +733,7 @@ def create_by_product_sheet(df, writer):
     """Crea hoja de análisis por producto."""
     print("📊 Creando análisis por Producto...")
     
-    product_analysis = df.groupby('SKU').agg({
+    product_analysis = df.groupby('SKU', observed=True).agg({
         'Nombre Producto': 'first',
         'Brand Name CEG': 'first',
         'Categoría (2° Nivel)': 'first',
@@ -808,7 +776,7 @@ def create_by_brand_sheet(df, writer):
     """Crea hoja de análisis por marca."""
     print("📊 Creando análisis por Marca...")
     
-    brand_analysis = df.groupby('Brand Name CEG').agg({
+    brand_analysis = df.groupby('Brand Name CEG', observed=True).agg({
         'SKU': 'nunique',
         'Cantidad': 'sum',
         'Cantidad Unitarias': 'sum',
@@ -842,7 +810,7 @@ def create_by_category_sheet(df, writer):
     """Crea hoja de análisis por categoría."""
     print("📊 Creando análisis por Categoría...")
     
-    category_analysis = df.groupby('Categoría (2° Nivel)').agg({
+    category_analysis = df.groupby('Categoría (2° Nivel)', observed=True).agg({
         'SKU': 'nunique',
         'Brand Name CEG': 'nunique',
         'Cantidad': 'sum',
@@ -966,7 +934,7 @@ def create_top_products_sheet(df, writer):
     print("📊 Creando Top Productos...")
     
     # Top por facturación
-    top_facturacion = df.groupby('SKU').agg({
+    top_facturacion = df.groupby('SKU', observed=True).agg({
         'Nombre Producto': 'first',
         'Brand Name CEG': 'first',
         'Total Item con IVA': 'sum',
@@ -979,7 +947,7 @@ def create_top_products_sheet(df, writer):
     ]
     
     # Top por unidades vendidas
-    top_unidades = df.groupby('SKU').agg({
+    top_unidades = df.groupby('SKU', observed=True).agg({
         'Nombre Producto': 'first',
         'Brand Name CEG': 'first',
         'Cantidad Unitarias': 'sum',
@@ -1003,7 +971,7 @@ def create_data_ninja_suggestions(df, stock_data, catalog, writer):
     sugerencias = []
     
     # Agrupar ventas por SKU
-    ventas_por_sku = df.groupby('SKU').agg({
+    ventas_por_sku = df.groupby('SKU', observed=True).agg({
         'Cantidad Unitarias': 'sum',
         'Email Cliente': lambda x: x.nunique(),
     }).reset_index()
@@ -1115,9 +1083,12 @@ def generate_mega_excel():
 if __name__ == "__main__":
     if not HAS_PANDAS:
         print("Instalando pandas...")
+        import os
         import subprocess
+        import sys
         subprocess.check_call(["pip3", "install", "pandas", "openpyxl", "--break-system-packages"])
-        import pandas as pd
+        # Los imports protegidos por HAS_PANDAS quedaron sin definir: se relanza el script
+        os.execv(sys.executable, [sys.executable] + sys.argv)
     
     print("🔄 Iniciando generación de MEGA EXCEL COMPLETO...")
     generate_mega_excel()
@@ -5,13 +5,17 @@ Incluye análisis por SKU con clientes potenciales y probabilidades de compra.
 """
 
 import csv
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal
 from collections import defaultdict
 from datetime import datetime, timedelta
 import math
 
+from parseo_fechas import parse_date
+from parseo_numeros import parse_row_columns
+
 try:
     import pandas as pd
+    import ventas_tipadas
     HAS_PANDAS = True
 except ImportError:
     HAS_PANDAS = False
@@ -23,36 +27,6 @@ CATALOGO_TU = "fuentes/catalogo_trade_unity.csv"
 OUTPUT_EXCEL = "MEGA_ANALISIS_INVENTARIO_VENTAS_TradeUnity.xlsx"
 
 
-def parse_decimal(value: str) -> Decimal:
-    """Convierte string a Decimal."""
-    if not value or value == "":
-        return Decimal("0")
-    
-    value_str = str(value).strip().replace("$", "").replace(" ", "").replace("%", "")
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return Decimal(value_str)
-    except (InvalidOperation, ValueError):
-        return Decimal("0")
-
-
-def parse_date(date_str: str):
-    """Parsea fecha."""
-    if not date_str or date_str == "":
-        return None
-    
-    date_str = str(date_str).strip()
-    
-    for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%Y-%d-%m']:
-        try:
-            return datetime.strptime(date_str, fmt).date()
-        except:
-            continue
-    
-    return None
-
-
 def days_between(date1, date2):
     """Calcula días entre dos fechas."""
     if not date1 or not date2:
@@ -76,24 +50,31 @@ def load_catalog():
     catalog = {}
     
     with open(CATALOGO_TU, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            sku = str(row.get('sku', '')).strip().upper()
-            d365_ref = str(row.get('Código de Producto (D365)', '')).strip()
-            
-            if not sku:
-                continue
-            
-            catalog[sku] = {
-                'd365_reference': d365_ref,
-                'nombre': str(row.get('Nombre del Producto', '')).strip(),
-                'marca': str(row.get('Marca', '')).strip(),
-                'categoria_2': str(row.get('Categoría (2° Nivel)', '')).strip(),
-                'cantidad_paquete': parse_decimal(row.get('Cantidad por Paquete Comercial', '')),
-                'fob_unitario': parse_decimal(row.get('Costo FOB (Unitario)', '')),
-                'precio_plataforma_unitario': parse_decimal(row.get('Precio Plataforma (Unitario) – CEG', '')),
-                'volumen_box': parse_decimal(row.get('Volumen (box)', '')),
-            }
+        rows = list(csv.DictReader(f))
+    numbers = parse_row_columns(rows, [
+        'Cantidad por Paquete Comercial',
+        'Costo FOB (Unitario)',
+        'Precio Plataforma (Unitario) – CEG',
+        'Volumen (box)',
+    ], source=CATALOGO_TU)
+    
+    for i, row in enumerate(rows):
+        sku = str(row.get('sku', '')).strip().upper()
+        d365_ref = str(row.get('Código de Producto (D365)', '')).strip()
+        
+        if not sku:
+            continue
+        
+        catalog[sku] = {
+            'd365_reference': d365_ref,
+            'nombre': str(row.get('Nombre del Producto', '')).strip(),
+            'marca': str(row.get('Marca', '')).strip(),
+            'categoria_2': str(row.get('Categoría (2° Nivel)', '')).strip(),
+            'cantidad_paquete': numbers['Cantidad por Paquete Comercial'][i],
+            'fob_unitario': numbers['Costo FOB (Unitario)'][i],
+            'precio_plataforma_unitario': numbers['Precio Plataforma (Unitario) – CEG'][i],
+            'volumen_box': numbers['Volumen (box)'][i],
+        }
     
     print(f"   ✅ {len(catalog)} productos en catálogo")
     return catalog
@@ -106,22 +87,24 @@ def load_stock():
     stock_data = {}
     
     with open(STOCK_ERP, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            d365_ref = str(row.get('D365 Reference', '')).strip()
-            stock_cajas = parse_decimal(row.get('Pronosticado con pendiente', ''))
-            box_qty = parse_decimal(row.get('Box Qty', ''))
-            volumen = parse_decimal(row.get('Volumen', ''))
-            
-            if not d365_ref or stock_cajas == 0:
-                continue
-            
-            stock_data[d365_ref] = {
-                'stock_cajas': stock_cajas,
-                'box_qty': box_qty,
-                'volumen': volumen,
-                'nombre_erp': str(row.get('Nombre', '')).strip(),
-            }
+        rows = list(csv.DictReader(f))
+    numbers = parse_row_columns(rows, ['Pronosticado con pendiente', 'Box Qty', 'Volumen'], source=STOCK_ERP)
+    
+    for i, row in enumerate(rows):
+        d365_ref = str(row.get('D365 Reference', '')).strip()
+        stock_cajas = numbers['Pronosticado con pendiente'][i]
+        box_qty = numbers['Box Qty'][i]
+        volumen = numbers['Volumen'][i]
+        
+        if not d365_ref or stock_cajas == 0:
+            continue
+        
+        stock_data[d365_ref] = {
+            'stock_cajas': stock_cajas,
+            'box_qty': box_qty,
+            'volumen': volumen,
+            'nombre_erp': str(row.get('Nombre', '')).strip(),
+        }
     
     print(f"   ✅ {len(stock_data)} productos con stock")
     return stock_data
@@ -131,12 +114,12 @@ def load_ventas():
     """Carga datos de ventas."""
     print("📖 Cargando datos de ventas...")
     
-    ventas_data = []
-    
-    with open(VENTAS_CSV, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            ventas_data.append(row)
+    # Ventas ya tipadas (ventas_tipadas): montos como Decimal, fechas como date
+    ventas_data = ventas_tipadas.ventas_records(ventas_tipadas.load_ventas(VENTAS_CSV), [
+        'SKU', 'Email Cliente', 'Código CEG', 'Número de Orden', 'Fecha Creación',
+        'Nombre Cliente', 'Apellido Cliente', 'CUIT Cliente',
+        'Cantidad Unitarias', 'Precio Venta Unitario', 'Total Item con IVA',
+    ])
     
     print(f"   ✅ {len(ventas_data)} registros de ventas cargados")
     return ventas_data
@@ -248,11 +231,10 @@ def create_sku_clientes_potenciales(ventas_data, stock_data, catalog, writer):
         if not sku or not email:
             continue
         
-        fecha_str = row.get('Fecha Creación', '').strip()
-        fecha = parse_date(fecha_str)
-        cantidad_unidades = parse_decimal(row.get('Cantidad Unitarias', ''))
-        precio_unitario = parse_decimal(row.get('Precio Venta Unitario', ''))
-        total_item = parse_decimal(row.get('Total Item con IVA', ''))
+        fecha = row['Fecha Creación']
+        cantidad_unidades = row['Cantidad Unitarias']
+        precio_unitario = row['Precio Venta Unitario']
+        total_item = row['Total Item con IVA']
         
         # Guardar datos del cliente (primera vez)
         if not sku_clientes[sku][email]['nombre']:
@@ -397,11 +379,10 @@ def create_inventory_sales_summary(ventas_data, stock_data, catalog, writer):
         
         email = str(row.get('Email Cliente', '')).strip()
         orden = str(row.get('Número de Orden', '')).strip()
-        cantidad = parse_decimal(row.get('Cantidad Unitarias', ''))
-        total = parse_decimal(row.get('Total Item con IVA', ''))
-        precio = parse_decimal(row.get('Precio Venta Unitario', ''))
-        fecha_str = row.get('Fecha Creación', '').strip()
-        fecha = parse_date(fecha_str)
+        cantidad = row['Cantidad Unitarias']
+        total = row['Total Item con IVA']
+        precio = row['Precio Venta Unitario']
+        fecha = row['Fecha Creación']
         
         ventas_por_sku[sku]['total_unidades'] += cantidad
         ventas_por_sku[sku]['total_facturado'] += total
@@ -477,7 +458,7 @@ def create_data_ninja_suggestions(ventas_data, stock_data, catalog, writer):
     for row in ventas_data:
         sku = str(row.get('SKU', '')).strip().upper()
         if sku:
-            ventas_por_sku[sku]['unidades'] += parse_decimal(row.get('Cantidad Unitarias', ''))
+            ventas_por_sku[sku]['unidades'] += row['Cantidad Unitarias']
             ventas_por_sku[sku]['clientes'].add(str(row.get('Email Cliente', '')).strip())
     
     for d365_ref, stock_info in stock_data.items():
@@ -539,7 +520,7 @@ def create_data_ninja_suggestions(ventas_data, stock_data, catalog, writer):
         email = str(row.get('Email Cliente', '')).strip()
         if email:
             clientes_vip[email]['compras'] += 1
-            clientes_vip[email]['facturado'] += parse_decimal(row.get('Total Item con IVA', ''))
+            clientes_vip[email]['facturado'] += row['Total Item con IVA']
             clientes_vip[email]['productos'].add(str(row.get('SKU', '')).strip().upper())
     
     top_clientes = sorted(clientes_vip.items(), key=lambda x: x[1]['facturado'], reverse=True)[:10]
@@ -616,9 +597,12 @@ def generate_mega_excel():
 if __name__ == "__main__":
     if not HAS_PANDAS:
         print("Instalando pandas...")
+        import os
         import subprocess
+        import sys
         subprocess.check_call(["pip3", "install", "pandas", "openpyxl", "--break-system-packages"])
-        import pandas as pd
+        # Los imports protegidos por HAS_PANDAS quedaron sin definir: se relanza el script
+        os.execv(sys.executable, [sys.executable] + sys.argv)
     
     print("🔄 Iniciando generación de MEGA EXCEL...")
     generate_mega_excel()
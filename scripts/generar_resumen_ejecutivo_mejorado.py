@@ -5,29 +5,18 @@ Incluye: valores totales, análisis por año/trimestre, clientes únicos, promed
 """
 
 import csv
-from decimal import Decimal, InvalidOperation
-from datetime import datetime, date
+from decimal import Decimal
+from datetime import date
 from collections import defaultdict
 
+from parseo_fechas import parse_date
+from parseo_numeros import parse_decimal
+
 # Archivos
 VENTAS_CSV = "ventas_historicas_items.csv"
 OUTPUT_CSV = "00_Resumen_Ejecutivo.csv"
 
 
-def parse_decimal(value: str) -> Decimal:
-    """Convierte string a Decimal."""
-    if not value or value == "":
-        return Decimal("0")
-    
-    value_str = str(value).strip().replace("$", "").replace(" ", "").replace("%", "")
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return Decimal(value_str)
-    except (InvalidOperation, ValueError):
-        return Decimal("0")
-
-
 def format_number_european(value, decimals=2):
     """Formatea número en formato europeo: punto para miles, coma para decimales."""
     if value == 0 or value == "":
@@ -49,17 +38,6 @@ def format_number_european(value, decimals=2):
             return formatted.replace(",", ".")
 
 
-def parse_date(date_str: str) -> date:
-    """Parsea fecha en formato YYYY-MM-DD."""
-    if not date_str or date_str == "":
-        return None
-    
-    try:
-        return datetime.strptime(str(date_str).strip(), "%Y-%m-%d").date()
-    except:
-        return None
-
-
 def get_quarter(date_obj: date) -> str:
     """Obtiene trimestre de una fecha."""
     if not date_obj:
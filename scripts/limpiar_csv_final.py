@@ -112,6 +112,28 @@ def analyze_columns(rows: list, headers: list) -> dict:
     return suggestions
 
 
+def clean_headers(headers: list) -> list:
+    """Headers sin las columnas a eliminar."""
+    return [h for h in headers if h not in COLUMNS_TO_REMOVE]
+
+
+def clean_row(row: dict) -> dict:
+    """Elimina columnas, formatea CUIT y dinero (in place)."""
+    # Eliminar columnas no deseadas
+    for col in COLUMNS_TO_REMOVE:
+        row.pop(col, None)
+    
+    # Formatear CUIT
+    if "CUIT Cliente" in row:
+        row["CUIT Cliente"] = format_cuit(row.get("CUIT Cliente", ""))
+    
+    # Formatear columnas de dinero
+    for col in MONEY_COLUMNS:
+        if col in row:
+            row[col] = format_money(row.get(col, ""))
+    return row
+
+
 def clean_csv():
     """Limpia el CSV según especificaciones."""
     
@@ -133,7 +155,7 @@ def clean_csv():
     suggestions = analyze_columns(rows, headers)
     
     # Crear nuevas headers (sin las columnas a eliminar)
-    new_headers = [h for h in headers if h not in COLUMNS_TO_REMOVE]
+    new_headers = clean_headers(headers)
     
     print(f"\n🗑️  Eliminando columnas: {', '.join(COLUMNS_TO_REMOVE)}")
     
@@ -141,18 +163,7 @@ def clean_csv():
     print("\n🔄 Procesando datos...")
     
     for row in rows:
-        # Eliminar columnas no deseadas
-        for col in COLUMNS_TO_REMOVE:
-            row.pop(col, None)
-        
-        # Formatear CUIT
-        if "CUIT Cliente" in row:
-            row["CUIT Cliente"] = format_cuit(row.get("CUIT Cliente", ""))
-        
-        # Formatear columnas de dinero
-        for col in MONEY_COLUMNS:
-            if col in row:
-                row[col] = format_money(row.get(col, ""))
+        clean_row(row)
     
     # Escribir CSV limpio
     print(f"\n💾 Escribiendo CSV limpio: {OUTPUT_CSV}")
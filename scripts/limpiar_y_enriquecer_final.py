@@ -9,8 +9,11 @@ Script para:
 """
 
 import csv
-from decimal import Decimal, InvalidOperation
-from datetime import datetime, date
+from decimal import Decimal
+from datetime import date
+
+from parseo_fechas import DateParser
+from parseo_numeros import parse_decimal
 
 # Archivos
 TU_CSV = "fuentes/catalogo_trade_unity.csv"
@@ -31,19 +34,8 @@ COLUMNS_TO_REMOVE = [
 # Columna de categoría a traer del catálogo TU
 TU_CATEGORY_COLUMN = "Categoría (2° Nivel)"
 
-
-def parse_decimal(value: str) -> Decimal:
-    """Convierte string con formato europeo (coma decimal) a Decimal."""
-    if not value or value == "":
-        return Decimal("0")
-    
-    value_str = str(value).strip().replace("$", "").replace(" ", "")
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return Decimal(value_str)
-    except (InvalidOperation, ValueError):
-        return Decimal("0")
+# Fechas ya normalizadas por enriquecer_con_tu_y_formatear_fechas
+ISO_DATES = DateParser(["%Y-%m-%d"])
 
 
 def format_decimal(value: Decimal, decimals: int = 4) -> str:
@@ -56,14 +48,12 @@ def format_decimal(value: Decimal, decimals: int = 4) -> str:
 
 
 def parse_date(date_str: str) -> date:
-    """Parsea fecha en formato YYYY-MM-DD a objeto date."""
+    """Parsea fecha en formato YYYY-MM-DD a objeto date (memo por valor)."""
     if not date_str or date_str == "":
         return None
     
-    try:
-        return datetime.strptime(date_str.strip(), "%Y-%m-%d").date()
-    except:
-        return None
+    dt = ISO_DATES.parse(date_str)
+    return dt.date() if dt else None
 
 
 def days_since_today(target_date: date) -> str:
@@ -107,6 +97,183 @@ def load_tu_categories() -> dict:
     return categories
 
 
+# Nuevas columnas
+NEW_COLUMNS = [
+    "Categoría (2° Nivel)",
+    "Volumen del Item",
+    "Días desde Última Recepción CEG",
+    "Días desde Última Importación",
+]
+
+# Definir orden lógico (con Código CEG y EAN pegadas a SKU)
+LOGICAL_ORDER = [
+    # 1. INFORMACIÓN DE ORDEN
+    "Número de Orden",
+    "Fecha Creación",
+    "Fecha Actualización",
+    "Estado",
+    
+    # 2. INFORMACIÓN DE CLIENTE
+    "Email Cliente",
+    "Nombre Cliente",
+    "Apellido Cliente",
+    "CUIT Cliente",
+    
+    # 3. INFORMACIÓN DE PRODUCTO (con Código CEG y EAN pegadas a SKU)
+    "SKU",
+    "Código CEG",
+    "EAN",
+    "Nombre Producto",
+    "Cantidad",
+    "Cantidad Unitarias",
+    "Cantidad por Paquete Comercial",
+    "Categoría (2° Nivel)",
+    "Categoría CEG",
+    "Brand Name CEG",
+    "Tipo de Marca",
+    
+    # 4. PRECIOS POR CAJA
+    "Precio Original",
+    "Precio Venta",
+    
+    # 5. PRECIOS UNITARIOS
+    "Precio Original Unitario",
+    "Precio Venta Unitario",
+    
+    # 6. COSTOS
+    "FOB CEG",
+    "Base Price CEG",
+    
+    # 7. MÁRGENES
+    "Margen sobre FOB",
+    "% Margen sobre FOB",
+    "Margen sobre Plataforma",
+    "% Margen sobre Plataforma",
+    
+    # 8. VOLUMEN Y FECHAS
+    "Volumen (box)",
+    "Volumen del Item",
+    "Fecha Última Recepción CEG",
+    "Días desde Última Recepción CEG",
+    "Última Importación",
+    "Días desde Última Importación",
+    
+    # 9. DESCUENTOS Y TOTALES
+    "Descuento Item",
+    "Descuento % Item",
+    "Total Item",
+    "Total Item con IVA",
+    "IVA % Item",
+    "Impuesto Item",
+    
+    # 10. TOTALES DE ORDEN
+    "Total Orden",
+    "Subtotal Orden",
+    
+    # 11. INFORMACIÓN ADICIONAL
+    "Moneda Orden",
+    "Tasa Cambio",
+    "Fecha Creación Magento",
+    
+    # 12. CAMPOS TÉCNICOS (al final)
+    "ID Item",
+    "ID Item Padre",
+    "Categorías IDs",
+    "Categorías",
+]
+
+
+def reorder_headers(headers: list) -> list:
+    """Saca COLUMNS_TO_REMOVE, agrega NEW_COLUMNS y devuelve el orden final: el lógico + las que falten (alfabético)."""
+    headers = [col for col in headers if col not in COLUMNS_TO_REMOVE]
+    
+    for col in NEW_COLUMNS:
+        if col not in headers:
+            headers.append(col)
+    
+    # Agregar columnas que no estén en el orden lógico
+    all_columns = set(headers)
+    ordered_columns = set(LOGICAL_ORDER)
+    missing_columns = sorted(list(all_columns - ordered_columns))
+    
+    # Orden final
+    return [col for col in LOGICAL_ORDER if col in headers] + missing_columns
+
+
+def clean_row(row: dict, tu_categories: dict) -> tuple:
+    """
+    Elimina columnas y calcula Categoría (2° Nivel), Volumen del Item y días desde hoy (in place).
+    Devuelve (categoría encontrada, volumen calculado, cantidad de días calculados).
+    """
+    categoria = False
+    volumen = False
+    
+    # Eliminar columnas no deseadas
+    for col in COLUMNS_TO_REMOVE:
+        row.pop(col, None)
+    
+    # Enriquecer con categoría de segundo nivel
+    sku = str(row.get("SKU", "")).strip().upper()
+    if sku and sku in tu_categories:
+        row["Categoría (2° Nivel)"] = tu_categories[sku]
+        categoria = True
+    else:
+        row["Categoría (2° Nivel)"] = ""
+    
+    # Calcular Volumen del Item = Volumen (box) × Cantidad
+    volumen_box_str = row.get("Volumen (box)", "").strip()
+    cantidad_str = row.get("Cantidad", "").strip()
+    
+    if volumen_box_str and cantidad_str:
+        try:
+            volumen_box = parse_decimal(volumen_box_str)
+            cantidad = parse_decimal(cantidad_str)
+            
+            if volumen_box > 0 and cantidad > 0:
+                volumen_item = volumen_box * cantidad
+                row["Volumen del Item"] = format_decimal(volumen_item, 6)
+                volumen = True
+            else:
+                row["Volumen del Item"] = ""
+        except:
+            row["Volumen del Item"] = ""
+    else:
+        row["Volumen del Item"] = ""
+    
+    # Calcular días desde hoy (última recepción CEG y última importación)
+    dias = set_days_since(row)
+    
+    return categoria, volumen, dias
+
+
+def set_days_since(row: dict) -> int:
+    """
+    Calcula (in place) los días desde hoy a la última recepción CEG y a la última importación.
+    Son las únicas columnas que dependen de la fecha de corrida. Devuelve cuántas se calcularon.
+    """
+    dias = 0
+    
+    # Calcular días desde última recepción CEG
+    fecha_recepcion_str = row.get("Fecha Última Recepción CEG", "").strip()
+    fecha_recepcion = parse_date(fecha_recepcion_str)
+    if fecha_recepcion:
+        row["Días desde Última Recepción CEG"] = days_since_today(fecha_recepcion)
+        dias += 1
+    else:
+        row["Días desde Última Recepción CEG"] = ""
+    
+    # Calcular días desde última importación
+    fecha_importacion_str = row.get("Última Importación", "").strip()
+    fecha_importacion = parse_date(fecha_importacion_str)
+    if fecha_importacion:
+        row["Días desde Última Importación"] = days_since_today(fecha_importacion)
+        dias += 1
+    else:
+        row["Días desde Última Importación"] = ""
+    
+    return dias
+
+
 def clean_and_enrich():
     """Limpia, reordena y enriquece el CSV."""
     
@@ -125,109 +292,10 @@ def clean_and_enrich():
     
     print(f"   ✅ {len(rows)} filas leídas")
     
-    # Eliminar columnas no deseadas
+    # Eliminar columnas no deseadas, agregar las nuevas y reordenar
     print(f"\n🗑️  Eliminando columnas: {', '.join(COLUMNS_TO_REMOVE)}")
     
-    for col in COLUMNS_TO_REMOVE:
-        if col in headers:
-            headers.remove(col)
-    
-    # Agregar nuevas columnas
-    new_columns = [
-        "Categoría (2° Nivel)",
-        "Volumen del Item",
-        "Días desde Última Recepción CEG",
-        "Días desde Última Importación",
-    ]
-    
-    for col in new_columns:
-        if col not in headers:
-            headers.append(col)
-    
-    # Definir orden lógico (con Código CEG y EAN pegadas a SKU)
-    logical_order = [
-        # 1. INFORMACIÓN DE ORDEN
-        "Número de Orden",
-        "Fecha Creación",
-        "Fecha Actualización",
-        "Estado",
-        
-        # 2. INFORMACIÓN DE CLIENTE
-        "Email Cliente",
-        "Nombre Cliente",
-        "Apellido Cliente",
-        "CUIT Cliente",
-        
-        # 3. INFORMACIÓN DE PRODUCTO (con Código CEG y EAN pegadas a SKU)
-        "SKU",
-        "Código CEG",
-        "EAN",
-        "Nombre Producto",
-        "Cantidad",
-        "Cantidad Unitarias",
-        "Cantidad por Paquete Comercial",
-        "Categoría (2° Nivel)",
-        "Categoría CEG",
-        "Brand Name CEG",
-        "Tipo de Marca",
-        
-        # 4. PRECIOS POR CAJA
-        "Precio Original",
-        "Precio Venta",
-        
-        # 5. PRECIOS UNITARIOS
-        "Precio Original Unitario",
-        "Precio Venta Unitario",
-        
-        # 6. COSTOS
-        "FOB CEG",
-        "Base Price CEG",
-        
-        # 7. MÁRGENES
-        "Margen sobre FOB",
-        "% Margen sobre FOB",
-        "Margen sobre Plataforma",
-        "% Margen sobre Plataforma",
-        
-        # 8. VOLUMEN Y FECHAS
-        "Volumen (box)",
-        "Volumen del Item",
-        "Fecha Última Recepción CEG",
-        "Días desde Última Recepción CEG",
-        "Última Importación",
-        "Días desde Última Importación",
-        
-        # 9. DESCUENTOS Y TOTALES
-        "Descuento Item",
-        "Descuento % Item",
-        "Total Item",
-        "Total Item con IVA",
-        "IVA % Item",
-        "Impuesto Item",
-        
-        # 10. TOTALES DE ORDEN
-        "Total Orden",
-        "Subtotal Orden",
-        
-        # 11. INFORMACIÓN ADICIONAL
-        "Moneda Orden",
-        "Tasa Cambio",
-        "Fecha Creación Magento",
-        
-        # 12. CAMPOS TÉCNICOS (al final)
-        "ID Item",
-        "ID Item Padre",
-        "Categorías IDs",
-        "Categorías",
-    ]
-    
-    # Agregar columnas que no estén en el orden lógico
-    all_columns = set(headers)
-    ordered_columns = set(logical_order)
-    missing_columns = sorted(list(all_columns - ordered_columns))
-    
-    # Orden final
-    final_order = [col for col in logical_order if col in headers] + missing_columns
+    final_order = reorder_headers(headers)
     
     print(f"\n🔄 Procesando datos...")
     
@@ -236,55 +304,10 @@ def clean_and_enrich():
     enriched_categories = 0
     
     for row in rows:
-        # Eliminar columnas no deseadas
-        for col in COLUMNS_TO_REMOVE:
-            row.pop(col, None)
-        
-        # Enriquecer con categoría de segundo nivel
-        sku = str(row.get("SKU", "")).strip().upper()
-        if sku and sku in tu_categories:
-            row["Categoría (2° Nivel)"] = tu_categories[sku]
-            enriched_categories += 1
-        else:
-            row["Categoría (2° Nivel)"] = ""
-        
-        # Calcular Volumen del Item = Volumen (box) × Cantidad
-        volumen_box_str = row.get("Volumen (box)", "").strip()
-        cantidad_str = row.get("Cantidad", "").strip()
-        
-        if volumen_box_str and cantidad_str:
-            try:
-                volumen_box = parse_decimal(volumen_box_str)
-                cantidad = parse_decimal(cantidad_str)
-                
-                if volumen_box > 0 and cantidad > 0:
-                    volumen_item = volumen_box * cantidad
-                    row["Volumen del Item"] = format_decimal(volumen_item, 6)
-                    calculated_volumen += 1
-                else:
-                    row["Volumen del Item"] = ""
-            except:
-                row["Volumen del Item"] = ""
-        else:
-            row["Volumen del Item"] = ""
-        
-        # Calcular días desde última recepción CEG
-        fecha_recepcion_str = row.get("Fecha Última Recepción CEG", "").strip()
-        fecha_recepcion = parse_date(fecha_recepcion_str)
-        if fecha_recepcion:
-            row["Días desde Última Recepción CEG"] = days_since_today(fecha_recepcion)
-            calculated_dias += 1
-        else:
-            row["Días desde Última Recepción CEG"] = ""
-        
-        # Calcular días desde última importación
-        fecha_importacion_str = row.get("Última Importación", "").strip()
-        fecha_importacion = parse_date(fecha_importacion_str)
-        if fecha_importacion:
-            row["Días desde Última Importación"] = days_since_today(fecha_importacion)
-            calculated_dias += 1
-        else:
-            row["Días desde Última Importación"] = ""
+        categoria, volumen, dias = clean_row(row, tu_categories)
+        enriched_categories += categoria
+        calculated_volumen += volumen
+        calculated_dias += dias
     
     # Escribir CSV actualizado
     print(f"\n💾 Escribiendo CSV actualizado: {OUTPUT_CSV}")
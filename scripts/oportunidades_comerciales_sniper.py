@@ -27,6 +27,9 @@ try:
 except ImportError:
     HAS_OPENPYXL = False
 
+import ventas_tipadas
+from parseo_numeros import parse_frame_numbers
+
 # Archivos
 VENTAS_CSV = "inputs/ventas_historicas_items.csv"
 STOCK_ERP = "fuentes/stock_erp.csv"
@@ -36,20 +39,6 @@ OUTPUT_DIR = "outputs"
 OUTPUT_EXCEL = f"{OUTPUT_DIR}/TradeUnity_Sniper_Commercial_Opportunities.xlsx"
 
 
-def parse_decimal(value: str) -> float:
-    """Convierte string a float."""
-    if not value or value == "" or pd.isna(value):
-        return 0.0
-    
-    value_str = str(value).strip().replace("$", "").replace(" ", "").replace("%", "")
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return float(value_str)
-    except (ValueError, TypeError):
-        return 0.0
-
-
 def auto_adjust_column_widths(writer, sheet_name, df):
     """Ajusta automáticamente el ancho de las columnas en Excel."""
     try:
@@ -79,21 +68,16 @@ def load_ventas():
         print(f"   ⚠️  Archivo de ventas no encontrado: {VENTAS_CSV}")
         return pd.DataFrame()
     
-    df = pd.read_csv(VENTAS_CSV, encoding='utf-8-sig')
+    # Fechas y numéricos ya vienen tipados (ventas_tipadas); los vacíos cuentan como 0
+    df = ventas_tipadas.load_ventas(VENTAS_CSV)
     
-    # Convertir fechas
-    if 'Fecha Creación' in df.columns:
-        df['Fecha Creación'] = pd.to_datetime(df['Fecha Creación'], errors='coerce')
-    
-    # Convertir numéricos
     numeric_cols = [
         'Cantidad Unitarias', 'Total Item con IVA', 'Precio Venta Unitario',
         'Precio Original', 'Precio Venta', 'FOB CEG', 'Base Price CEG'
     ]
     for col in numeric_cols:
         if col in df.columns:
-            df[col] = df[col].astype(str).str.replace(',', '.').str.replace('$', '').str.strip()
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+            df[col] = df[col].fillna(0)
     
     print(f"   ✅ {len(df)} registros de ventas cargados")
     return df
@@ -107,18 +91,11 @@ def load_stock():
         print(f"   ⚠️  Archivo de stock no encontrado: {STOCK_ERP}")
         return pd.DataFrame()
     
-    df = pd.read_csv(STOCK_ERP, encoding='utf-8-sig')
+    df = pd.read_csv(STOCK_ERP, encoding='utf-8-sig', dtype=str)
     
     # Limpiar y convertir
-    df['Pronosticado con pendiente'] = pd.to_numeric(
-        df['Pronosticado con pendiente'].astype(str).str.replace(',', '.'), 
-        errors='coerce'
-    ).fillna(0)
-    
-    df['Box Qty'] = pd.to_numeric(
-        df['Box Qty'].astype(str).str.replace(',', '.'), 
-        errors='coerce'
-    ).fillna(1)
+    parse_frame_numbers(df, ['Pronosticado con pendiente'], fill=0, source=STOCK_ERP)
+    parse_frame_numbers(df, ['Box Qty'], fill=1, source=STOCK_ERP)
     
     # Calcular unidades
     df['Stock Unidades'] = df['Pronosticado con pendiente'] * df['Box Qty']
@@ -149,25 +126,21 @@ def load_precios_actuales():
         print(f"   ⚠️  Archivo de publicaciones no encontrado: {PUBLICACIONES_CSV}")
         return pd.DataFrame()
     
-    df = pd.read_csv(PUBLICACIONES_CSV, encoding='utf-8-sig')
+    df = pd.read_csv(PUBLICACIONES_CSV, encoding='utf-8-sig', dtype=str)
     
     # Obtener precio actual (última columna: liquidación enero/febrero 2026)
     precio_col = 'Precio LIQUIDACION ENERO/FEBRERO 2026  unitario neto'
     
     if precio_col in df.columns:
-        df['Precio Actual Publicado'] = pd.to_numeric(
-            df[precio_col].astype(str).str.replace(',', '.').str.replace('$', '').str.strip(),
-            errors='coerce'
-        ).fillna(0)
+        df['Precio Actual Publicado'] = df[precio_col]
+        parse_frame_numbers(df, ['Precio Actual Publicado'], fill=0, source=PUBLICACIONES_CSV)
     else:
         # Si no existe, buscar la última columna de precio
         precio_cols = [col for col in df.columns if 'Precio' in col and 'unitario' in col.lower()]
         if precio_cols:
             ultima_col = precio_cols[-1]
-            df['Precio Actual Publicado'] = pd.to_numeric(
-                df[ultima_col].astype(str).str.replace(',', '.').str.replace('$', '').str.strip(),
-                errors='coerce'
-            ).fillna(0)
+            df['Precio Actual Publicado'] = df[ultima_col]
+            parse_frame_numbers(df, ['Precio Actual Publicado'], fill=0, source=PUBLICACIONES_CSV)
         else:
             df['Precio Actual Publicado'] = 0
     
@@ -263,7 +236,7 @@ def analizar_productos_relacionados_stock(ventas_df, stock_df, catalog_df):
     ventas_df['SKU_Upper'] = ventas_df['SKU'].str.upper().str.strip()
     
     # Agrupar por cliente y SKU para identificar compras significativas
-    compras_por_cliente_sku = ventas_df.groupby(['Email Cliente', 'SKU']).agg({
+    compras_por_cliente_sku = ventas_df.groupby(['Email Cliente', 'SKU'], observed=True).agg({
         'Cantidad Unitarias': 'sum',
         'Total Item con IVA': 'sum',
         'Fecha Creación': 'max',
@@ -279,7 +252,7 @@ def analizar_productos_relacionados_stock(ventas_df, stock_df, catalog_df):
     compras_por_cliente_sku = compras_por_cliente_sku.rename(columns={'Número de Orden': 'Número de Órdenes'})
     
     # Calcular umbrales por SKU
-    umbrales_por_sku = ventas_df.groupby('SKU')['Cantidad Unitarias'].quantile(0.75)
+    umbrales_por_sku = ventas_df.groupby('SKU', observed=True)['Cantidad Unitarias'].quantile(0.75)
     
     # Filtrar compras significativas (percentil 75 o mínimo 50 unidades)
     compras_significativas = compras_por_cliente_sku[
@@ -384,14 +357,14 @@ def analizar_clientes_barren_stock(ventas_df, stock_df, catalog_df):
     
     # Agrupar por cliente y SKU para identificar compras significativas
     # "Significativo" = percentil 75 de unidades compradas por SKU
-    umbral_significativo = ventas_stock_cero.groupby('SKU')['Cantidad Unitarias'].quantile(0.75)
+    umbral_significativo = ventas_stock_cero.groupby('SKU', observed=True)['Cantidad Unitarias'].quantile(0.75)
     
     # También calcular mediana para identificar compradores fuertes
-    mediana_por_sku = ventas_stock_cero.groupby('SKU')['Cantidad Unitarias'].median()
+    mediana_por_sku = ventas_stock_cero.groupby('SKU', observed=True)['Cantidad Unitarias'].median()
     
     oportunidades = []
     
-    for (email, sku), group in ventas_stock_cero.groupby(['Email Cliente', 'SKU']):
+    for (email, sku), group in ventas_stock_cero.groupby(['Email Cliente', 'SKU'], observed=True):
         total_unidades = group['Cantidad Unitarias'].sum()
         total_facturacion = group['Total Item con IVA'].sum()
         ultima_compra = group['Fecha Creación'].max()
@@ -476,8 +449,8 @@ def analizar_stock_nuevo_recompra(ventas_df, stock_df, catalog_df):
     
     # Agrupar por cliente y SKU
     # "Compró fuerte" = percentil 75 de unidades compradas por SKU
-    umbral_fuerte = ventas_con_stock.groupby('SKU')['Cantidad Unitarias'].quantile(0.75)
-    mediana_por_sku = ventas_con_stock.groupby('SKU')['Cantidad Unitarias'].median()
+    umbral_fuerte = ventas_con_stock.groupby('SKU', observed=True)['Cantidad Unitarias'].quantile(0.75)
+    mediana_por_sku = ventas_con_stock.groupby('SKU', observed=True)['Cantidad Unitarias'].median()
     
     # Merge con stock actual
     stock_map = dict(zip(
@@ -487,7 +460,7 @@ def analizar_stock_nuevo_recompra(ventas_df, stock_df, catalog_df):
     
     oportunidades = []
     
-    for (email, sku), group in ventas_con_stock.groupby(['Email Cliente', 'SKU']):
+    for (email, sku), group in ventas_con_stock.groupby(['Email Cliente', 'SKU'], observed=True):
         total_unidades = group['Cantidad Unitarias'].sum()
         total_facturacion = group['Total Item con IVA'].sum()
         ultima_compra = group['Fecha Creación'].max()
@@ -586,7 +559,7 @@ def analizar_oportunidades_precio(ventas_df, precios_df):
     # Agrupar por cliente y SKU
     oportunidades = []
     
-    for (email, sku), group in oportunidades_precio.groupby(['Email Cliente', 'SKU']):
+    for (email, sku), group in oportunidades_precio.groupby(['Email Cliente', 'SKU'], observed=True):
         total_unidades = group['Cantidad Unitarias'].sum()
         total_facturacion = group['Total Item con IVA'].sum()
         ultima_compra = group['Fecha Creación'].max()
@@ -649,7 +622,7 @@ def generar_resumen_por_rubro_marca(df_oportunidades):
         print("   ⚠️  No se encontró columna de unidades")
         return pd.DataFrame()
     
-    resumen = df_oportunidades.groupby(['Categoría (2° Nivel)', 'Brand Name CEG']).agg({
+    resumen = df_oportunidades.groupby(['Categoría (2° Nivel)', 'Brand Name CEG'], observed=True).agg({
         'Email Cliente': 'nunique',
         'SKU': 'nunique',
         unidades_col: 'sum',
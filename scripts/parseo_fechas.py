@@ -0,0 +1,259 @@
+"""
+Parseo de fechas compartido por el ETL y los análisis.
+
+Cada fuente trae su formato:
+  - Magento (RAW)                 -> "2024-07-22 18:43:31"
+  - CSV intermedio de ventas      -> "22/07/2024 18:43"
+  - CEG last_importation_date     -> "9 sept 2022, 21:00:00" (mes en español/inglés)
+  - catálogo TU, creación Magento -> "7/20/24, 1:00 PM" (mes primero)
+  - catálogo TU, impo/recep CEG   -> "26/12/2025", "1/08/2025" (día primero)
+Antes cada script probaba varios strptime por celda dentro de try/except, y algunos asumían
+el orden día/mes equivocado (la recepción CEG se leía como M/D/YY).
+
+Acá el formato se infiere una vez por columna, mirando una muestra de valores distintos:
+gana el formato de DATE_FORMATS que más valores lee (y si no alcanza para todos, se suma el
+siguiente). Cada valor distinto se parsea una sola vez (las fechas se repiten mucho entre
+líneas de la misma orden) y con pandas el parseo es vectorizado, formato por formato.
+
+Si día y mes son intercambiables en toda la muestra (ningún valor tiene día > 12), la columna
+es ambigua: se usa dayfirst si el llamador lo sabe y, si no, el primer formato de la lista
+con un aviso por consola, en vez de adivinar en silencio.
+"""
+
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+try:
+    import pandas as pd
+    HAS_PANDAS = True
+except ImportError:
+    HAS_PANDAS = False
+
+# =========================================================
+# HARDCODE
+# =========================================================
+SAMPLE_SIZE = 500                       # valores distintos que se miran para inferir el formato
+MAX_INVALID_EXAMPLES = 5                # celdas de ejemplo en el aviso de no parseables
+
+# Orden = prioridad ante empates (día primero antes que mes primero)
+DATE_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%d/%m/%Y %H:%M",
+    "%m/%d/%Y %H:%M",
+    "%d/%m/%Y",
+    "%m/%d/%Y",
+    "%d/%m/%y, %I:%M %p",
+    "%m/%d/%y, %I:%M %p",
+    "%d/%m/%y",
+    "%m/%d/%y",
+    "%d %m %Y, %H:%M:%S",               # CEG, con el mes ya pasado a número
+    "%d %m %Y",
+]
+
+MONTHS = {
+    "ene": 1, "jan": 1, "feb": 2, "mar": 3, "abr": 4, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "ago": 8, "aug": 8, "sept": 9, "sep": 9, "set": 9, "oct": 10, "nov": 11,
+    "dic": 12, "dec": 12,
+}
+EMPTY_VALUES = {"", "null", "none", "nan", "nat", "#n/a"}
+
+_MONTH_RE = re.compile(
+    r"(?<![a-z])(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")[a-z]*\.?",
+    re.IGNORECASE,
+)
+
+
+class DateFormat(NamedTuple):
+    formats: List[str]                  # formatos elegidos, en orden de cobertura
+    ambiguous: bool                     # día/mes intercambiables en toda la muestra
+
+
+class ParsedDates(NamedTuple):
+    values: Any                         # lista de datetime/None (o Series datetime64 con parse_dates)
+    formats: List[str]
+    ambiguous: bool
+    invalid: List[str]                  # valores no vacíos que no se pudieron leer
+
+
+# =========================================================
+# Escalar
+# =========================================================
+def _prepare(value: Any) -> str:
+    """Texto listo para strptime ("" si está vacío); los meses con nombre pasan a número."""
+    if value is None:
+        return ""
+    text = str(value).strip()
+    if text.lower() in EMPTY_VALUES:
+        return ""
+    if text[:1].isdigit() and any(c.isalpha() for c in text):
+        text = _MONTH_RE.sub(lambda m: f"{MONTHS[m.group(1).lower()]:02d}", text)
+    return text
+
+
+@lru_cache(maxsize=65536)
+def _strptime(text: str, fmt: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(text, fmt)
+    except ValueError:
+        return None
+
+
+def _swap_day_month(fmt: str) -> str:
+    return fmt.replace("%d", "\0").replace("%m", "%d").replace("\0", "%m")
+
+
+def _is_dayfirst(fmt: str) -> bool:
+    return fmt.find("%d") < fmt.find("%m")
+
+
+@lru_cache(maxsize=65536)
+def parse_date(value: Any, dayfirst: bool = True) -> Optional[date]:
+    """
+    Una fecha suelta, en cualquiera de DATE_FORMATS (None si está vacía o no se puede leer).
+    Para columnas enteras usar parse_row_dates / parse_dates, que infieren el formato una vez.
+    """
+    text = _prepare(value)
+    if not text:
+        return None
+    for fmt in sorted(DATE_FORMATS, key=lambda f: _is_dayfirst(f) != dayfirst):
+        dt = _strptime(text, fmt)
+        if dt is not None:
+            return dt.date()
+    return None
+
+
+def to_date(dt: Optional[datetime]) -> Optional[date]:
+    """datetime -> date (None si no hay fecha)."""
+    return dt.date() if dt else None
+
+
+class DateParser:
+    """
+    Parser de una columna para el ETL fila a fila, donde no hay columna entera para mirar:
+    formatos fijos (los que produce la etapa anterior) y memo por valor.
+    """
+
+    def __init__(self, formats: Iterable[str]):
+        self.formats = list(formats)
+        self._memo: Dict[str, Optional[datetime]] = {}
+
+    def parse(self, value: Any) -> Optional[datetime]:
+        text = _prepare(value)
+        if text in self._memo:
+            return self._memo[text]
+        dt = None
+        if text:
+            for fmt in self.formats:
+                dt = _strptime(text, fmt)
+                if dt is not None:
+                    break
+        self._memo[text] = dt
+        return dt
+
+
+# =========================================================
+# Por columna
+# =========================================================
+def _distinct(values: Iterable[Any]) -> List[str]:
+    seen: Dict[str, None] = {}
+    for value in values:
+        text = _prepare(value)
+        if text:
+            seen.setdefault(text, None)
+    return list(seen)
+
+
+def infer_date_format(values: Iterable[Any], formats: Optional[List[str]] = None,
+                      dayfirst: Optional[bool] = None, sample_size: int = SAMPLE_SIZE) -> DateFormat:
+    """
+    Formato(s) de una columna a partir de una muestra de sus valores distintos.
+    dayfirst resuelve las columnas ambiguas (None = primer formato de la lista, con aviso).
+    """
+    formats = formats or DATE_FORMATS
+    remaining = _distinct(values)[:sample_size]
+    chosen: List[str] = []
+    ambiguous = False
+    while remaining:
+        counts = {
+            fmt: sum(1 for v in remaining if _strptime(v, fmt) is not None)
+            for fmt in formats if fmt not in chosen
+        }
+        best = max(counts.values(), default=0)
+        if best == 0:
+            break
+        ties = [fmt for fmt, n in counts.items() if n == best]
+        fmt = ties[0]
+        swapped = _swap_day_month(fmt)
+        if swapped != fmt and swapped in ties:
+            ambiguous = True
+            if dayfirst is not None and _is_dayfirst(fmt) != dayfirst:
+                fmt = swapped
+        chosen.append(fmt)
+        remaining = [v for v in remaining if _strptime(v, fmt) is None]
+    return DateFormat(chosen, ambiguous)
+
+
+def _parse_distinct(distinct: List[str], formats: List[str]) -> Dict[str, Optional[datetime]]:
+    """{valor: datetime} para cada valor distinto; con pandas, un to_datetime por formato."""
+    parsed: Dict[str, Optional[datetime]] = dict.fromkeys(distinct)
+    pending = list(distinct)
+    for fmt in formats:
+        if not pending:
+            break
+        if HAS_PANDAS:
+            converted = pd.to_datetime(pd.Series(pending, dtype="object"), format=fmt, errors="coerce")
+            hits = {v: ts.to_pydatetime() for v, ts in zip(pending, converted) if not pd.isna(ts)}
+        else:
+            hits = {v: dt for v in pending for dt in [_strptime(v, fmt)] if dt is not None}
+        parsed.update(hits)
+        pending = [v for v in pending if v not in hits]
+    return parsed
+
+
+def _warn(column: str, source: str, result: ParsedDates, dayfirst: Optional[bool]) -> None:
+    where = f"{source} " if source else ""
+    if result.ambiguous and dayfirst is None:
+        print(f"   ⚠️  {where}'{column}': día/mes ambiguo (ningún valor tiene día > 12), "
+              f"se usa {result.formats[0]}")
+    if result.invalid:
+        examples = ", ".join(repr(v) for v in result.invalid[:MAX_INVALID_EXAMPLES])
+        print(f"   ⚠️  {where}'{column}': {len(result.invalid)} fechas no reconocidas (ej: {examples})")
+
+
+def parse_date_values(values: List[Any], formats: Optional[List[str]] = None,
+                      dayfirst: Optional[bool] = None) -> ParsedDates:
+    """Columna (lista) -> ParsedDates con una lista de datetime/None alineada con values."""
+    fmt = infer_date_format(values, formats, dayfirst)
+    distinct = _distinct(values)
+    parsed = _parse_distinct(distinct, fmt.formats)
+    texts = [_prepare(v) for v in values]
+    invalid = [t for t in texts if t and parsed.get(t) is None]
+    return ParsedDates([parsed.get(t) if t else None for t in texts], fmt.formats, fmt.ambiguous, invalid)
+
+
+def parse_dates(s: "pd.Series", formats: Optional[List[str]] = None,
+                dayfirst: Optional[bool] = None, name: str = "", source: str = "") -> ParsedDates:
+    """Columna de pandas -> ParsedDates con values como Series datetime64 (NaT si no parsea)."""
+    result = parse_date_values(list(s), formats, dayfirst)
+    values = pd.to_datetime(pd.Series(result.values, index=s.index, dtype="object"))
+    result = result._replace(values=values)
+    _warn(name or str(s.name), source, result, dayfirst)
+    return result
+
+
+def parse_row_dates(rows: List[Dict[str, Any]], columns: Iterable[str], formats: Optional[List[str]] = None,
+                    dayfirst: Optional[bool] = None, source: str = "") -> Dict[str, List[Optional[datetime]]]:
+    """
+    Para los loaders con csv.DictReader: {columna: [datetime/None, ...]} alineado con rows,
+    con el formato inferido por columna y avisos de ambigüedad / no parseables.
+    """
+    result: Dict[str, List[Optional[datetime]]] = {}
+    for col in columns:
+        parsed = parse_date_values([row.get(col) for row in rows], formats, dayfirst)
+        _warn(col, source, parsed, dayfirst)
+        result[col] = parsed.values
+    return result
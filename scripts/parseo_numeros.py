@@ -0,0 +1,241 @@
+"""
+Parseo de números compartido por el ETL y los análisis.
+
+Las fuentes no usan el mismo formato:
+  - catálogo TU y CSV final de ventas -> argentino: "$1.234,56", "21,00%", "0,04368"
+  - stock ERP y precios CEG            -> US: "0.045087", "148.96", "278.602"
+Antes cada script tenía su propio parse_decimal (quitar "$"/"%" y pasar "," a "."), que
+rompía "1.234,56" (-> 0) y "25.40EUR" (-> 0) sin avisar.
+
+Reglas (iguales en la versión por columna y en la escalar):
+  - se ignoran espacios, "$", "€", "%" y códigos de moneda pegados ("25.40EUR", "USD 12")
+  - una celda es "ar" si solo se puede leer con coma decimal / punto de miles ("1.234,5",
+    "21,00", "1.234.567") y "us" si solo con punto decimal / coma de miles ("0.045087",
+    "1,234,567", "4.0")
+  - lo ambiguo (un solo separador seguido de exactamente 3 dígitos: "278.602", "1,050") se
+    resuelve con el formato de la columna: el que gana por mayoría entre sus celdas no
+    ambiguas. Sin mayoría (o en la escalar sin locale), ese separador se toma como decimal,
+    igual que hacían las copias de parse_decimal.
+  - lo que no se puede leer de ninguna forma queda NaN y se reporta (las copias viejas lo
+    convertían en 0 en silencio).
+"""
+
+import re
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+try:
+    import pandas as pd
+    HAS_PANDAS = True
+except ImportError:
+    HAS_PANDAS = False
+
+# =========================================================
+# HARDCODE
+# =========================================================
+MAX_INVALID_EXAMPLES = 5                # celdas de ejemplo en el aviso de no parseables
+
+AR = "ar"                               # coma decimal, punto de miles
+US = "us"                               # punto decimal, coma de miles
+
+_JUNK = r"[\s$€%]"
+_CURRENCY_CODE = r"^[A-Z]{2,3}(?=[-\d.,])|(?<=[\d.,])[A-Z]{2,3}$"   # USD 12, 25.40EUR, U$S 3
+_EXPONENT = r"(?:[eE][-+]?\d+)?"                                     # stock ERP: "1e-06"
+_AR_NUMBER = r"-?(?:(?:\d{1,3}(?:\.\d{3})+|\d+)(?:,\d+)?|,\d+)" + _EXPONENT
+_US_NUMBER = r"-?(?:(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?|\.\d+)" + _EXPONENT
+
+_JUNK_RE = re.compile(_JUNK)
+_CURRENCY_CODE_RE = re.compile(_CURRENCY_CODE)
+_AR_NUMBER_RE = re.compile(_AR_NUMBER)
+_US_NUMBER_RE = re.compile(_US_NUMBER)
+
+
+class ParsedColumn(NamedTuple):
+    values: "pd.Series"                 # float64 (o Decimal si as_decimal), NaN = vacío o no parseable
+    locale: Optional[str]               # AR / US detectado (None si la columna no lo define)
+    invalid: "pd.Series"                # celdas originales no vacías que no se pudieron leer
+
+
+# =========================================================
+# Escalar (ETL fila a fila y scripts sin pandas)
+# =========================================================
+def _clean_text(value: Any) -> str:
+    text = _JUNK_RE.sub("", str(value))
+    return _CURRENCY_CODE_RE.sub("", text)
+
+
+@lru_cache(maxsize=65536)
+def normalize_number(value: str, locale: Optional[str] = None) -> Optional[str]:
+    """Un string de número -> "1234.56" (None si está vacío o no se puede leer)."""
+    text = _clean_text(value)
+    is_ar = _AR_NUMBER_RE.fullmatch(text) is not None
+    is_us = _US_NUMBER_RE.fullmatch(text) is not None
+    if is_ar and is_us:
+        if locale is None:
+            is_us = "," not in text
+        else:
+            is_us = locale == US
+        is_ar = not is_us
+    if is_ar:
+        return text.replace(".", "").replace(",", ".")
+    if is_us:
+        return text.replace(",", "")
+    return None
+
+
+def parse_decimal(value: Any, locale: Optional[str] = None) -> Decimal:
+    """Convierte un string de número (cualquier formato) a Decimal; 0 si está vacío o no parsea."""
+    if value is None or value == "":
+        return Decimal("0")
+    normalized = normalize_number(str(value), locale)
+    return Decimal(normalized) if normalized is not None else Decimal("0")
+
+
+def parse_float(value: Any, locale: Optional[str] = None) -> float:
+    """Igual que parse_decimal pero a float (0.0 si está vacío o no parsea)."""
+    if value is None or value == "" or (HAS_PANDAS and pd.isna(value)):
+        return 0.0
+    normalized = normalize_number(str(value), locale)
+    return float(normalized) if normalized is not None else 0.0
+
+
+def detect_locale_values(values: Iterable[Any]) -> Optional[str]:
+    """Formato de una columna (lista de strings) por mayoría de celdas no ambiguas."""
+    votes_ar = votes_us = 0
+    for value in values:
+        if value is None or value == "":
+            continue
+        text = _clean_text(value)
+        is_ar = _AR_NUMBER_RE.fullmatch(text) is not None
+        is_us = _US_NUMBER_RE.fullmatch(text) is not None
+        if is_ar and not is_us:
+            votes_ar += 1
+        elif is_us and not is_ar:
+            votes_us += 1
+    if votes_ar > votes_us:
+        return AR
+    if votes_us > votes_ar:
+        return US
+    return None
+
+
+# =========================================================
+# Por columna (vectorizado con pandas)
+# =========================================================
+def _clean_series(s: "pd.Series") -> "pd.Series":
+    s = s.astype("string").str.replace(_JUNK, "", regex=True)
+    return s.str.replace(_CURRENCY_CODE, "", regex=True)
+
+
+def _locale_masks(clean: "pd.Series"):
+    is_ar = clean.str.fullmatch(_AR_NUMBER).fillna(False).astype(bool)
+    is_us = clean.str.fullmatch(_US_NUMBER).fillna(False).astype(bool)
+    return is_ar, is_us
+
+
+def _majority(is_ar: "pd.Series", is_us: "pd.Series") -> Optional[str]:
+    votes_ar = int((is_ar & ~is_us).sum())
+    votes_us = int((is_us & ~is_ar).sum())
+    if votes_ar > votes_us:
+        return AR
+    if votes_us > votes_ar:
+        return US
+    return None
+
+
+def detect_locale(s: "pd.Series") -> Optional[str]:
+    """Formato de la columna (AR / US) por mayoría de celdas no ambiguas; None si no se define."""
+    return _majority(*_locale_masks(_clean_series(s)))
+
+
+def _normalize(s: "pd.Series", locale: Optional[str]):
+    clean = _clean_series(s)
+    is_ar, is_us = _locale_masks(clean)
+    if locale is None:
+        locale = _majority(is_ar, is_us)
+
+    ambiguous = is_ar & is_us
+    if locale is None:
+        prefer_ar = clean.str.contains(",", regex=False).fillna(False).astype(bool)
+    else:
+        prefer_ar = pd.Series(locale == AR, index=clean.index)
+    use_ar = (is_ar & ~is_us) | (ambiguous & prefer_ar)
+    use_us = (is_us & ~is_ar) | (ambiguous & ~prefer_ar)
+
+    as_ar = clean.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    as_us = clean.str.replace(",", "", regex=False)
+    return as_ar.where(use_ar, as_us.where(use_us)), locale
+
+
+def normalize_numbers(s: "pd.Series", locale: Optional[str] = None) -> "pd.Series":
+    """
+    Columna de strings de número -> "1234.56" (NA si está vacío o no se puede leer).
+    Sin locale se detecta en la columna; las celdas no ambiguas usan siempre su propio formato.
+    """
+    return _normalize(s, locale)[0]
+
+
+def parse_numbers(s: "pd.Series", locale: Optional[str] = None, as_decimal: bool = False) -> ParsedColumn:
+    """
+    Columna de strings -> ParsedColumn(values, locale, invalid).
+    values es float64 (o Decimal con as_decimal=True, para los cálculos que siguen en Decimal);
+    vacíos y no parseables quedan NaN y los no parseables se listan en invalid.
+    """
+    if not isinstance(s, pd.Series):
+        s = pd.Series(list(s), dtype="object")
+    normalized, locale = _normalize(s, locale)
+
+    text = s.astype("string").str.strip()
+    invalid = s[text.ne("").fillna(False).astype(bool) & normalized.isna()]
+
+    if as_decimal:
+        values = normalized.astype("object").map(lambda v: Decimal(v) if isinstance(v, str) else float("nan"))
+    else:
+        values = pd.to_numeric(normalized, errors="coerce").astype("float64")
+    return ParsedColumn(values, locale, invalid)
+
+
+def warn_invalid(column: str, parsed: ParsedColumn, source: str = "") -> None:
+    """Avisa (una línea) cuántas celdas de la columna no se pudieron leer como número."""
+    if parsed.invalid.empty:
+        return
+    examples = ", ".join(repr(str(v)) for v in parsed.invalid.head(MAX_INVALID_EXAMPLES))
+    where = f"{source} " if source else ""
+    print(f"   ⚠️  {where}'{column}': {len(parsed.invalid)} celdas no numéricas (ej: {examples})")
+
+
+def parse_frame_numbers(df: "pd.DataFrame", columns: Iterable[str], fill: float = 0.0,
+                        locale: Optional[str] = None, source: str = "") -> "pd.DataFrame":
+    """Pasa a float64 las columnas indicadas (las que existan), con fill en vacíos/no parseables."""
+    for col in columns:
+        if col not in df.columns:
+            continue
+        parsed = parse_numbers(df[col], locale)
+        warn_invalid(col, parsed, source)
+        df[col] = parsed.values.fillna(fill)
+    return df
+
+
+# =========================================================
+# Loaders con csv.DictReader
+# =========================================================
+def parse_row_columns(rows: List[Dict[str, Any]], columns: Iterable[str],
+                      locale: Optional[str] = None, source: str = "") -> Dict[str, List[Decimal]]:
+    """
+    Para los loaders que leen con csv.DictReader: parsea columnas enteras de rows (con el
+    formato detectado por columna) y devuelve {columna: [Decimal, ...]} alineado con rows.
+    Vacíos y no parseables -> Decimal("0"), como las copias de parse_decimal; los no
+    parseables se avisan. Sin pandas aplica las mismas reglas celda a celda (sin aviso).
+    """
+    result: Dict[str, List[Decimal]] = {}
+    for col in columns:
+        raw = [row.get(col) or "" for row in rows]
+        if HAS_PANDAS:
+            parsed = parse_numbers(pd.Series(raw, dtype="object"), locale, as_decimal=True)
+            warn_invalid(col, parsed, source)
+            result[col] = [v if isinstance(v, Decimal) else Decimal("0") for v in parsed.values]
+        else:
+            col_locale = locale or detect_locale_values(raw)
+            result[col] = [parse_decimal(v, col_locale) for v in raw]
+    return result
@@ -0,0 +1,359 @@
+"""
+Runner del pipeline: corre solo las etapas desactualizadas.
+
+Cada etapa declara su script, los archivos que lee y los que genera. Con eso se arma el DAG
+(una etapa depende de la que genera alguno de sus inputs). Antes de correr una etapa se calcula
+su huella: sha256 de su código (el script y los módulos locales que importa) y de cada input.
+Las etapas que usan la fecha de hoy suman la fecha de corrida a la huella. Si la huella es la
+misma que la de la última corrida OK y los outputs siguen ahí sin tocar, la etapa se saltea.
+Las etapas independientes corren en paralelo, cada una en su propio proceso.
+
+El export desde Magento (export_ventas_tradeunity.py) no es parte del DAG: depende de la API y
+se corre a mano. Sus CSV (enriched/RAW) son inputs de la etapa etl_ventas.
+
+Uso: python scripts/pipeline_runner.py   (desde la raíz del repo o desde cualquier lado)
+"""
+
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(ROOT, "scripts")
+
+# =========================================================
+# HARDCODE
+# =========================================================
+STATE_JSON = "pipeline_state.json"          # huellas de la última corrida OK de cada etapa
+LOG_DIR = "pipeline_logs"                   # stdout/stderr de cada etapa
+MAX_PARALLEL = 4                            # etapas corriendo a la vez
+TARGETS: List[str] = []                     # [] = todas; si no, esas etapas y sus dependencias
+FORCE: List[str] = []                       # etapas a correr aunque estén al día
+DRY_RUN = False                             # True = solo mostrar qué correría
+
+VENTAS = "inputs/ventas_historicas_items.csv"
+VENTAS_PARQUET = "inputs/ventas_historicas_items.parquet"
+CATALOGO_TU = "fuentes/catalogo_trade_unity.csv"
+STOCK_ERP = "fuentes/stock_erp.csv"
+CEG_PRODUCTOS = "fuentes/precios_plataforma_ceg.csv"
+CEG_PRODUCTOS_ALT = "precios_plataforma_ceg.csv"  # fallback de enriquecer_con_ceg (CEG_ALT_CSV)
+PUBLICACIONES = "fuentes/publicaciones_productos.csv"
+CALENDARIO = "fuentes/calendario_comercial_2026.csv"
+
+# script: se corre con el python actual, cwd = raíz del repo
+# inputs: archivos que lee; los que no existen entran a la huella como faltantes
+# requires_any: si ninguno existe la etapa se saltea (no hay de dónde partir)
+# outputs: archivos que genera
+# date_dependent: la etapa usa la fecha de hoy (días desde, recencia, aging): la huella incluye
+#   la fecha de corrida, así que al día siguiente vuelve a correr aunque nada haya cambiado
+STAGES: Dict[str, Dict[str, Any]] = {
+    "etl_ventas": {
+        "script": "etl_pipeline_ventas.py",
+        "inputs": ["ventas_historicas_items_enriched.csv", "ventas_historicas_items_raw.csv",
+                   CEG_PRODUCTOS, CEG_PRODUCTOS_ALT, CATALOGO_TU],
+        "requires_any": ["ventas_historicas_items_enriched.csv", "ventas_historicas_items_raw.csv"],
+        "outputs": [VENTAS, VENTAS_PARQUET],
+        "date_dependent": True,
+    },
+    "inventario": {
+        "script": "analisis_inventario.py",
+        "inputs": [CATALOGO_TU, STOCK_ERP, CEG_PRODUCTOS],
+        "outputs": ["outputs/TradeUnity Inventory Deep Dive.xlsx"],
+        "date_dependent": True,
+    },
+    "eventos_comerciales": {
+        "script": "sugerencias_productos_eventos_comerciales.py",
+        "inputs": [CALENDARIO, VENTAS, VENTAS_PARQUET, STOCK_ERP, CATALOGO_TU, CEG_PRODUCTOS],
+        "outputs": ["outputs/TradeUnity Commercial Calendar 2026.xlsx"],
+        "date_dependent": True,
+    },
+    "mega_excel": {
+        "script": "generar_mega_excel_completo_final.py",
+        "inputs": [VENTAS, VENTAS_PARQUET, STOCK_ERP, CATALOGO_TU],
+        "outputs": ["outputs/TradeUnity Sales Inventory Analysis.xlsx"],
+        "date_dependent": True,
+    },
+    "pricing": {
+        "script": "analisis_inteligencia_comercial_publicaciones.py",
+        "inputs": [PUBLICACIONES, CEG_PRODUCTOS, VENTAS, VENTAS_PARQUET, STOCK_ERP, CATALOGO_TU],
+        "outputs": ["outputs/TradeUnity Pricing Intelligence.xlsx"],
+    },
+    "clientes": {
+        "script": "analisis_clientes_completo.py",
+        "inputs": [VENTAS, VENTAS_PARQUET],
+        "outputs": ["outputs/TradeUnity Customer Intelligence.xlsx"],
+        "date_dependent": True,
+    },
+    "sniper": {
+        "script": "oportunidades_comerciales_sniper.py",
+        "inputs": [VENTAS, VENTAS_PARQUET, STOCK_ERP, CATALOGO_TU, PUBLICACIONES],
+        "outputs": ["outputs/TradeUnity_Sniper_Commercial_Opportunities.xlsx"],
+        "date_dependent": True,
+    },
+    "informe_html": {
+        "script": "convertir_md_a_html.py",
+        "inputs": ["outputs/TradeUnity Executive Report.md"],
+        "outputs": ["outputs/TradeUnity Executive Report.html"],
+    },
+}
+
+
+# =========================================================
+# Hashing
+# =========================================================
+class FileHasher:
+    """sha256 de archivos con cache por (tamaño, mtime): un archivo sin tocar no se vuelve a leer."""
+
+    def __init__(self, cache: Optional[Dict[str, list]] = None):
+        self.cache: Dict[str, list] = dict(cache or {})
+
+    def hash(self, path: str) -> Optional[str]:
+        full = os.path.join(ROOT, path)
+        try:
+            st = os.stat(full)
+        except FileNotFoundError:
+            return None
+        cached = self.cache.get(path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.sha256()
+        with open(full, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self.cache[path] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+
+def local_imports(script: str, seen: Optional[set] = None) -> List[str]:
+    """El script y los módulos de scripts/ que importa (recursivo), como paths relativos a la raíz."""
+    seen = set() if seen is None else seen
+    path = f"scripts/{script}"
+    if path in seen:
+        return []
+    seen.add(path)
+    with open(os.path.join(ROOT, path), "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            module = name.split(".")[0]
+            if os.path.exists(os.path.join(SCRIPTS_DIR, f"{module}.py")):
+                local_imports(f"{module}.py", seen)
+    return sorted(seen)
+
+
+def stage_fingerprint(name: str, hasher: FileHasher) -> str:
+    """Huella de la etapa: código + inputs (+ fecha de hoy si date_dependent). Cambia si cambia cualquiera."""
+    spec = STAGES[name]
+    payload = {
+        "code": {p: hasher.hash(p) for p in local_imports(spec["script"])},
+        "inputs": {p: hasher.hash(p) for p in spec["inputs"]},
+    }
+    if spec.get("date_dependent"):
+        payload["date"] = date.today().isoformat()
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# =========================================================
+# DAG
+# =========================================================
+def build_deps() -> Dict[str, List[str]]:
+    """Dependencias de cada etapa: las etapas que generan alguno de sus inputs."""
+    producers = {}
+    for name, spec in STAGES.items():
+        for out in spec["outputs"]:
+            if out in producers:
+                raise SystemExit(f"❌ {out} lo generan {producers[out]} y {name}")
+            producers[out] = name
+    deps = {
+        name: sorted({producers[p] for p in spec["inputs"] if p in producers and producers[p] != name})
+        for name, spec in STAGES.items()
+    }
+    # Detectar ciclos (DFS)
+    state: Dict[str, int] = {}
+
+    def visit(n: str, path: List[str]):
+        if state.get(n) == 1:
+            raise SystemExit(f"❌ Ciclo en el pipeline: {' → '.join(path + [n])}")
+        if state.get(n) == 2:
+            return
+        state[n] = 1
+        for d in deps[n]:
+            visit(d, path + [n])
+        state[n] = 2
+
+    for n in STAGES:
+        visit(n, [])
+    return deps
+
+
+def select_stages(deps: Dict[str, List[str]], targets: List[str]) -> List[str]:
+    """Las etapas pedidas más todas sus dependencias (todas si targets está vacío)."""
+    unknown = [t for t in targets if t not in STAGES]
+    if unknown:
+        raise SystemExit(f"❌ Etapas desconocidas: {', '.join(unknown)}")
+    if not targets:
+        return list(STAGES)
+    selected: set = set()
+    stack = list(targets)
+    while stack:
+        n = stack.pop()
+        if n not in selected:
+            selected.add(n)
+            stack.extend(deps[n])
+    return [n for n in STAGES if n in selected]
+
+
+# =========================================================
+# Estado
+# =========================================================
+def load_state() -> Dict[str, Any]:
+    try:
+        with open(os.path.join(ROOT, STATE_JSON), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"stages": {}, "files": {}}
+    state.setdefault("stages", {})
+    state.setdefault("files", {})
+    return state
+
+
+def save_state(state: Dict[str, Any]):
+    path = os.path.join(ROOT, STATE_JSON)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def up_to_date(name: str, fingerprint: str, state: Dict[str, Any], hasher: FileHasher) -> bool:
+    """Al día = misma huella que la última corrida OK y outputs presentes y sin tocar desde entonces."""
+    prev = state["stages"].get(name)
+    if not prev or prev.get("fingerprint") != fingerprint:
+        return False
+    for out in STAGES[name]["outputs"]:
+        digest = hasher.hash(out)
+        if digest is None or digest != prev.get("outputs", {}).get(out):
+            return False
+    return True
+
+
+# =========================================================
+# Ejecución
+# =========================================================
+def run_stage(name: str) -> Dict[str, Any]:
+    """Corre el script de la etapa en un proceso aparte; stdout/stderr van a LOG_DIR/<etapa>.log."""
+    spec = STAGES[name]
+    os.makedirs(os.path.join(ROOT, LOG_DIR), exist_ok=True)
+    log_path = os.path.join(ROOT, LOG_DIR, f"{name}.log")
+    t0 = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.run(
+            [sys.executable, os.path.join(SCRIPTS_DIR, spec["script"])],
+            cwd=ROOT, stdout=log, stderr=subprocess.STDOUT,
+            env=dict(os.environ, PYTHONIOENCODING="utf-8"),
+        )
+    return {"returncode": proc.returncode, "elapsed": time.perf_counter() - t0, "log": log_path}
+
+
+def run_pipeline(targets: List[str] = TARGETS, force: List[str] = FORCE, dry_run: bool = DRY_RUN) -> Dict[str, str]:
+    """
+    Recorre el DAG: una etapa se evalúa cuando terminaron sus dependencias (así su huella ve los
+    outputs nuevos). Las desactualizadas se lanzan en paralelo; si una falla, las que dependen de
+    ella no corren. Devuelve el resultado de cada etapa.
+    """
+    deps = build_deps()
+    selected = select_stages(deps, targets)
+    state = load_state()
+    hasher = FileHasher(state["files"])
+    results: Dict[str, str] = {}
+    pending = list(selected)
+    running = {}
+
+    print(f"🧭 Pipeline: {len(selected)} etapas, hasta {MAX_PARALLEL} en paralelo")
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL) as ex:
+        while pending or running:
+            for name in list(pending):
+                if len(running) >= MAX_PARALLEL:
+                    break
+                stage_deps = [d for d in deps[name] if d in selected]
+                if any(d not in results for d in stage_deps):
+                    continue
+                pending.remove(name)
+                if any(results[d] in ("falló", "bloqueada") for d in stage_deps):
+                    results[name] = "bloqueada"
+                    print(f"   ⛔ {name}: bloqueada (falló una dependencia)")
+                    continue
+                requires_any = STAGES[name].get("requires_any")
+                if requires_any and all(hasher.hash(p) is None for p in requires_any):
+                    results[name] = "sin inputs"
+                    print(f"   ⚠️  {name}: no existe ninguno de {', '.join(requires_any)}, se saltea")
+                    continue
+                fingerprint = stage_fingerprint(name, hasher)
+                upstream_changed = any(results[d] == "correría" for d in stage_deps)
+                if name not in force and not upstream_changed and up_to_date(name, fingerprint, state, hasher):
+                    results[name] = "al día"
+                    print(f"   ✅ {name}: al día")
+                    continue
+                if dry_run:
+                    # Sin correr no hay outputs nuevos: lo que depende de esta etapa también correría
+                    results[name] = "correría"
+                    print(f"   🔸 {name}: correría")
+                    continue
+                print(f"   ▶ {name}: corriendo {STAGES[name]['script']}...", flush=True)
+                running[ex.submit(run_stage, name)] = (name, fingerprint)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name, fingerprint = running.pop(fut)
+                res = fut.result()
+                if res["returncode"] != 0:
+                    results[name] = "falló"
+                    print(f"   ❌ {name}: falló (exit {res['returncode']}, {res['elapsed']:.1f}s) → {res['log']}")
+                    continue
+                results[name] = "corrió"
+                state["stages"][name] = {
+                    "fingerprint": fingerprint,
+                    "outputs": {out: hasher.hash(out) for out in STAGES[name]["outputs"]},
+                    "finished_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "elapsed_s": round(res["elapsed"], 2),
+                }
+                state["files"] = hasher.cache
+                save_state(state)
+                print(f"   ✔️  {name}: OK ({res['elapsed']:.1f}s)")
+
+    if not dry_run:
+        state["files"] = hasher.cache
+        save_state(state)
+    return results
+
+
+def main():
+    t0 = time.perf_counter()
+    results = run_pipeline()
+
+    print(f"\n📊 Resumen ({time.perf_counter() - t0:.1f}s):")
+    for name in STAGES:
+        if name in results:
+            print(f"   {name:<22} {results[name]}")
+    if any(r in ("falló", "bloqueada") for r in results.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,27 +6,15 @@ Script para:
 """
 
 import csv
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal
+
+from parseo_numeros import parse_decimal
 
 # Archivos
 INPUT_CSV = "ventas_historicas_items.csv"
 OUTPUT_CSV = "ventas_historicas_items.csv"
 
 
-def parse_decimal(value: str) -> Decimal:
-    """Convierte string con formato europeo (coma decimal) a Decimal."""
-    if not value or value == "":
-        return Decimal("0")
-    
-    value_str = str(value).strip().replace("$", "").replace(" ", "")
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return Decimal(value_str)
-    except (InvalidOperation, ValueError):
-        return Decimal("0")
-
-
 def format_decimal(value: Decimal, decimals: int = 4) -> str:
     """Formatea Decimal a string con formato europeo (coma decimal)."""
     if value == 0:
@@ -49,6 +37,142 @@ def format_percent(value: Decimal) -> str:
     return f"{value}%".replace(".", ",")
 
 
+# Columnas de márgenes (se agregan si no existen)
+MARGIN_COLUMNS = [
+    "Margen sobre FOB",
+    "% Margen sobre FOB",
+    "Margen sobre Plataforma",
+    "% Margen sobre Plataforma",
+]
+
+# Orden lógico de columnas
+LOGICAL_ORDER = [
+    # 1. INFORMACIÓN DE ORDEN
+    "Número de Orden",
+    "Fecha Creación",
+    "Fecha Actualización",
+    "Estado",
+    
+    # 2. INFORMACIÓN DE CLIENTE
+    "Email Cliente",
+    "Nombre Cliente",
+    "Apellido Cliente",
+    "CUIT Cliente",
+    
+    # 3. INFORMACIÓN DE PRODUCTO
+    "SKU",
+    "Nombre Producto",
+    "Cantidad",
+    "Cantidad por Paquete Comercial",
+    "Tipo Producto",
+    "Categoría CEG",
+    "Brand Name CEG",
+    "Tipo de Marca",
+    "Código CEG",
+    "EAN",
+    
+    # 4. PRECIOS POR CAJA (Magento)
+    "Precio Original",
+    "Precio Venta",
+    "Precio con IVA",
+    
+    # 5. PRECIOS UNITARIOS (Calculados)
+    "Precio Original Unitario",
+    "Precio Venta Unitario",
+    "Precio con IVA Unitario",
+    
+    # 6. COSTOS
+    "FOB CEG",
+    "Base Price CEG",
+    
+    # 7. MÁRGENES (Nuevos cálculos)
+    "Margen sobre FOB",
+    "% Margen sobre FOB",
+    "Margen sobre Plataforma",
+    "% Margen sobre Plataforma",
+    
+    # 8. DESCUENTOS Y TOTALES
+    "Descuento Item",
+    "Descuento % Item",
+    "Total Item",
+    "Total Item con IVA",
+    "IVA % Item",
+    "Impuesto Item",
+    
+    # 9. TOTALES DE ORDEN
+    "Total Orden",
+    "Subtotal Orden",
+    "Descuento Orden",
+    "Envío",
+    "Impuesto Orden",
+    
+    # 10. INFORMACIÓN ADICIONAL
+    "Moneda Orden",
+    "Tasa Cambio",
+    "Volumen (box)",
+    "Fecha Creación Magento",
+    "Fecha Última Recepción CEG",
+    "Última Importación",
+    
+    # 11. CAMPOS TÉCNICOS (al final)
+    "ID Item",
+    "ID Item Padre",
+    "Categorías IDs",
+    "Categorías",
+    "Marca",
+]
+
+
+def reorder_headers(headers: list) -> list:
+    """Agrega las columnas de márgenes y devuelve el orden final: el lógico + las que falten (alfabético)."""
+    headers = list(headers)
+    for col in MARGIN_COLUMNS:
+        if col not in headers:
+            headers.append(col)
+    
+    # Agregar columnas que no estén en el orden lógico
+    all_columns = set(headers)
+    ordered_columns = set(LOGICAL_ORDER)
+    missing_columns = sorted(list(all_columns - ordered_columns))
+    
+    # Orden final: las ordenadas + las que faltan
+    return [col for col in LOGICAL_ORDER if col in headers] + missing_columns
+
+
+def calculate_row(row: dict) -> bool:
+    """Márgenes sobre FOB y sobre Plataforma. True si se calculó el margen sobre FOB."""
+    # Obtener valores necesarios
+    precio_venta_unit = parse_decimal(row.get("Precio Venta Unitario", ""))
+    fob_ceg = parse_decimal(row.get("FOB CEG", ""))
+    base_price_ceg = parse_decimal(row.get("Base Price CEG", ""))
+    
+    # Calcular margen sobre FOB
+    if precio_venta_unit > 0 and fob_ceg > 0:
+        margen_fob = precio_venta_unit - fob_ceg
+        pct_margen_fob = (margen_fob / fob_ceg) * 100 if fob_ceg > 0 else Decimal("0")
+    
+        row["Margen sobre FOB"] = format_decimal(margen_fob, 4)
+        row["% Margen sobre FOB"] = format_percent(pct_margen_fob)
+        calculated = True
+    else:
+        row["Margen sobre FOB"] = ""
+        row["% Margen sobre FOB"] = ""
+        calculated = False
+    
+    # Calcular margen sobre Plataforma (Base Price CEG)
+    if precio_venta_unit > 0 and base_price_ceg > 0:
+        margen_plataforma = precio_venta_unit - base_price_ceg
+        pct_margen_plataforma = (margen_plataforma / base_price_ceg) * 100 if base_price_ceg > 0 else Decimal("0")
+    
+        row["Margen sobre Plataforma"] = format_decimal(margen_plataforma, 4)
+        row["% Margen sobre Plataforma"] = format_percent(pct_margen_plataforma)
+    else:
+        row["Margen sobre Plataforma"] = ""
+        row["% Margen sobre Plataforma"] = ""
+    
+    return calculated
+
+
 def reorder_and_calculate_margins():
     """Reordena columnas y calcula márgenes."""
     
@@ -64,101 +188,8 @@ def reorder_and_calculate_margins():
     
     print(f"   ✅ {len(rows)} filas leídas")
     
-    # Agregar columnas de márgenes a headers si no existen
-    margin_columns = [
-        "Margen sobre FOB",
-        "% Margen sobre FOB",
-        "Margen sobre Plataforma",
-        "% Margen sobre Plataforma",
-    ]
-    for col in margin_columns:
-        if col not in headers:
-            headers.append(col)
-    
-    # Definir orden lógico de columnas
-    logical_order = [
-        # 1. INFORMACIÓN DE ORDEN
-        "Número de Orden",
-        "Fecha Creación",
-        "Fecha Actualización",
-        "Estado",
-        
-        # 2. INFORMACIÓN DE CLIENTE
-        "Email Cliente",
-        "Nombre Cliente",
-        "Apellido Cliente",
-        "CUIT Cliente",
-        
-        # 3. INFORMACIÓN DE PRODUCTO
-        "SKU",
-        "Nombre Producto",
-        "Cantidad",
-        "Cantidad por Paquete Comercial",
-        "Tipo Producto",
-        "Categoría CEG",
-        "Brand Name CEG",
-        "Tipo de Marca",
-        "Código CEG",
-        "EAN",
-        
-        # 4. PRECIOS POR CAJA (Magento)
-        "Precio Original",
-        "Precio Venta",
-        "Precio con IVA",
-        
-        # 5. PRECIOS UNITARIOS (Calculados)
-        "Precio Original Unitario",
-        "Precio Venta Unitario",
-        "Precio con IVA Unitario",
-        
-        # 6. COSTOS
-        "FOB CEG",
-        "Base Price CEG",
-        
-        # 7. MÁRGENES (Nuevos cálculos)
-        "Margen sobre FOB",
-        "% Margen sobre FOB",
-        "Margen sobre Plataforma",
-        "% Margen sobre Plataforma",
-        
-        # 8. DESCUENTOS Y TOTALES
-        "Descuento Item",
-        "Descuento % Item",
-        "Total Item",
-        "Total Item con IVA",
-        "IVA % Item",
-        "Impuesto Item",
-        
-        # 9. TOTALES DE ORDEN
-        "Total Orden",
-        "Subtotal Orden",
-        "Descuento Orden",
-        "Envío",
-        "Impuesto Orden",
-        
-        # 10. INFORMACIÓN ADICIONAL
-        "Moneda Orden",
-        "Tasa Cambio",
-        "Volumen (box)",
-        "Fecha Creación Magento",
-        "Fecha Última Recepción CEG",
-        "Última Importación",
-        
-        # 11. CAMPOS TÉCNICOS (al final)
-        "ID Item",
-        "ID Item Padre",
-        "Categorías IDs",
-        "Categorías",
-        "Marca",
-    ]
-    
-    # Agregar columnas que no estén en el orden lógico
-    all_columns = set(headers)
-    ordered_columns = set(logical_order)
-    missing_columns = sorted(list(all_columns - ordered_columns))
-    
-    # Orden final: las ordenadas + las que faltan
-    final_order = [col for col in logical_order if col in headers] + missing_columns
+    # Agregar columnas de márgenes y reordenar
+    final_order = reorder_headers(headers)
     
     print(f"\n🔄 Calculando márgenes...")
     
@@ -166,34 +197,10 @@ def reorder_and_calculate_margins():
     skipped_count = 0
     
     for row in rows:
-        # Obtener valores necesarios
-        precio_venta_unit = parse_decimal(row.get("Precio Venta Unitario", ""))
-        fob_ceg = parse_decimal(row.get("FOB CEG", ""))
-        base_price_ceg = parse_decimal(row.get("Base Price CEG", ""))
-        
-        # Calcular margen sobre FOB
-        if precio_venta_unit > 0 and fob_ceg > 0:
-            margen_fob = precio_venta_unit - fob_ceg
-            pct_margen_fob = (margen_fob / fob_ceg) * 100 if fob_ceg > 0 else Decimal("0")
-            
-            row["Margen sobre FOB"] = format_decimal(margen_fob, 4)
-            row["% Margen sobre FOB"] = format_percent(pct_margen_fob)
+        if calculate_row(row):
             calculated_count += 1
         else:
-            row["Margen sobre FOB"] = ""
-            row["% Margen sobre FOB"] = ""
             skipped_count += 1
-        
-        # Calcular margen sobre Plataforma (Base Price CEG)
-        if precio_venta_unit > 0 and base_price_ceg > 0:
-            margen_plataforma = precio_venta_unit - base_price_ceg
-            pct_margen_plataforma = (margen_plataforma / base_price_ceg) * 100 if base_price_ceg > 0 else Decimal("0")
-            
-            row["Margen sobre Plataforma"] = format_decimal(margen_plataforma, 4)
-            row["% Margen sobre Plataforma"] = format_percent(pct_margen_plataforma)
-        else:
-            row["Margen sobre Plataforma"] = ""
-            row["% Margen sobre Plataforma"] = ""
     
     # Escribir CSV reordenado
     print(f"\n💾 Escribiendo CSV reordenado: {OUTPUT_CSV}")
@@ -19,11 +19,14 @@ Analiza:
 
 import csv
 import re
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal
 from datetime import datetime, date
 from collections import defaultdict
 import pandas as pd
 
+import ventas_tipadas
+from parseo_numeros import parse_row_columns
+
 # Archivos
 CALENDARIO_CSV = "fuentes/calendario_comercial_2026.csv"
 VENTAS_CSV = "inputs/ventas_historicas_items.csv"  # Fuente: ventas.xlsx hoja 01_Ventas
@@ -34,20 +37,6 @@ OUTPUT_DIR = "outputs"
 OUTPUT_EXCEL = f"{OUTPUT_DIR}/TradeUnity Commercial Calendar 2026.xlsx"
 
 
-def parse_decimal(value: str) -> Decimal:
-    """Convierte string a Decimal."""
-    if not value or value == "":
-        return Decimal("0")
-    
-    value_str = str(value).strip().replace("$", "").replace(" ", "").replace("%", "")
-    value_str = value_str.replace(",", ".")
-    
-    try:
-        return Decimal(value_str)
-    except (InvalidOperation, ValueError):
-        return Decimal("0")
-
-
 def load_calendario():
     """Carga calendario comercial y filtra eventos TU."""
     print("📖 Cargando calendario comercial...")
@@ -91,18 +80,15 @@ def load_ventas():
         print("   ✅ DataFrame vacío creado (sin datos de ventas históricas)")
         return df
     
-    df = pd.read_csv(VENTAS_CSV, encoding='utf-8-sig')
+    # Fechas y numéricos ya vienen tipados (ventas_tipadas); los vacíos cuentan como 0
+    df = ventas_tipadas.load_ventas(VENTAS_CSV)
     
-    # Convertir columnas numéricas
     numeric_cols = ['Cantidad Unitarias', 'Total Item con IVA', 'Precio Venta Unitario']
     for col in numeric_cols:
         if col in df.columns:
-            df[col] = df[col].astype(str).str.replace(',', '.').str.replace('$', '').str.strip()
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+            df[col] = df[col].fillna(0)
     
-    # Convertir fechas
     if 'Fecha Creación' in df.columns:
-        df['Fecha Creación'] = pd.to_datetime(df['Fecha Creación'], errors='coerce')
         df['Mes'] = df['Fecha Creación'].dt.month
         df['Año'] = df['Fecha Creación'].dt.year
     
@@ -117,18 +103,20 @@ def load_stock():
     stock_data = {}
     
     with open(STOCK_ERP, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            d365_ref = str(row.get('D365 Reference', '')).strip()
-            stock_cajas = parse_decimal(row.get('Pronosticado con pendiente', ''))
-            box_qty = parse_decimal(row.get('Box Qty', ''))
-            
-            if d365_ref and stock_cajas > 0:
-                stock_data[d365_ref] = {
-                    'stock_cajas': stock_cajas,
-                    'box_qty': box_qty,
-                    'stock_unidades': stock_cajas * box_qty,
-                }
+        rows = list(csv.DictReader(f))
+    numbers = parse_row_columns(rows, ['Pronosticado con pendiente', 'Box Qty'], source=STOCK_ERP)
+    
+    for i, row in enumerate(rows):
+        d365_ref = str(row.get('D365 Reference', '')).strip()
+        stock_cajas = numbers['Pronosticado con pendiente'][i]
+        box_qty = numbers['Box Qty'][i]
+        
+        if d365_ref and stock_cajas > 0:
+            stock_data[d365_ref] = {
+                'stock_cajas': stock_cajas,
+                'box_qty': box_qty,
+                'stock_unidades': stock_cajas * box_qty,
+            }
     
     print(f"   ✅ {len(stock_data)} productos con stock")
     return stock_data
@@ -185,18 +173,20 @@ def load_ceg_prices():
     ceg_prices = {}
     
     with open(CEG_PRODUCTOS_CSV, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            sku = str(row.get('sku', '')).strip().upper()
-            base_price = parse_decimal(row.get('base_price', ''))
-            fob = parse_decimal(row.get('fob', ''))
-            
-            if sku:
-                ceg_prices[sku] = {
-                    'base_price': base_price,
-                    'fob': fob,
-                    'precio_normal_tu': base_price * Decimal('1.25'),
-                }
+        rows = list(csv.DictReader(f))
+    numbers = parse_row_columns(rows, ['base_price', 'fob'], source=CEG_PRODUCTOS_CSV)
+    
+    for i, row in enumerate(rows):
+        sku = str(row.get('sku', '')).strip().upper()
+        base_price = numbers['base_price'][i]
+        fob = numbers['fob'][i]
+        
+        if sku:
+            ceg_prices[sku] = {
+                'base_price': base_price,
+                'fob': fob,
+                'precio_normal_tu': base_price * Decimal('1.25'),
+            }
     
     print(f"   ✅ {len(ceg_prices)} productos con precios")
     return ceg_prices
@@ -219,7 +209,7 @@ def analyze_purchase_patterns(ventas_df):
         }
     
     # Análisis por categoría
-    categoria_analysis = ventas_df.groupby('Categoría (2° Nivel)').agg({
+    categoria_analysis = ventas_df.groupby('Categoría (2° Nivel)', observed=True).agg({
         'SKU': 'nunique',
         'Total Item con IVA': 'sum',
         'Cantidad Unitarias': 'sum',
@@ -233,7 +223,7 @@ def analyze_purchase_patterns(ventas_df):
     ]
     
     # Análisis por marca
-    marca_analysis = ventas_df.groupby('Brand Name CEG').agg({
+    marca_analysis = ventas_df.groupby('Brand Name CEG', observed=True).agg({
         'SKU': 'nunique',
         'Total Item con IVA': 'sum',
         'Cantidad Unitarias': 'sum',
@@ -245,7 +235,7 @@ def analyze_purchase_patterns(ventas_df):
     ]
     
     # Top productos por facturación
-    top_productos = ventas_df.groupby('SKU').agg({
+    top_productos = ventas_df.groupby('SKU', observed=True).agg({
         'Nombre Producto': 'first',
         'Brand Name CEG': 'first',
         'Categoría (2° Nivel)': 'first',
@@ -648,14 +638,13 @@ def generate_commercial_suggestions():
 
 
 if __name__ == "__main__":
+    # pandas ya se importa arriba; openpyxl lo carga pandas recién al escribir el Excel
     try:
-        import pandas as pd
-        import openpyxl
+        import openpyxl  # noqa: F401
     except ImportError:
         print("Instalando dependencias...")
         import subprocess
-        subprocess.check_call(["pip3", "install", "pandas", "openpyxl", "--break-system-packages"])
-        import pandas as pd
+        subprocess.check_call(["pip3", "install", "openpyxl", "--break-system-packages"])
     
     generate_commercial_suggestions()
     print("\n✨ Proceso completado!")
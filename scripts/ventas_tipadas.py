@@ -0,0 +1,285 @@
+"""
+Formato intermedio tipado de ventas.
+
+El CSV final (inputs/ventas_historicas_items.csv) es para leer en Excel: montos con coma decimal,
+porcentajes con "%", fechas como texto. Cada análisis volvía a limpiar esos strings con
+str.replace + pd.to_numeric. Acá se tipa una sola vez, al final del ETL, y se guarda
+inputs/ventas_historicas_items.parquet:
+  - montos/cantidades decimales -> decimal128(38, 18)
+  - porcentajes                 -> decimal128 en puntos porcentuales ("12,5%" -> 12.5)
+  - enteros                     -> int64
+  - fechas                      -> date32 (datetime64[ms] en el DataFrame)
+  - strings repetidos por línea -> dictionary (cliente, SKU, producto, marca, categorías, estado, moneda)
+  - el resto                    -> string (Número de Orden conserva ceros a la izquierda)
+
+Los análisis cargan con load_ventas(): lee el Parquet si está al día con el CSV y, si no
+(o sin pyarrow), tipa el CSV en el momento con las mismas reglas. Los dos caminos dan el mismo
+DataFrame valor por valor: el decimal pasa a float64 vía string (el cast directo de pyarrow no
+redondea bien: 5.14 -> 5.140000000000001) y sin pyarrow se trunca a DECIMAL_SCALE igual que el
+cast a decimal128.
+
+En el DataFrame las columnas de CATEGORY_COLUMNS quedan como category de pandas: códigos enteros
+más un diccionario con los valores distintos, ordenado alfabéticamente para que el código de un
+valor no dependa del orden de las filas (y ordenar por la columna siga siendo orden alfabético).
+Los groupby por cliente/SKU/marca agrupan por esos códigos. Los enteros sin vacíos bajan a int32.
+Los montos siguen en float64: en float32 los totales de los informes cambiarían en los centavos.
+memory_footprint(df) muestra lo que ocupa cada columna (python scripts/ventas_tipadas.py).
+"""
+
+import os
+from decimal import ROUND_DOWN, Decimal
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+from parseo_numeros import normalize_numbers
+
+# =========================================================
+# HARDCODE
+# =========================================================
+VENTAS_CSV = "inputs/ventas_historicas_items.csv"
+VENTAS_PARQUET = "inputs/ventas_historicas_items.parquet"
+DECIMAL_PRECISION = 38
+DECIMAL_SCALE = 18                      # decimales guardados (el resto se trunca, hacia 0)
+DATE_UNIT = "datetime64[ms]"            # fechas en el DataFrame, por los dos caminos
+
+DECIMAL_COLUMNS = [
+    "Cantidad por Paquete Comercial",
+    "Precio Original", "Precio Venta", "Precio con IVA",
+    "Precio Original Unitario", "Precio Venta Unitario", "Precio con IVA Unitario",
+    "FOB CEG", "Base Price CEG",
+    "Margen sobre FOB", "Margen sobre Plataforma",
+    "Volumen (box)", "Volumen del Item",
+    "Descuento Item", "Total Item", "Total Item con IVA", "Impuesto Item",
+    "Total Orden", "Subtotal Orden", "Descuento Orden", "Envío", "Impuesto Orden",
+    "Tasa Cambio",
+]
+PERCENT_COLUMNS = [
+    "% Margen sobre FOB", "% Margen sobre Plataforma",
+    "Descuento % Item", "IVA % Item",
+]
+INT_COLUMNS = [
+    "Cantidad", "Cantidad Unitarias",
+    "Días desde Última Recepción CEG", "Días desde Última Importación",
+    "ID Orden", "ID Item", "ID Item Padre",
+]
+DATE_COLUMNS = [
+    "Fecha Creación", "Fecha Actualización",
+    "Fecha Última Recepción CEG", "Última Importación", "Fecha Creación Magento",
+]
+CATEGORY_COLUMNS = [
+    "Estado", "Moneda Orden", "Moneda Base", "Tipo Producto",
+    "Email Cliente", "Nombre Cliente", "Apellido Cliente", "CUIT Cliente",
+    "SKU", "Código CEG", "EAN", "Nombre Producto",
+    "Categoría (2° Nivel)", "Categoría CEG", "Brand Name CEG", "Tipo de Marca",
+]
+INT_DOWNCAST = "int32"                  # enteros sin vacíos (IDs de Magento y cantidades entran)
+
+
+# =========================================================
+# Parseo (vectorizado; los números con parseo_numeros.normalize_numbers)
+# =========================================================
+def normalize_dates(s: pd.Series) -> pd.Series:
+    """Fechas YYYY-MM-DD (con o sin hora) -> datetime64; lo que no parsea queda NaT."""
+    return pd.to_datetime(s.astype("string").str.slice(0, 10), format="%Y-%m-%d", errors="coerce")
+
+
+def truncate_decimals(s: pd.Series) -> pd.Series:
+    """
+    Números normalizados ("1234.56") truncados a DECIMAL_SCALE decimales hacia 0, como el cast
+    a decimal128 con safe=False. Solo pasan por Decimal los que tienen más decimales o exponente.
+    """
+    s = s.astype("string")
+    long = s.str.contains(r"\.\d{%d}\d|[eE]" % DECIMAL_SCALE, regex=True).fillna(False).astype(bool)
+    if not long.any():
+        return s
+    quantum = Decimal(1).scaleb(-DECIMAL_SCALE)
+    s = s.copy()
+    s[long] = [str(Decimal(v).quantize(quantum, rounding=ROUND_DOWN)) for v in s[long]]
+    return s
+
+
+def to_float(s: pd.Series) -> pd.Series:
+    """
+    Números normalizados -> float64 correctamente redondeado (float() de Python, vía numpy).
+    pd.to_numeric no lo es con muchos dígitos: "-0.088888888888888888" -> -0.0888888888888888.
+    """
+    return pd.Series(s.to_numpy(dtype=object, na_value=np.nan).astype("float64"), index=s.index)
+
+
+def read_ventas_csv(csv_path: str = VENTAS_CSV) -> pd.DataFrame:
+    """El CSV final como strings (vacíos = NA), sin inferencia de tipos de pandas."""
+    return pd.read_csv(csv_path, encoding="utf-8-sig", dtype=str)
+
+
+# =========================================================
+# Tipado
+# =========================================================
+def to_arrow(df: pd.DataFrame) -> "pa.Table":
+    """DataFrame de strings -> tabla Arrow tipada (decimal, int, date, dictionary, string)."""
+    decimal_type = pa.decimal128(DECIMAL_PRECISION, DECIMAL_SCALE)
+    arrays: Dict[str, "pa.Array"] = {}
+    for col in df.columns:
+        s = df[col]
+        if col in DECIMAL_COLUMNS or col in PERCENT_COLUMNS:
+            arr = pa.array(normalize_numbers(s), type=pa.string(), from_pandas=True)
+            arrays[col] = pc.cast(arr, decimal_type, safe=False)
+        elif col in INT_COLUMNS:
+            arr = pa.array(normalize_numbers(s), type=pa.string(), from_pandas=True)
+            arrays[col] = pc.cast(pc.cast(arr, decimal_type, safe=False), pa.int64(), safe=False)
+        elif col in DATE_COLUMNS:
+            arrays[col] = pa.array(normalize_dates(s), from_pandas=True).cast(pa.date32())
+        elif col in CATEGORY_COLUMNS:
+            arrays[col] = pa.array(s.astype("string"), type=pa.string(), from_pandas=True).dictionary_encode()
+        else:
+            arrays[col] = pa.array(s.astype("string"), type=pa.string(), from_pandas=True)
+    return pa.table(arrays)
+
+
+def encode_categories(s: pd.Series) -> pd.Series:
+    """Strings -> category con el diccionario ordenado (códigos estables entre corridas)."""
+    values = s.astype("string")
+    categories = sorted(values.dropna().unique())
+    return values.astype(pd.CategoricalDtype(categories=categories))
+
+
+def downcast_int(s: pd.Series) -> pd.Series:
+    """int64 -> INT_DOWNCAST si todos los valores entran (con vacíos la columna ya es float64)."""
+    if not pd.api.types.is_integer_dtype(s) or s.empty:
+        return s
+    info = np.iinfo(INT_DOWNCAST)
+    if info.min <= s.min() and s.max() <= info.max:
+        return s.astype(INT_DOWNCAST)
+    return s
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Categóricos para CATEGORY_COLUMNS, enteros achicados y fechas en DATE_UNIT (común a
+    frame_from_arrow / _strings: pandas elige unidades distintas según de dónde venga la fecha).
+    """
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS:
+            df[col] = encode_categories(df[col])
+        elif col in INT_COLUMNS:
+            df[col] = downcast_int(df[col])
+        elif col in DATE_COLUMNS:
+            df[col] = df[col].astype(DATE_UNIT)
+    return df
+
+
+def frame_from_arrow(table: "pa.Table") -> pd.DataFrame:
+    """
+    Tabla tipada -> DataFrame para los análisis: decimales como float64, enteros como int32
+    (float64 si hay vacíos), fechas como datetime64 y los strings repetidos como category.
+    """
+    columns = {}
+    for name, col in zip(table.column_names, table.columns):
+        if pa.types.is_decimal(col.type):
+            # vía string: decimal128 -> float64 directo no es correctamente redondeado
+            col = pc.cast(pc.cast(col, pa.string()), pa.float64())
+        elif pa.types.is_dictionary(col.type):
+            col = pc.cast(col, pa.string())
+        elif pa.types.is_date(col.type):
+            col = pc.cast(col, pa.timestamp("ms"))
+        columns[name] = col
+    return compact_frame(pa.table(columns).to_pandas())
+
+
+def frame_from_strings(df: pd.DataFrame) -> pd.DataFrame:
+    """Mismo tipado que to_arrow + frame_from_arrow, solo con pandas (cuando no hay pyarrow)."""
+    df = df.copy()
+    for col in df.columns:
+        if col in DECIMAL_COLUMNS or col in PERCENT_COLUMNS or col in INT_COLUMNS:
+            values = to_float(truncate_decimals(normalize_numbers(df[col])))
+            if col in INT_COLUMNS:
+                values = np.trunc(values)
+                if values.notna().all():
+                    values = values.astype("int64")
+            df[col] = values
+        elif col in DATE_COLUMNS:
+            df[col] = normalize_dates(df[col])
+    return compact_frame(df)
+
+
+def ventas_records(df: pd.DataFrame, columns: List[str]) -> List[Dict[str, Any]]:
+    """
+    Filas de load_ventas() como dicts, para los análisis que suman en Decimal fila a fila:
+    números -> Decimal (vacío = 0, como parse_decimal), fechas -> date (None si vacía),
+    el resto -> str ("" si vacío).
+    """
+    values: Dict[str, List[Any]] = {}
+    for col in columns:
+        s = df[col]
+        if col in DECIMAL_COLUMNS or col in PERCENT_COLUMNS or col in INT_COLUMNS:
+            values[col] = [Decimal(repr(v)) if v == v else Decimal("0") for v in s.astype(object)]
+        elif col in DATE_COLUMNS:
+            values[col] = [None if pd.isna(v) else v.date() for v in s]
+        else:
+            values[col] = ["" if pd.isna(v) else str(v) for v in s.astype(object)]
+    return [dict(zip(columns, row)) for row in zip(*(values[col] for col in columns))]
+
+
+def memory_footprint(df: pd.DataFrame, baseline: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Bytes por columna (deep: cuenta los strings y el diccionario de los categóricos).
+    Con baseline (p. ej. read_ventas_csv) agrega lo que ocupaba cada columna ahí.
+    """
+    report = pd.DataFrame({
+        "dtype": df.dtypes.astype(str),
+        "bytes": df.memory_usage(deep=True, index=False),
+    })
+    report["bytes/fila"] = (report["bytes"] / max(len(df), 1)).round(1)
+    if baseline is not None:
+        report["bytes antes"] = baseline.memory_usage(deep=True, index=False).reindex(report.index)
+        report["x menos"] = (report["bytes antes"] / report["bytes"]).round(1)
+    return report.sort_values("bytes", ascending=False)
+
+
+def write_ventas_parquet(csv_path: str = VENTAS_CSV, parquet_path: str = VENTAS_PARQUET) -> bool:
+    """Tipa el CSV final y lo guarda como Parquet (atómico). False si no hay pyarrow."""
+    if not HAS_PYARROW:
+        return False
+    table = to_arrow(read_ventas_csv(csv_path))
+    tmp = parquet_path + ".tmp"
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, parquet_path)
+    return True
+
+
+def load_ventas(csv_path: str = VENTAS_CSV, parquet_path: str = None) -> pd.DataFrame:
+    """
+    Ventas tipadas para los análisis. Usa el Parquet si existe y no es más viejo que el CSV
+    (si alguien corrió la cadena de scripts a mano después del ETL, manda el CSV).
+    """
+    if parquet_path is None:
+        parquet_path = os.path.splitext(csv_path)[0] + ".parquet"
+    if HAS_PYARROW and os.path.exists(parquet_path) and (
+        not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+    ):
+        return frame_from_arrow(pq.read_table(parquet_path))
+    df = read_ventas_csv(csv_path)
+    if HAS_PYARROW:
+        return frame_from_arrow(to_arrow(df))
+    return frame_from_strings(df)
+
+
+if __name__ == "__main__":
+    # Memoria por columna del dataset de ventas: tipado vs. todo como strings object
+    raw = pd.read_csv(VENTAS_CSV, encoding="utf-8-sig", dtype=object)
+    ventas = load_ventas(VENTAS_CSV)
+    report = memory_footprint(ventas, baseline=raw)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(report)
+    total_before, total_after = report["bytes antes"].sum(), report["bytes"].sum()
+    print(f"\nTotal: {total_before / 1e6:.2f} MB como strings -> {total_after / 1e6:.2f} MB tipado "
+          f"({total_before / total_after:.1f}x menos), {len(ventas)} filas")